@@ -0,0 +1,355 @@
+#!/usr/bin/env python3
+"""
+Micro-benchmarks for the hot paths of the processing pipeline.
+
+Usage:
+    python benchmark.py            # run every benchmark
+    python benchmark.py chunking   # run a single benchmark
+"""
+
+import sys
+import time
+from pathlib import Path
+
+# Add the current directory to Python path
+sys.path.insert(0, str(Path(__file__).parent))
+
+from rag_processor.models import DocumentType
+from rag_processor.config import CHUNKING_STRATEGIES
+from rag_processor.chunkers import IntelligentChunker
+from test_document_processing import (
+    SAMPLE_BOOK_TEXT, SAMPLE_TRANSCRIPT_TEXT, legacy_identify_framework_chunks, legacy_remove_fillers, make_chunk
+)
+
+
+def _best_of(func, repeat: int = 3) -> float:
+    """Best wall-clock time of several runs, in seconds."""
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        timings.append(time.perf_counter() - start)
+    return min(timings)
+
+
+def benchmark_chunking(copies: int = 400):
+    """Compare the token-window splitter against langchain's re-encoding splitter."""
+    from langchain.text_splitter import RecursiveCharacterTextSplitter
+    
+    print("\n" + "=" * 60)
+    print("CHUNKING: TokenTextSplitter vs RecursiveCharacterTextSplitter")
+    print("=" * 60)
+    
+    chunker = IntelligentChunker()
+    fixtures = {
+        DocumentType.BOOK: "\n\n".join([SAMPLE_BOOK_TEXT] * copies),
+        DocumentType.TRANSCRIPT: "\n\n".join([SAMPLE_TRANSCRIPT_TEXT] * copies),
+    }
+    
+    for doc_type, text in fixtures.items():
+        strategy = CHUNKING_STRATEGIES[doc_type]
+        chunker.strategy = strategy
+        token_count = len(chunker.tokenizer.encode(text))
+        
+        langchain_splitter = RecursiveCharacterTextSplitter(
+            chunk_size=strategy.max_tokens,
+            chunk_overlap=strategy.overlap_tokens,
+            length_function=lambda x: len(chunker.tokenizer.encode(x)),
+            separators=strategy.split_on,
+            is_separator_regex=False
+        )
+        token_splitter = chunker._create_splitter(doc_type)
+        
+        # The old chunk_document re-encoded every chunk to get its token count
+        old_time = _best_of(lambda: [
+            len(chunker.tokenizer.encode(chunk)) for chunk in langchain_splitter.split_text(text)
+        ])
+        new_time = _best_of(lambda: token_splitter.split_text_with_counts(text))
+        
+        print(f"\n{doc_type.value}: {len(text):,} chars, {token_count:,} tokens")
+        print(f"  RecursiveCharacterTextSplitter: {old_time * 1000:8.1f} ms "
+              f"({len(langchain_splitter.split_text(text))} chunks)")
+        print(f"  TokenTextSplitter:              {new_time * 1000:8.1f} ms "
+              f"({len(token_splitter.split_text_with_counts(text))} chunks)")
+        print(f"  Speedup: {old_time / new_time:.1f}x")
+
+
+def benchmark_similarity(candidates: int = 2000):
+    """Compare the old per-character zip loop against batched NumPy scoring."""
+    import numpy as np
+    from rag_processor.similarity import shingle_hashes, jaccard_many, ngram_vector, cosine_many
+    
+    print("\n" + "=" * 60)
+    print(f"SIMILARITY: one chunk against {candidates:,} candidates")
+    print("=" * 60)
+    
+    words = SAMPLE_TRANSCRIPT_TEXT.split()
+    texts = [" ".join(words[i % len(words):] + words[:i % len(words)]) * 4 for i in range(candidates)]
+    query = texts[0]
+    
+    def zip_loop():
+        # The previous ContentConsolidator._calculate_similarity
+        q = " ".join(query.split()).lower()
+        for text in texts:
+            t = " ".join(text.split()).lower()
+            sum(1 for c1, c2 in zip(q, t) if c1 == c2) / max(len(q), len(t))
+    
+    shingles = [shingle_hashes(text) for text in texts]
+    vectors = np.stack([ngram_vector(text) for text in texts])
+    query_shingles = shingle_hashes(query)
+    query_vector = ngram_vector(query)
+    
+    old_time = _best_of(zip_loop)
+    jaccard_time = _best_of(lambda: jaccard_many(query_shingles, shingles))
+    cosine_time = _best_of(lambda: cosine_many(query_vector, vectors))
+    
+    print(f"  Character zip loop:     {old_time * 1000:8.1f} ms")
+    print(f"  jaccard_many:           {jaccard_time * 1000:8.1f} ms ({old_time / jaccard_time:.0f}x)")
+    print(f"  cosine_many:            {cosine_time * 1000:8.1f} ms ({old_time / cosine_time:.0f}x)")
+
+
+def benchmark_repetitions(paragraphs: int = 4000):
+    """Compare the all-pairs repetition scan against the prefix-filtered index."""
+    import numpy as np
+    from rag_processor.transcript_cleaner import TranscriptCleaner
+    
+    print("\n" + "=" * 60)
+    print(f"REPETITIONS: {paragraphs:,} transcript paragraphs")
+    print("=" * 60)
+    
+    # Zipf-distributed vocabulary, with a fifth of paragraphs repeated
+    rng = np.random.default_rng(1)
+    paras = []
+    for _ in range(paragraphs):
+        if paras and rng.random() < 0.2:
+            paras.append(paras[rng.integers(len(paras))] + " again")
+        else:
+            words = rng.zipf(1.2, size=rng.integers(10, 60)) % 50000
+            paras.append(" ".join(f"w{w}" for w in words))
+    text = "\n\n".join(paras)
+    cleaner = TranscriptCleaner()
+    
+    def all_pairs():
+        # The previous implementation: every paragraph against every kept one
+        seen = []
+        kept = 0
+        for para in text.split("\n\n"):
+            words = set(cleaner._simplify_text(para).split())
+            if not any(len(words & other) / len(words | other) > 0.8 for other in seen):
+                seen.append(words)
+                kept += 1
+        return kept
+    
+    old_time = _best_of(all_pairs, repeat=1)
+    new_time = _best_of(lambda: cleaner._consolidate_repetitions(text), repeat=1)
+    
+    print(f"  All-pairs scan:         {old_time * 1000:8.1f} ms")
+    print(f"  JaccardIndex:           {new_time * 1000:8.1f} ms ({old_time / new_time:.0f}x)")
+
+
+def benchmark_fillers(copies: int = 8000):
+    """Throughput of the single-pass filler normalizer against the five-pass original."""
+    from rag_processor.transcript_cleaner import TranscriptCleaner
+    
+    print("\n" + "=" * 60)
+    print("FILLERS: TranscriptCleaner._remove_fillers throughput")
+    print("=" * 60)
+    
+    cleaner = TranscriptCleaner()
+    fixtures = {
+        DocumentType.TRANSCRIPT: "\n\n".join([SAMPLE_TRANSCRIPT_TEXT] * copies),
+        DocumentType.BOOK: "\n\n".join([SAMPLE_BOOK_TEXT] * copies),
+    }
+    
+    for doc_type, text in fixtures.items():
+        megabytes = len(text.encode('utf-8')) / (1024 * 1024)
+        assert cleaner._remove_fillers(text) == legacy_remove_fillers(cleaner, text)
+        
+        old_time = _best_of(lambda: legacy_remove_fillers(cleaner, text))
+        new_time = _best_of(lambda: cleaner._remove_fillers(text))
+        
+        print(f"\n{doc_type.value}: {megabytes:.1f} MB (outputs identical)")
+        print(f"  Five regex passes:      {megabytes / old_time:8.1f} MB/s")
+        print(f"  Single pass:            {megabytes / new_time:8.1f} MB/s ({old_time / new_time:.1f}x)")
+
+
+def benchmark_packing(chunks: int = 50000):
+    """Time both packing strategies on a corpus-sized list of chunk weights."""
+    import numpy as np
+    from rag_processor.packing import allocate_bins, first_fit_decreasing, linear_partition
+    
+    print("\n" + "=" * 60)
+    print(f"PACKING: {chunks:,} chunks")
+    print("=" * 60)
+    
+    rng = np.random.default_rng(1)
+    weights = rng.integers(20, 400, size=chunks).tolist()
+    section_ends = (rng.random(chunks) < 0.05).tolist()
+    bins = allocate_bins({"corpus": sum(weights)}, 2500, 2000, 5000)["corpus"]
+    
+    ordered_time = _best_of(lambda: linear_partition(weights, bins, 5000, section_ends))
+    first_fit_time = _best_of(lambda: first_fit_decreasing(weights, bins, 5000))
+    
+    print(f"  Target files:           {bins:8,}")
+    print(f"  Ordered (DP):           {ordered_time * 1000:8.1f} ms ({len(linear_partition(weights, bins, 5000, section_ends)):,} files)")
+    print(f"  First-fit decreasing:   {first_fit_time * 1000:8.1f} ms ({len(first_fit_decreasing(weights, bins, 5000)):,} files)")
+
+
+def benchmark_token_totals(documents: int = 300):
+    """Compare re-encoding consolidated documents against summing their chunk counts."""
+    from rag_processor.tokens import TokenCounter
+    
+    print("\n" + "=" * 60)
+    print(f"TOKEN TOTALS: {documents:,} consolidated documents")
+    print("=" * 60)
+    
+    pieces = [paragraph for paragraph in SAMPLE_BOOK_TEXT.split("\n\n") if paragraph.strip()]
+    docs = [[f"{piece} ({doc}.{i})" for i, piece in enumerate(pieces * 8)] for doc in range(documents)]
+    counter = TokenCounter()
+    counts = [counter.count_batch(doc) for doc in docs]
+    
+    def encode_joined():
+        fresh = TokenCounter()  # No memoized counts
+        return [fresh.count("\n\n".join(doc)) for doc in docs]
+    
+    def sum_counts():
+        fresh = TokenCounter()
+        return [fresh.count_joined(doc, doc_counts) for doc, doc_counts in zip(docs, counts)]
+    
+    exact = encode_joined()
+    summed = sum_counts()
+    mismatched = sum(a != b for a, b in zip(exact, summed))
+    
+    old_time = _best_of(encode_joined)
+    new_time = _best_of(sum_counts)
+    
+    print(f"  Encode joined text:     {old_time * 1000:8.1f} ms")
+    print(f"  Sum chunk counts:       {new_time * 1000:8.1f} ms ({old_time / new_time:.1f}x, {mismatched} totals differ)")
+
+
+def benchmark_framework_candidates(sizes=(1250, 2500, 5000)):
+    """Compare the chunk ID index against list membership when collecting framework candidates."""
+    from rag_processor.framework_extractor import FrameworkExtractor
+    
+    print("\n" + "=" * 60)
+    print(f"FRAMEWORK CANDIDATES: {', '.join(f'{size:,}' for size in sizes)} chunks")
+    print("=" * 60)
+    
+    pieces = [piece for piece in (SAMPLE_BOOK_TEXT + SAMPLE_TRANSCRIPT_TEXT).split("\n\n") if piece.strip()]
+    corpus = [make_chunk(f"{pieces[i % len(pieces)]} ({i})", i, document_id=f"doc{i // 50}") for i in range(max(sizes))]
+    extractor = FrameworkExtractor()
+    
+    # Both run on the same chunks; list membership grows quadratically
+    for size in sizes:
+        old_time = _best_of(lambda: legacy_identify_framework_chunks(extractor, corpus[:size]), repeat=1)
+        new_time = _best_of(lambda: extractor.identify_framework_chunks(corpus[:size]), repeat=1)
+        print(f"  {size:>6,} chunks: list membership {old_time:6.2f} s, "
+              f"chunk ID index {new_time:6.2f} s ({old_time / new_time:.1f}x)")
+
+
+def _baseline_validate(output_dir: Path) -> dict:
+    """The validator before validate_all shared file records: each check walks and re-reads the tree."""
+    import tiktoken
+    
+    tokenizer = tiktoken.get_encoding("cl100k_base")
+    for_upload_dir = output_dir / "for_upload"
+    
+    def md_files():
+        for category_dir in for_upload_dir.iterdir():
+            if category_dir.is_dir():
+                yield from category_dir.glob("*.md")
+    
+    def body(content: str) -> str:
+        if content.startswith("---"):
+            return content.split("---", 2)[2] if content.count("---") >= 2 else content
+        return content
+    
+    # File count
+    file_count = sum(1 for _ in md_files())
+    
+    # Token ranges
+    tokens = {md_file.name: len(tokenizer.encode(body(md_file.read_text(encoding='utf-8')))) for md_file in md_files()}
+    
+    # Framework completeness
+    found, incomplete = set(), []
+    for md_file in (for_upload_dir / "frameworks").glob("*.md"):
+        content = md_file.read_text(encoding='utf-8')
+        for framework in ["3 E's", "Daily Client Machine", "Hybrid Offer", "Sovereign Consultant"]:
+            if framework in content:
+                found.add(framework)
+                lowered = content.lower()
+                if not (("overview" in lowered or "summary" in lowered)
+                        and ("component" in lowered or "element" in lowered)
+                        and ("apply" in lowered or "implement" in lowered)):
+                    incomplete.append(md_file.name)
+    
+    # Semantic coherence
+    issues = []
+    for md_file in md_files():
+        lines = body(md_file.read_text(encoding='utf-8')).split('\n')
+        for i in range(1, len(lines) - 1):
+            prev_line, curr_line = lines[i - 1].strip(), lines[i].strip()
+            if prev_line and prev_line[-1] not in '.!?"' and curr_line and curr_line[0].isupper():
+                issues.append(md_file.name)
+                break
+    
+    # File naming
+    naming = [md_file.name for md_file in md_files() if not md_file.name[:2].isdigit() or ' ' in md_file.name]
+    
+    return {"file_count": file_count, "tokens": tokens, "frameworks": found, "incomplete": incomplete, "coherence": issues, "naming": naming}
+
+
+def benchmark_validation(files: int = 400):
+    """Compare one shared pass over the output tree against the baseline walk per check."""
+    import logging
+    import tempfile
+    from rag_processor.tokens import TokenCounter
+    from rag_processor.validator import QualityValidator
+    
+    print("\n" + "=" * 60)
+    print(f"VALIDATION: {files:,} output files")
+    print("=" * 60)
+    
+    logging.disable(logging.WARNING)  # Incomplete-framework warnings for every sample file
+    with tempfile.TemporaryDirectory() as output_dir:
+        output_dir = Path(output_dir)
+        for i in range(files):
+            category_dir = output_dir / "for_upload" / ("frameworks", "guides")[i % 2]
+            category_dir.mkdir(parents=True, exist_ok=True)
+            body = "\n\n".join(f"{SAMPLE_BOOK_TEXT} ({i}.{j})" for j in range(20))
+            (category_dir / f"{i:03d}_File_{i}.md").write_text(f"---\ntitle: File {i}\n---\n{body}", encoding='utf-8')
+        
+        def validate():
+            validator = QualityValidator(output_dir)
+            validator.token_counter = TokenCounter()  # No memoized counts
+            return validator.validate_all()
+        
+        # Both see the same tree and count the same tokens
+        results = validate()
+        baseline = _baseline_validate(output_dir)
+        assert {f["name"]: f["tokens"] for f in results["token_ranges"]["stats"]["files"]} == baseline["tokens"]
+        
+        old_time = _best_of(lambda: _baseline_validate(output_dir))
+        new_time = _best_of(validate)
+    logging.disable(logging.NOTSET)
+    
+    print(f"  Walk per check:         {old_time * 1000:8.1f} ms")
+    print(f"  One shared pass:        {new_time * 1000:8.1f} ms ({old_time / new_time:.1f}x)")
+
+
+BENCHMARKS = {
+    "chunking": benchmark_chunking,
+    "similarity": benchmark_similarity,
+    "repetitions": benchmark_repetitions,
+    "fillers": benchmark_fillers,
+    "packing": benchmark_packing,
+    "tokens": benchmark_token_totals,
+    "frameworks": benchmark_framework_candidates,
+    "validation": benchmark_validation,
+}
+
+
+if __name__ == "__main__":
+    selected = sys.argv[1:] or list(BENCHMARKS)
+    for name in selected:
+        BENCHMARKS[name]()
@@ -0,0 +1,239 @@
+"""
+Stage checkpoints in a compact, length-prefixed msgpack record format.
+"""
+
+import logging
+import os
+import shutil
+import struct
+from dataclasses import asdict
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, Iterator, Optional
+
+import msgpack
+
+from .framework_extractor import Framework
+from .models import ChunkMetadata, ConsolidatedDocument, DocumentType, ProcessedChunk, ProcessingConfig
+
+logger = logging.getLogger(__name__)
+
+
+# Bump when the layout of any record changes; older files are then rejected
+CHECKPOINT_SCHEMA_VERSION = 1
+
+# Pipeline stages in order; resuming from a stage reloads its checkpoint
+STAGES = ("loaded", "chunks", "frameworks", "consolidated")
+
+_MAGIC = b"RAGCKPT\x00"
+_LENGTH = struct.Struct("<I")
+
+
+class CheckpointError(Exception):
+    """A checkpoint is missing, unreadable or from another schema version."""
+
+
+def pack_record(record: Dict) -> bytes:
+    """One record as RecordWriter stores it: length prefix, then msgpack."""
+    data = msgpack.packb(record, use_bin_type=True, default=str)
+    return _LENGTH.pack(len(data)) + data
+
+
+class RecordWriter:
+    """
+    Writes one record file: magic, header, then length-prefixed records.
+    
+    Every record (and the header) is a msgpack map preceded by its byte
+    length as a little-endian uint32, so files can be written and read one
+    record at a time. The file is written under a temporary name and only
+    renamed into place by commit(), so a reader never sees a partial file;
+    leaving the `with` block on an exception discards it.
+    """
+    
+    def __init__(self, path: Path, kind: str, meta: Optional[Dict] = None):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._tmp_path = self.path.with_name(f"{self.path.name}.tmp{os.getpid()}")
+        self._file = open(self._tmp_path, 'wb')
+        self._file.write(_MAGIC)
+        self._write({"schema": CHECKPOINT_SCHEMA_VERSION, "kind": kind, "meta": meta or {}})
+        self.count = 0
+    
+    def write(self, record: Dict):
+        """Append one record."""
+        self._write(record)
+        self.count += 1
+    
+    def write_packed(self, path: Path):
+        """Append a record packed into a file by pack_record() (e.g. in a worker), then remove the file."""
+        with open(path, 'rb') as part:
+            shutil.copyfileobj(part, self._file)
+        os.unlink(path)
+        self.count += 1
+    
+    def commit(self):
+        """Close the file and move it into place."""
+        self._file.close()
+        os.replace(self._tmp_path, self.path)
+    
+    def discard(self):
+        """Close and delete the unfinished file."""
+        self._file.close()
+        self._tmp_path.unlink(missing_ok=True)
+    
+    def _write(self, record: Dict):
+        self._file.write(pack_record(record))
+    
+    def __enter__(self) -> "RecordWriter":
+        return self
+    
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.commit()
+        else:
+            self.discard()
+
+
+class NullRecordWriter:
+    """Stands in for a RecordWriter when checkpointing is off."""
+    
+    def write(self, record: Dict):
+        pass
+    
+    def write_packed(self, path: Path):
+        os.unlink(path)
+    
+    def commit(self):
+        pass
+    
+    def discard(self):
+        pass
+    
+    def __enter__(self) -> "NullRecordWriter":
+        return self
+    
+    def __exit__(self, exc_type, exc, tb):
+        pass
+
+
+class RecordReader:
+    """Reads a file written by RecordWriter; iterate it for the records."""
+    
+    def __init__(self, path: Path, kind: str):
+        self.path = Path(path)
+        try:
+            with open(self.path, 'rb') as f:
+                if f.read(len(_MAGIC)) != _MAGIC:
+                    raise CheckpointError(f"{self.path} is not a checkpoint file")
+                header = self._read(f)
+        except FileNotFoundError:
+            raise CheckpointError(f"No checkpoint at {self.path}") from None
+        
+        if header is None or header.get("schema") != CHECKPOINT_SCHEMA_VERSION:
+            raise CheckpointError(
+                f"{self.path} has schema {header and header.get('schema')}, "
+                f"expected {CHECKPOINT_SCHEMA_VERSION}"
+            )
+        if header["kind"] != kind:
+            raise CheckpointError(f"{self.path} holds {header['kind']} records, not {kind}")
+        
+        self.meta: Dict = header["meta"]
+    
+    def __iter__(self) -> Iterator[Dict]:
+        with open(self.path, 'rb') as f:
+            f.seek(len(_MAGIC))
+            self._read(f)  # Header
+            while True:
+                record = self._read(f)
+                if record is None:
+                    return
+                yield record
+    
+    @staticmethod
+    def _read(f) -> Optional[Dict]:
+        prefix = f.read(_LENGTH.size)
+        if not prefix:
+            return None
+        
+        data = f.read(_LENGTH.unpack(prefix)[0])
+        return msgpack.unpackb(data, raw=False)
+
+
+class CheckpointStore:
+    """
+    One checkpoint file per pipeline stage (see STAGES).
+    
+    A disabled store writes nothing but still removes stale checkpoints, so
+    a later resume cannot pick up outputs of an older run.
+    """
+    
+    def __init__(self, checkpoint_dir: Path, enabled: bool = True):
+        self.checkpoint_dir = Path(checkpoint_dir)
+        self.enabled = enabled
+    
+    @classmethod
+    def from_config(cls, config: ProcessingConfig) -> "CheckpointStore":
+        """Create the store described by a processing config."""
+        checkpoint_dir = config.checkpoint_dir or str(Path(config.output_dir) / "cache" / "checkpoints")
+        return cls(Path(checkpoint_dir), enabled=config.checkpoint)
+    
+    def writer(self, stage: str, meta: Optional[Dict] = None):
+        """
+        Start the checkpoint of a stage.
+        
+        Checkpoints of this and every later stage are removed first, so a
+        resume never mixes outputs of different runs.
+        """
+        for later in STAGES[STAGES.index(stage):]:
+            self._path(later).unlink(missing_ok=True)
+            shutil.rmtree(self.parts_dir(later), ignore_errors=True)
+        if not self.enabled:
+            return NullRecordWriter()
+        return RecordWriter(self._path(stage), stage, meta)
+    
+    def reader(self, stage: str) -> RecordReader:
+        """Open the last committed checkpoint of a stage."""
+        return RecordReader(self._path(stage), stage)
+    
+    def parts_dir(self, stage: str) -> Path:
+        """Directory for records of a stage packed by other processes (see RecordWriter.write_packed)."""
+        return self.checkpoint_dir / f"{stage}.parts"
+    
+    def _path(self, stage: str) -> Path:
+        return self.checkpoint_dir / f"{stage}.ckpt"
+
+
+def chunk_to_record(chunk: ProcessedChunk) -> Dict[str, Any]:
+    """Plain-data form of a chunk (dates and enums as strings)."""
+    return chunk.model_dump(mode='json')
+
+
+def chunk_from_record(record: Dict[str, Any]) -> ProcessedChunk:
+    """Rebuild a chunk from chunk_to_record() output without re-validating it."""
+    metadata = dict(record["metadata"])
+    metadata["document_type"] = DocumentType(metadata["document_type"])
+    metadata["timestamp"] = datetime.fromisoformat(metadata["timestamp"])
+    
+    return ProcessedChunk.model_construct(
+        text=record["text"],
+        token_count=record["token_count"],
+        metadata=ChunkMetadata.model_construct(**metadata)
+    )
+
+
+def framework_to_record(framework: Framework) -> Dict[str, Any]:
+    return asdict(framework)
+
+
+def framework_from_record(record: Dict[str, Any]) -> Framework:
+    return Framework(**record)
+
+
+def document_to_record(category: str, doc: ConsolidatedDocument) -> Dict[str, Any]:
+    return {"category": category, "document": doc.model_dump()}
+
+
+def document_from_record(record: Dict[str, Any]) -> ConsolidatedDocument:
+    """Rebuild a consolidated document without re-validating it."""
+    return ConsolidatedDocument.model_construct(**record["document"])
+
@@ -0,0 +1,163 @@
+"""
+Persistent store of ingested chunks, keyed by input file fingerprints.
+"""
+
+import hashlib
+import json
+import logging
+import os
+from importlib import metadata as importlib_metadata
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional
+
+from .checkpoint import RecordReader, RecordWriter, chunk_from_record, chunk_to_record
+from .config import CHUNKING_STRATEGIES, FILLER_WORDS, RELATED_CONCEPTS
+from .matching import get_pattern_matcher
+from .models import ProcessingConfig, ProcessedChunk
+
+logger = logging.getLogger(__name__)
+
+
+# Bump when a code change alters the chunks ingestion produces
+INGEST_FORMAT_VERSION = 4
+
+
+def ingest_version() -> str:
+    """
+    Digest of everything besides the input file that shapes its chunks.
+    
+    Stored chunks carry enrichment output (document type, keywords,
+    concepts, framework hits), so every config table the pattern matcher is
+    built from is covered through its fingerprint, as are RELATED_CONCEPTS.
+    """
+    try:
+        unstructured_version = importlib_metadata.version("unstructured")
+    except importlib_metadata.PackageNotFoundError:
+        unstructured_version = "unknown"
+    
+    settings = {
+        "format": INGEST_FORMAT_VERSION,
+        "unstructured": unstructured_version,
+        "filler_words": FILLER_WORDS,
+        "patterns": get_pattern_matcher().fingerprint(),
+        "related_concepts": RELATED_CONCEPTS,
+        "chunking": {
+            doc_type.value: strategy.model_dump() for doc_type, strategy in CHUNKING_STRATEGIES.items()
+        },
+    }
+    return hashlib.sha256(json.dumps(settings, sort_keys=True).encode()).hexdigest()[:16]
+
+
+class ChunkStore:
+    """
+    Input fingerprint manifest plus the chunks each document produced.
+    
+    The manifest maps every ingested file name to its fingerprint (content
+    hash, size and mtime), the ingest version and the IDs of the chunks it
+    produced; the chunks themselves are kept in one msgpack record file
+    (see checkpoint.RecordWriter) per document.
+    A document is current when its content hash and the ingest version both
+    match. Size and mtime are only a shortcut: while both are unchanged the
+    file is not hashed again.
+    """
+    
+    def __init__(self, store_dir: Path, version: Optional[str] = None):
+        self.store_dir = Path(store_dir)
+        self.version = version or ingest_version()
+        self.manifest_path = self.store_dir / "manifest.json"
+        self.entries: Dict[str, Dict] = self._load_manifest()
+        self._fingerprints: Dict[str, Dict] = {}
+    
+    @classmethod
+    def from_config(cls, config: ProcessingConfig) -> "ChunkStore":
+        """Create the store described by a processing config."""
+        store_dir = config.chunk_store_dir or str(Path(config.output_dir) / "cache" / "chunks")
+        return cls(Path(store_dir))
+    
+    def fingerprint(self, file_path: Path) -> Dict:
+        """Content hash, size and mtime of an input file."""
+        cached = self._fingerprints.get(file_path.name)
+        if cached is not None:
+            return cached
+        
+        stat = file_path.stat()
+        entry = self.entries.get(file_path.name)
+        if entry and entry["size"] == stat.st_size and entry["mtime_ns"] == stat.st_mtime_ns:
+            content_hash = entry["content_hash"]
+        else:
+            digest = hashlib.sha256()
+            with open(file_path, 'rb') as f:
+                for block in iter(lambda: f.read(1024 * 1024), b''):
+                    digest.update(block)
+            content_hash = digest.hexdigest()
+        
+        fingerprint = {"content_hash": content_hash, "size": stat.st_size, "mtime_ns": stat.st_mtime_ns}
+        self._fingerprints[file_path.name] = fingerprint
+        return fingerprint
+    
+    def is_current(self, file_path: Path) -> bool:
+        """Whether stored chunks exist for this exact file content and ingest version."""
+        entry = self.entries.get(file_path.name)
+        return (
+            entry is not None
+            and entry["version"] == self.version
+            and entry["content_hash"] == self.fingerprint(file_path)["content_hash"]
+            and self._chunks_path(file_path.name).exists()
+        )
+    
+    def load(self, file_path: Path) -> List[ProcessedChunk]:
+        """Load the stored chunks of a current document (see is_current)."""
+        reader = RecordReader(self._chunks_path(file_path.name), "document_chunks")
+        chunks = [chunk_from_record(record) for record in reader]
+        
+        # A touched but unchanged file keeps its chunks; remember the new mtime
+        self.entries[file_path.name].update(self.fingerprint(file_path))
+        return chunks
+    
+    def put(self, file_path: Path, document_id: str, chunks: List[ProcessedChunk]):
+        """Store the chunks a document produced, replacing any earlier entry."""
+        with RecordWriter(self._chunks_path(file_path.name), "document_chunks") as writer:
+            for chunk in chunks:
+                writer.write(chunk_to_record(chunk))
+        
+        self.entries[file_path.name] = {
+            **self.fingerprint(file_path),
+            "version": self.version,
+            "document_id": document_id,
+            "chunk_ids": [chunk.metadata.chunk_id for chunk in chunks],
+        }
+    
+    def retract_missing(self, documents: Iterable[Path]) -> List[str]:
+        """Drop entries for files no longer in the input; returns their names."""
+        present = {file_path.name for file_path in documents}
+        retracted = sorted(name for name in self.entries if name not in present)
+        
+        for name in retracted:
+            self._chunks_path(name).unlink(missing_ok=True)
+            del self.entries[name]
+        
+        return retracted
+    
+    def save(self):
+        """Persist the manifest."""
+        self.store_dir.mkdir(parents=True, exist_ok=True)
+        self._write_atomic(self.manifest_path, json.dumps(self.entries, indent=2, sort_keys=True))
+    
+    def _load_manifest(self) -> Dict[str, Dict]:
+        try:
+            return json.loads(self.manifest_path.read_text(encoding='utf-8'))
+        except FileNotFoundError:
+            return {}
+        except ValueError:
+            logger.warning(f"Ignoring unreadable chunk manifest {self.manifest_path}")
+            return {}
+    
+    def _chunks_path(self, name: str) -> Path:
+        return self.store_dir / f"{hashlib.sha1(name.encode()).hexdigest()[:16]}.chunks"
+    
+    @staticmethod
+    def _write_atomic(path: Path, text: str):
+        # Write-then-rename so an interrupted run never leaves a partial file
+        tmp_path = path.with_suffix(f".tmp{os.getpid()}")
+        tmp_path.write_text(text, encoding='utf-8')
+        os.replace(tmp_path, path)
@@ -4,11 +4,10 @@ Intelligent document chunking module.
 
 import logging
 from typing import List, Optional
-import tiktoken
-from langchain.text_splitter import RecursiveCharacterTextSplitter
-
 from .models import ProcessedChunk, ChunkMetadata, DocumentType, ChunkingStrategy
 from .config import CHUNKING_STRATEGIES
+from .splitters import TokenTextSplitter
+from .tokens import get_token_counter
 
 logger = logging.getLogger(__name__)
 
@@ -17,7 +16,7 @@ class IntelligentChunker:
     """Intelligently chunks documents based on type and content structure."""
     
     def __init__(self, strategy: Optional[ChunkingStrategy] = None):
-        self.tokenizer = tiktoken.get_encoding("cl100k_base")
+        self.tokenizer = get_token_counter().encoding
         self.strategy = strategy
     
     def chunk_document(
@@ -37,7 +36,7 @@ class IntelligentChunker:
             document_id: Unique document identifier
             source_file: Source filename
             metadata: Additional metadata from loader
-            
+        
         Returns:
             List of processed chunks with metadata
         """
@@ -51,16 +50,14 @@ class IntelligentChunker:
         # Create text splitter with document-specific settings
         splitter = self._create_splitter(doc_type)
         
-        # Split the text
-        raw_chunks = splitter.split_text(text)
+        # Split the text into stripped chunks with their exact token counts
+        raw_chunks = splitter.split_text_with_counts(text)
         
         # Process chunks with metadata
         processed_chunks = []
         total_chunks = len(raw_chunks)
         
-        for i, chunk_text in enumerate(raw_chunks):
-            token_count = len(self.tokenizer.encode(chunk_text))
-            
+        for i, (chunk_text, token_count) in enumerate(raw_chunks):
             # Skip chunks that are too small (likely noise)
             if token_count < self.strategy.min_tokens:
                 logger.debug(f"Skipping small chunk ({token_count} tokens)")
@@ -85,7 +82,7 @@ class IntelligentChunker:
                 chunk_metadata.section = self._extract_section(chunk_text)
             
             processed_chunk = ProcessedChunk(
-                text=chunk_text.strip(),
+                text=chunk_text,
                 metadata=chunk_metadata,
                 token_count=token_count
             )
@@ -95,16 +92,15 @@ class IntelligentChunker:
         logger.info(f"Created {len(processed_chunks)} chunks from {source_file}")
         return processed_chunks
     
-    def _create_splitter(self, doc_type: DocumentType) -> RecursiveCharacterTextSplitter:
+    def _create_splitter(self, doc_type: DocumentType) -> TokenTextSplitter:
         """Create a text splitter configured for the document type."""
         strategy = self.strategy or CHUNKING_STRATEGIES[doc_type]
         
-        return RecursiveCharacterTextSplitter(
-            chunk_size=strategy.max_tokens,
-            chunk_overlap=strategy.overlap_tokens,
-            length_function=lambda x: len(self.tokenizer.encode(x)),
-            separators=strategy.split_on,
-            is_separator_regex=False
+        return TokenTextSplitter(
+            tokenizer=self.tokenizer,
+            max_tokens=strategy.max_tokens,
+            overlap_tokens=strategy.overlap_tokens,
+            separators=strategy.split_on
         )
     
     def _extract_chapter(self, text: str) -> Optional[str]:
@@ -156,10 +152,13 @@ class IntelligentChunker:
                 current_tokens + next_tokens <= self.strategy.max_tokens):
                 
                 # Merge chunks
+                # Framework hits may span the join, so the merged text is rescanned
                 current_chunk = ProcessedChunk(
                     text=current_chunk.text + "\n\n" + next_chunk.text,
-                    metadata=current_chunk.metadata,
-                    token_count=current_tokens + next_tokens
+                    metadata=current_chunk.metadata.model_copy(update={"framework_matches": None}),
+                    token_count=get_token_counter().count_joined(
+                        [current_chunk.text, next_chunk.text], [current_tokens, next_tokens]
+                    )
                 )
             else:
                 # Save current and move to next
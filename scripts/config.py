@@ -58,16 +58,27 @@ CHUNKING_STRATEGIES = {
 }
 
 
-# Framework patterns to detect
+# Framework patterns to detect (matched case-insensitively, so written in lowercase)
 FRAMEWORK_PATTERNS = [
-    r"(\d+\s*[A-Z]'s)\s*(?:framework|model|system)",  # "3 E's framework"
-    r"The\s+(\w+\s+\w+)\s+(?:Framework|Model|System)",  # "The Sovereign Consultant"
-    r"(\w+)\s+Framework",  # Generic framework pattern
-    r"(\w+)\s+Method",  # Method pattern
-    r"(\w+)\s+System",  # System pattern
-    r"(\w+)\s+Process",  # Process pattern
-    r"Daily\s+Client\s+Machine",  # Specific framework
-    r"Hybrid\s+Offer",  # Specific framework
+    r"(\d+\s*[a-z]'s)\s*(?:framework|model|system)",  # "3 E's framework"
+    r"\bthe\s+(\w+\s+\w+)\s+(?:framework|model|system)",  # "The Sovereign Consultant"
+    r"\b(\w+)\s+framework",  # Generic framework pattern
+    r"\b(\w+)\s+method",  # Method pattern
+    r"\b(\w+)\s+system",  # System pattern
+    r"\b(\w+)\s+process",  # Process pattern
+    r"daily\s+client\s+machine",  # Specific framework
+    r"hybrid\s+offer",  # Specific framework
+]
+
+
+# Words that never name a framework on their own ("no Framework", "this System")
+FRAMEWORK_NAME_STOPWORDS = [
+    "a", "an", "the", "this", "that", "these", "those", "my", "your", "our",
+    "his", "her", "their", "its", "no", "any", "every", "each", "some", "all",
+    "same", "whole", "entire", "own", "new", "old", "simple", "exact", "right",
+    "good", "great", "best", "other", "one", "first", "next", "last",
+    "is", "are", "was", "be", "of", "to", "in", "on", "for", "with", "and", "or",
+    "as", "by", "at", "from", "it", "what", "which", "whose"
 ]
 
 
@@ -79,6 +90,103 @@ CONCEPT_KEYWORDS = [
 ]
 
 
+# Known frameworks in James Kemp's content: names and aliases are matched
+# verbatim, components count when at least 70% of them appear
+KNOWN_FRAMEWORKS = {
+    "3 E's": {
+        "components": ["Energy", "Earnings", "Experience"],
+        "aliases": ["3Es", "Three E's", "The 3 E's Framework"]
+    },
+    "Daily Client Machine": {
+        "components": ["Daily", "Consistent", "Pipeline"],
+        "aliases": ["DCM", "Daily Client Machine", "Client Machine"]
+    },
+    "Hybrid Offer": {
+        "components": ["High-ticket", "Low-ticket", "Middle-ticket"],
+        "aliases": ["Hybrid", "Hybrid Offer Framework"]
+    },
+    "Sovereign Consultant": {
+        "components": ["Independence", "Expertise", "Positioning"],
+        "aliases": ["Sovereign", "The Sovereign Consultant"]
+    },
+    "$100 Workshop": {
+        "components": ["Entry", "Value", "Upsell"],
+        "aliases": ["100 Dollar Workshop", "Low-ticket Workshop"]
+    }
+}
+
+
+# Common business/consulting terms (matched case-insensitively)
+BUSINESS_TERMS = [
+    "consultant", "consulting", "client", "customer", "business",
+    "revenue", "profit", "scale", "leverage", "offer", "service",
+    "framework", "system", "process", "strategy", "tactic",
+    "workshop", "course", "coaching", "mentor", "expert",
+    "sovereign", "transformation", "results", "outcome"
+]
+
+
+# James Kemp specific concepts (matched verbatim)
+JK_CONCEPTS = [
+    "3 E's", "Energy", "Earnings", "Experience",
+    "Daily Client Machine", "DCM",
+    "Hybrid Offer", "Sovereign Consultant",
+    "3k Code", "$100 Workshop",
+    "Offer Code", "Install Offer"
+]
+
+
+# Concepts suggested as related when a chunk mentions the key concept
+RELATED_CONCEPTS = {
+    "3 E's": ["Energy", "Earnings", "Experience", "leverage", "evaluation"],
+    "Energy": ["3 E's", "passion", "motivation", "burnout"],
+    "Earnings": ["3 E's", "revenue", "profit", "pricing"],
+    "Experience": ["3 E's", "expertise", "results", "transformation"],
+    "Daily Client Machine": ["DCM", "consistency", "pipeline", "acquisition"],
+    "Hybrid Offer": ["offer", "package", "service", "value"],
+    "Sovereign Consultant": ["independence", "freedom", "expertise", "positioning"],
+    "$100 Workshop": ["workshop", "low-ticket", "entry", "funnel"],
+}
+
+
+# Indicators of each concept category (matched case-insensitively)
+CONCEPT_CATEGORY_INDICATORS = {
+    "framework": ["framework", "system", "model", "structure"],
+    "strategy": ["strategy", "approach", "method", "plan"],
+    "tactic": ["tactic", "technique", "tip", "hack", "tool"],
+    "mindset": ["mindset", "belief", "principle", "philosophy", "thinking"]
+}
+
+
+# Content markers used to classify documents, checked in this order after
+# the filename: literal markers are matched case-insensitively, patterns as written
+DOCUMENT_TYPE_MARKERS = {
+    "book": ["chapter", "table of contents", "introduction"],
+    "framework": ["framework", "system", "method", "process"],
+    "guide": ["step", "how to", "guide", "instructions"],
+}
+DOCUMENT_TYPE_PATTERNS = {
+    "transcript": [r'\[[\d:]+\]|\d+:\d+|Speaker:|Q:|A:'],
+    "email": [r'Subject:|From:|To:|Dear\s+\w+|Hi\s+\w+'],
+}
+
+
+# Key phrases that mark the topic of a transcript section (matched
+# case-insensitively); the first topic with two distinct phrases wins
+TRANSCRIPT_TOPIC_KEYWORDS = {
+    "Introduction": ["welcome", "today we", "going to talk about"],
+    "Framework Overview": ["framework", "system", "model", "process"],
+    "Implementation Steps": ["first", "next", "then", "finally"],
+    "Examples & Case Studies": ["example", "case study", "client", "worked with"],
+    "Q&A Session": ["question", "ask", "answer"],
+    "Action Items": ["action", "homework", "assignment", "your task"],
+    "Summary": ["summary", "recap", "remember", "key point"],
+}
+TRANSCRIPT_TOPIC_PATTERNS = {
+    "Implementation Steps": [r'step \d'],
+}
+
+
 # Filler words to remove from transcripts
 FILLER_WORDS = [
     "um", "uh", "umm", "uhh", "like", "you know", "I mean",
@@ -1,200 +1,304 @@
 #!/usr/bin/env python3
 """
 Consolidate RAG files to fit within LibreChat's file limit.
-Combines multiple small files into larger files while preserving context.
+
+Packs the category files FileGenerator writes (for_upload/<category>/*.md)
+into at most max_files files, each within a token and a byte cap, keeping
+categories in upload priority order. Every output file is streamed together
+from its inputs, and the manifest is built from token counts gathered
+while planning and the sizes the writer recorded, so no output file is
+read back. The output directory is replaced as a whole, so it must not
+hold anything but an earlier run's files.
 """
 
-import os
+import sys
 import json
+import logging
+from collections import Counter
+from dataclasses import dataclass
+from datetime import datetime
 from pathlib import Path
-from typing import List, Dict, Tuple
+from typing import List, Optional, Tuple
+
+import click
+
+# Add the current directory to Python path
+sys.path.insert(0, str(Path(__file__).parent))
+
+from rag_processor.packing import capped_partition
+from rag_processor.tokens import get_token_counter
+from rag_processor.tree_writer import TreeWriter
+
+logger = logging.getLogger(__name__)
+
 
-def read_file_content(file_path: Path) -> str:
-    """Read content from a file."""
-    with open(file_path, 'r', encoding='utf-8') as f:
-        return f.read()
+# Upload priority: (file title, output name, section heading, what the files hold)
+CATEGORIES = {
+    "frameworks": ("JK Business Frameworks Collection", "Frameworks_Collection", "FILE",
+                   "business frameworks from James Kemp's methodology"),
+    "core_concepts": ("JK Core Business Concepts", "Core_Concepts", "CONCEPTS",
+                      "core business concept files"),
+    "transcripts": ("JK Training Transcripts Collection", "Transcripts_Collection", "TRANSCRIPT",
+                    "transcripts from James Kemp's training sessions"),
+    "templates": ("JK Email and Offer Templates", "All_Templates", "TEMPLATE SET",
+                  "email and offer template sets"),
+    "guides": ("JK Implementation Guides", "All_Guides", "GUIDE",
+               "implementation guides and SOPs"),
+}
+MIXED = ("JK Knowledge Base", "Knowledge_Base", None, "files from several categories")
 
-def get_file_size(content: str) -> int:
-    """Get approximate token count for content."""
-    return len(content.split()) * 1.3  # Rough token estimate
+RULE = "=" * 80
+SEPARATOR = "\n\n"  # Between every heading, file and rule
 
-def consolidate_files(input_dir: Path, output_dir: Path, target_files: int = 25):
-    """Consolidate files to meet LibreChat's limit."""
+# Characters kept from each end of a file; joins are counted from its ends only
+_JOIN_CONTEXT = 64
+
+
+@dataclass
+class SourceFile:
+    """An input file as one section of an output file: heading, content, rule."""
+    category: str
+    path: Path
+    heading: str
+    ends: str  # Start and end of the content (see TokenCounter.count_joined)
+    content_tokens: int
+    content_bytes: int
+    tokens: int = 0  # Section tokens, with the join before its heading
+    bytes: int = 0
+
+
+def consolidate_files(
+    input_dir: Path,
+    output_dir: Path,
+    max_files: int = 25,
+    max_tokens: int = 100_000,
+    max_bytes: int = 4 * 1024 * 1024
+) -> List[Path]:
+    """
+    Pack the category files under input_dir into at most max_files files.
     
-    # Create output directory
-    output_dir.mkdir(parents=True, exist_ok=True)
+    Each category is packed into the fewest files the caps allow, as even in
+    tokens as possible. If that takes more than max_files files, all files
+    are packed the same way as one sequence in priority order, so categories
+    may share a file. An input file over a cap on its own becomes a file by
+    itself.
     
-    # Categories and their priorities
-    categories = {
-        'frameworks': {'priority': 1, 'files': []},
-        'core_concepts': {'priority': 2, 'files': []},
-        'transcripts': {'priority': 3, 'files': []},
-        'templates': {'priority': 4, 'files': []},
-        'guides': {'priority': 5, 'files': []}
-    }
+    Args:
+        input_dir: FileGenerator's for_upload directory
+        output_dir: Directory for the consolidated files, replaced atomically;
+            it may only hold files from an earlier run
+        max_files: Most output files allowed
+        max_tokens: Largest allowed output file, in tokens
+        max_bytes: Largest allowed output file, in bytes
     
-    # Collect all files by category
-    for category in categories:
-        category_dir = input_dir / category
-        if category_dir.exists():
-            files = sorted(category_dir.glob('*.txt'))
-            categories[category]['files'] = files
+    Returns:
+        Paths of the output files, in order
     
-    # Calculate total files and distribution
-    total_files = sum(len(cat['files']) for cat in categories.values())
-    print(f"Total files to consolidate: {total_files}")
-    print(f"Target consolidated files: {target_files}")
+    Raises:
+        ValueError: If the caps need more than max_files files, or output_dir
+            holds files an earlier run didn't write
+    """
+    _check_replaceable(output_dir)
+    sources = _collect_sources(input_dir)
+    print(f"Total files to consolidate: {len(sources)}")
+    print(f"File limit: {max_files} files of at most {max_tokens:,} tokens and {max_bytes:,} bytes")
     
-    # Consolidation strategy
-    consolidated_files = []
-    file_counter = 1
+    # Leave room for the largest header a file can get
+    header_tokens, header_bytes = _measure_header(len(sources), max_files)
+    token_room, byte_room = max_tokens - header_tokens, max_bytes - header_bytes
+    for source in sources:
+        if source.tokens > token_room or source.bytes > byte_room:
+            logger.warning(f"{source.category}/{source.path.name} exceeds the per-file caps on its own")
     
-    # Priority 1: Keep frameworks relatively separated (they're most important)
-    framework_files = categories['frameworks']['files']
-    if framework_files:
-        # Group frameworks into ~8-10 files
-        frameworks_per_file = max(len(framework_files) // 8, 5)
-        
-        for i in range(0, len(framework_files), frameworks_per_file):
-            batch = framework_files[i:i+frameworks_per_file]
-            combined_content = []
-            combined_content.append(f"# JK Business Frameworks Collection {file_counter}\n")
-            combined_content.append(f"This file contains {len(batch)} business frameworks from James Kemp's methodology.\n\n")
-            combined_content.append("=" * 80 + "\n\n")
-            
-            for file_path in batch:
-                content = read_file_content(file_path)
-                combined_content.append(f"## FILE: {file_path.name}\n\n")
-                combined_content.append(content)
-                combined_content.append("\n\n" + "=" * 80 + "\n\n")
-            
-            output_file = output_dir / f"{file_counter:02d}_Frameworks_Collection_{i//frameworks_per_file + 1}.txt"
-            with open(output_file, 'w', encoding='utf-8') as f:
-                f.write(''.join(combined_content))
-            
-            consolidated_files.append(output_file)
-            file_counter += 1
-            print(f"Created: {output_file.name} ({len(batch)} frameworks)")
+    groups = []
+    for category, labels in CATEGORIES.items():
+        members = [source for source in sources if source.category == category]
+        starts = capped_partition([s.tokens for s in members], [s.bytes for s in members], token_room, byte_room)
+        groups.extend((labels, part) for part in _split(members, starts))
     
-    # Priority 2: Core concepts (usually just 1 file, keep as is)
-    core_files = categories['core_concepts']['files']
-    if core_files:
-        for file_path in core_files:
-            content = read_file_content(file_path)
-            output_file = output_dir / f"{file_counter:02d}_Core_Concepts.txt"
-            with open(output_file, 'w', encoding='utf-8') as f:
-                f.write(f"# JK Core Business Concepts\n\n")
-                f.write(content)
-            consolidated_files.append(output_file)
-            file_counter += 1
-            print(f"Created: {output_file.name}")
+    if len(groups) > max_files:
+        starts = capped_partition(
+            [s.tokens for s in sources], [s.bytes for s in sources], token_room, byte_room, max_files
+        )
+        if starts is None:
+            raise ValueError(
+                f"{len(sources)} files need more than {max_files} files of at most "
+                f"{max_tokens:,} tokens and {max_bytes:,} bytes"
+            )
+        groups = [(MIXED, part) for part in _split(sources, starts)]
     
-    # Priority 3: Transcripts (group into ~8-10 files)
-    transcript_files = categories['transcripts']['files']
-    if transcript_files:
-        transcripts_per_file = max(len(transcript_files) // 8, 6)
-        
-        for i in range(0, len(transcript_files), transcripts_per_file):
-            batch = transcript_files[i:i+transcripts_per_file]
-            combined_content = []
-            combined_content.append(f"# JK Training Transcripts Collection {file_counter - 10}\n")
-            combined_content.append(f"This file contains {len(batch)} transcripts from James Kemp's training sessions.\n\n")
-            combined_content.append("=" * 80 + "\n\n")
-            
-            for file_path in batch:
-                content = read_file_content(file_path)
-                combined_content.append(f"## TRANSCRIPT: {file_path.stem.replace('_', ' ')}\n\n")
-                combined_content.append(content)
-                combined_content.append("\n\n" + "=" * 80 + "\n\n")
+    # Write every file from its parts, then take its size as written for the manifest
+    output_dir.parent.mkdir(parents=True, exist_ok=True)
+    counter = get_token_counter()
+    consolidated_files = []
+    manifest_files = []
+    totals = Counter(name for (_, name, _, _), _ in groups)
+    seen = Counter()
+    with TreeWriter(output_dir) as writer:
+        for (title, name, _, description), members in groups:
+            seen[name] += 1
+            part = seen[name] if totals[name] > 1 else None
             
-            output_file = output_dir / f"{file_counter:02d}_Transcripts_Collection_{i//transcripts_per_file + 1}.txt"
-            with open(output_file, 'w', encoding='utf-8') as f:
-                f.write(''.join(combined_content))
+            header = _header(title, part, len(members), description)
+            texts, token_counts, parts = [header, RULE], [counter.count(header), counter.count(RULE)], []
+            for source in members:
+                texts += [source.heading, source.ends, RULE]
+                token_counts += [counter.count(source.heading), source.content_tokens, counter.count(RULE)]
+                parts += [f"{SEPARATOR}{source.heading}{SEPARATOR}".encode('utf-8'), source.path,
+                          f"{SEPARATOR}{RULE}".encode('utf-8')]
             
-            consolidated_files.append(output_file)
-            file_counter += 1
-            print(f"Created: {output_file.name} ({len(batch)} transcripts)")
-    
-    # Priority 4: Templates (combine into 1 file)
-    template_files = categories['templates']['files']
-    if template_files:
-        combined_content = []
-        combined_content.append(f"# JK Email and Offer Templates\n")
-        combined_content.append(f"This file contains all email and offer templates.\n\n")
-        combined_content.append("=" * 80 + "\n\n")
-        
-        for file_path in template_files:
-            content = read_file_content(file_path)
-            combined_content.append(f"## TEMPLATE SET: {file_path.stem.replace('_', ' ')}\n\n")
-            combined_content.append(content)
-            combined_content.append("\n\n" + "=" * 80 + "\n\n")
-        
-        output_file = output_dir / f"{file_counter:02d}_All_Templates.txt"
-        with open(output_file, 'w', encoding='utf-8') as f:
-            f.write(''.join(combined_content))
+            filename = f"{len(consolidated_files) + 1:02d}_{name}{f'_{part}' if part else ''}.txt"
+            head = f"{header}{SEPARATOR}{RULE}".encode('utf-8')
+            writer.write_parts(filename, [head] + parts)
+            consolidated_files.append(output_dir / filename)
+            manifest_files.append({
+                "filename": filename,
+                "tokens": counter.count_joined(texts, token_counts, SEPARATOR),
+                "bytes": None,  # Filled in once written
+                "description": Path(filename).stem.replace('_', ' '),
+                "sources": [f"{source.category}/{source.path.name}" for source in members]
+            })
+            print(f"Created: {filename} ({len(members)} files, {manifest_files[-1]['tokens']:,} tokens)")
         
-        consolidated_files.append(output_file)
-        file_counter += 1
-        print(f"Created: {output_file.name} ({len(template_files)} template sets)")
-    
-    # Priority 5: Guides (combine into 1 file)
-    guide_files = categories['guides']['files']
-    if guide_files:
-        combined_content = []
-        combined_content.append(f"# JK Implementation Guides\n")
-        combined_content.append(f"This file contains all implementation guides and SOPs.\n\n")
-        combined_content.append("=" * 80 + "\n\n")
-        
-        for file_path in guide_files:
-            content = read_file_content(file_path)
-            combined_content.append(f"## GUIDE: {file_path.stem.replace('_', ' ')}\n\n")
-            combined_content.append(content)
-            combined_content.append("\n\n" + "=" * 80 + "\n\n")
-        
-        output_file = output_dir / f"{file_counter:02d}_All_Guides.txt"
-        with open(output_file, 'w', encoding='utf-8') as f:
-            f.write(''.join(combined_content))
-        
-        consolidated_files.append(output_file)
-        file_counter += 1
-        print(f"Created: {output_file.name} ({len(guide_files)} guides)")
-    
-    # Create new manifest
-    manifest = {
-        "generated": "2025-07-07",
-        "description": "Consolidated files for LibreChat upload (within 30 file limit)",
-        "total_files": len(consolidated_files),
-        "original_files": total_files,
-        "files": []
-    }
-    
-    for file_path in consolidated_files:
-        content = read_file_content(file_path)
-        manifest["files"].append({
-            "filename": file_path.name,
-            "approximate_tokens": int(len(content.split()) * 1.3),
-            "description": file_path.stem.replace('_', ' ')
-        })
-    
-    # Save manifest
-    manifest_path = output_dir / "consolidated_manifest.json"
-    with open(manifest_path, 'w', encoding='utf-8') as f:
-        json.dump(manifest, f, indent=2)
+        writer.wait()
+        for entry in manifest_files:
+            entry["bytes"] = writer.sizes[entry["filename"]]
+        manifest = {
+            "generated": datetime.now().isoformat(),
+            "description": f"Consolidated files for LibreChat upload (within {max_files} file limit)",
+            "limits": {"max_files": max_files, "max_tokens": max_tokens, "max_bytes": max_bytes},
+            "total_files": len(consolidated_files),
+            "original_files": len(sources),
+            "files": manifest_files
+        }
+        manifest_path = output_dir / "consolidated_manifest.json"
+        writer.write(manifest_path.name, json.dumps(manifest, indent=2).encode('utf-8'))
     
     print(f"\nConsolidation complete!")
-    print(f"Original files: {total_files}")
+    print(f"Original files: {len(sources)}")
     print(f"Consolidated into: {len(consolidated_files)} files")
     print(f"Manifest saved to: {manifest_path}")
+    print(f"Written: {writer.stats['bytes_written'] / 1e6:.1f} MB at {writer.throughput_mb_s():.1f} MB/s")
     
     return consolidated_files
 
-if __name__ == "__main__":
-    input_dir = Path("output/for_upload")
-    output_dir = Path("output/consolidated_for_librechat")
+
+def _check_replaceable(output_dir: Path):
+    """Refuse to replace a directory holding anything but an earlier run's files and manifest."""
+    if not output_dir.exists():
+        return
+    manifest_path = output_dir / "consolidated_manifest.json"
+    written = {manifest_path.name}
+    if manifest_path.is_file():
+        try:
+            written.update(entry["filename"] for entry in json.loads(manifest_path.read_text())["files"])
+        except (ValueError, KeyError, TypeError):
+            pass  # Not a manifest we wrote; only its own name is ours
+    others = sorted(path.name for path in output_dir.iterdir() if path.name not in written)
+    if others:
+        raise ValueError(
+            f"{output_dir} would be replaced but holds files this script didn't write "
+            f"({', '.join(others[:5])}{', ...' if len(others) > 5 else ''}); choose another --output-dir"
+        )
+
+
+def _collect_sources(input_dir: Path) -> List[SourceFile]:
+    """Every category file in priority order, with its section's tokens and bytes."""
+    counter = get_token_counter()
+    # The join from a rule into the next heading is the same for every section
+    rule_join = counter.count_joined([RULE, "## FILE"], [counter.count(RULE), counter.count("## FILE")], SEPARATOR)
+    rule_join -= counter.count(RULE) + counter.count("## FILE")
     
-    # Run consolidation
-    consolidated_files = consolidate_files(input_dir, output_dir, target_files=25)
+    sources = []
+    for category, (_, _, heading, _) in CATEGORIES.items():
+        for path in sorted((input_dir / category).glob("*.md")):
+            data = path.read_bytes()
+            text = data.decode('utf-8')
+            ends = text if len(text) <= 2 * _JOIN_CONTEXT else text[:_JOIN_CONTEXT] + text[-_JOIN_CONTEXT:]
+            source = SourceFile(
+                category=category,
+                path=path,
+                heading=f"## {heading}: {path.stem.replace('_', ' ')}",
+                ends=ends,
+                content_tokens=counter.count(text),
+                content_bytes=len(data)
+            )
+            pieces = [source.heading, source.ends, RULE]
+            counts = [counter.count(source.heading), source.content_tokens, counter.count(RULE)]
+            source.tokens = counter.count_joined(pieces, counts, SEPARATOR) + rule_join
+            source.bytes = 3 * len(SEPARATOR) + len(source.heading.encode('utf-8')) + len(data) + len(RULE)
+            sources.append(source)
+    return sources
+
+
+def _header(title: str, part: Optional[int], count: int, description: str) -> str:
+    return f"# {title}{f' {part}' if part else ''}\nThis file contains {count} {description}."
+
+
+def _measure_header(count: int, parts: int) -> Tuple[int, int]:
+    """Tokens and bytes of the largest file header (title lines and rule)."""
+    counter = get_token_counter()
+    tokens = size = 0
+    for title, _, _, description in (MIXED, *CATEGORIES.values()):
+        header = _header(title, max(parts, 1), max(count, 1), description)
+        tokens = max(tokens, counter.count_joined([header, RULE], [counter.count(header), counter.count(RULE)], SEPARATOR))
+        size = max(size, len(f"{header}{SEPARATOR}{RULE}".encode('utf-8')))
+    return tokens, size
+
+
+def _split(items: list, starts: Optional[List[int]]) -> List[list]:
+    if not starts:
+        return []
+    ends = starts[1:] + [len(items)]
+    return [items[start:end] for start, end in zip(starts, ends)]
+
+
+@click.command()
+@click.option(
+    '--input-dir',
+    '-i',
+    default='output/for_upload',
+    help='FileGenerator output to consolidate (default: output/for_upload)',
+    type=click.Path(exists=True, file_okay=False)
+)
+@click.option(
+    '--output-dir',
+    '-o',
+    default='output/consolidated_for_librechat',
+    help='Directory for the consolidated files, replaced on every run; refused if it holds other files '
+         '(default: output/consolidated_for_librechat)',
+    type=click.Path()
+)
+@click.option(
+    '--max-files',
+    default=25,
+    help='Most files to produce (default: 25)',
+    type=click.IntRange(min=1)
+)
+@click.option(
+    '--max-tokens',
+    default=100_000,
+    help='Largest file in tokens (default: 100000)',
+    type=click.IntRange(min=1000)
+)
+@click.option(
+    '--max-bytes',
+    default=4 * 1024 * 1024,
+    help='Largest file in bytes (default: 4 MiB)',
+    type=click.IntRange(min=4096)
+)
+def main(input_dir, output_dir, max_files, max_tokens, max_bytes):
+    """Consolidate processed files to fit LibreChat's file limit."""
+    try:
+        consolidated_files = consolidate_files(Path(input_dir), Path(output_dir), max_files, max_tokens, max_bytes)
+    except ValueError as e:
+        click.echo(click.style(f"Error: {e}", fg='red'))
+        sys.exit(1)
     
     print("\nFiles ready for upload to LibreChat:")
     for i, file_path in enumerate(consolidated_files, 1):
-        print(f"{i}. {file_path.name}")
\ No newline at end of file
+        print(f"{i}. {file_path.name}")
+
+
+if __name__ == "__main__":
+    main()
@@ -2,41 +2,80 @@
 Content consolidation engine - THE CORE of the system.
 
 This module takes thousands of chunks and intelligently consolidates them into
-50-100 files while preserving ALL content (except exact duplicates).
+50-100 files while preserving ALL content (except exact and near-duplicates).
 """
 
 import hashlib
+import json
 import logging
-from typing import Dict, List, Set, Tuple
 from collections import defaultdict
-import tiktoken
+from dataclasses import dataclass, field
+from itertools import chain
+from pathlib import Path
+from typing import Callable, Dict, Iterable, Iterator, List, Mapping, Optional, Sequence, Set, Tuple
+
+import numpy as np
 
 from .models import ProcessedChunk, ConsolidatedDocument, DocumentType
+from .clustering import CONSOLIDATION_STRATEGIES, TopicClusterer
 from .framework_extractor import Framework
+from .splitters import find_overlap
+from .packing import PACKING_STRATEGIES, allocate_bins, first_fit_decreasing, linear_partition, reuse_groups
+from .dedup import NearDuplicateIndex
+from .tokens import get_token_counter
 
 logger = logging.getLogger(__name__)
 
 
+# Titles of the packed categories (topic files are titled "<category> - <terms>")
+CATEGORY_TITLES = {
+    "core_concepts": "Core Concepts",
+    "transcripts": "Transcripts",
+    "templates": "Templates",
+    "guides": "Guides",
+}
+
+# Bump when the layout of the saved chunk-to-file assignment changes
+ASSIGNMENT_FORMAT_VERSION = 1
+
+
 class ContentTracker:
-    """Tracks content to ensure nothing is lost during consolidation."""
+    """
+    Tracks content volume to ensure nothing is lost during consolidation.
+    
+    Only character and chunk counts are kept (never the text itself), so
+    tracking costs the same on any corpus size.
+    """
     
     def __init__(self):
-        self.original_content = {}
+        self.original_chunk_count = 0
         self.original_char_count = 0
         self.consolidated_char_count = 0
     
-    def record_original_content(self, chunks: List[ProcessedChunk]):
-        """Record all original content for verification."""
+    def record_original_content(self, chunks: Iterable[ProcessedChunk]):
+        """Record the size of original content for verification."""
         for chunk in chunks:
-            self.original_content[chunk.metadata.chunk_id] = chunk.text
+            self.original_chunk_count += 1
             self.original_char_count += len(chunk.text)
     
+    def record_consolidated(self, doc: ConsolidatedDocument):
+        """Record one consolidated document as it is produced."""
+        # Chunk overlap was counted twice in the original content; count it back
+        self.consolidated_char_count += len(doc.content) + doc.overlap_chars_removed
+    
     def verify_no_content_loss(self, consolidated: Dict[str, List[ConsolidatedDocument]]):
         """Verify that no content was lost during consolidation."""
         self.consolidated_char_count = 0
         for docs in consolidated.values():
             for doc in docs:
-                self.consolidated_char_count += len(doc.content)
+                self.record_consolidated(doc)
+        
+        return self.preservation_rate()
+    
+    def preservation_rate(self) -> float:
+        """Log and return consolidated characters as a percentage of the original."""
+        if not self.original_char_count:
+            return 100.0
         
         preservation_rate = (self.consolidated_char_count / self.original_char_count) * 100
         logger.info(f"Content preservation rate: {preservation_rate:.2f}%")
@@ -47,17 +86,75 @@ class ContentTracker:
         return preservation_rate
 
 
+@dataclass
+class SectionLayout:
+    """Token weights and section structure of a category's chunks, in packing order."""
+    weights: List[int] = field(default_factory=list)
+    section_ids: List[int] = field(default_factory=list)  # Section of each chunk
+    section_ends: List[bool] = field(default_factory=list)  # Whether each chunk ends its section
+    titles: List[str] = field(default_factory=list)  # Title of each section
+    keys: List[str] = field(default_factory=list)  # Key of each chunk (see chunk_key), if requested
+    
+    @classmethod
+    def measure(cls, sections: Iterable[Tuple[str, ProcessedChunk]], with_keys: bool = False) -> "SectionLayout":
+        """Lay out (section title, chunk) items; a new section starts when the title changes."""
+        layout = cls()
+        for title, chunk in sections:
+            if not layout.titles or title != layout.titles[-1]:
+                if layout.section_ends:
+                    layout.section_ends[-1] = True
+                layout.titles.append(title)
+            layout.weights.append(chunk.token_count)
+            if with_keys:
+                layout.keys.append(chunk_key(chunk))
+            layout.section_ids.append(len(layout.titles) - 1)
+            layout.section_ends.append(False)
+        
+        if layout.section_ends:
+            layout.section_ends[-1] = True
+        return layout
+
+
+def chunk_key(chunk: ProcessedChunk) -> str:
+    """Identify a chunk by its ID and content, so an edited chunk gets a new key."""
+    digest = hashlib.blake2b(chunk.text.encode('utf-8', 'surrogatepass'), digest_size=8).hexdigest()
+    return f"{chunk.metadata.chunk_id}:{digest}"
+
+
 class ContentConsolidator:
     """THE CORE - Consolidates chunks into optimal documents for upload."""
     
-    def __init__(self, target_file_count: int = 75):
+    def __init__(
+        self,
+        target_file_count: int = 75,
+        deduplication_threshold: float = 0.95,
+        packing_strategy: str = "ordered",
+        consolidation_strategy: str = "source",
+        verify_tokens: bool = False,
+        stable_packing: bool = False
+    ):
+        if packing_strategy not in PACKING_STRATEGIES:
+            raise ValueError(f"Unknown packing strategy: {packing_strategy}")
+        if consolidation_strategy not in CONSOLIDATION_STRATEGIES:
+            raise ValueError(f"Unknown consolidation strategy: {consolidation_strategy}")
+        
         self.target_files = target_file_count
-        self.tokenizer = tiktoken.get_encoding("cl100k_base")
+        self.packing_strategy = packing_strategy  # See packing.PACKING_STRATEGIES
+        self.consolidation_strategy = consolidation_strategy  # See clustering.CONSOLIDATION_STRATEGIES
+        self.topic_clusterer = TopicClusterer()
+        self.verify_tokens = verify_tokens  # Re-encode every document to check summed token totals
+        self.token_verification = {"documents": 0, "mismatched": 0, "max_drift": 0}
+        self.token_counter = get_token_counter()
         self.min_tokens = 2000
         self.target_tokens = 3500  # Sweet spot
         self.max_tokens = 5000
-        self.deduplication_threshold = 0.95  # Only remove near-exact duplicates
+        self.deduplication_threshold = deduplication_threshold  # Jaccard over word shingles
         self.content_tracker = ContentTracker()
+        self.duplicate_map: Dict[str, List[str]] = {}  # Kept chunk ID -> collapsed chunk IDs
+        self.stable_packing = stable_packing  # Keep files of a loaded previous assignment whose chunks are unchanged
+        self.previous_assignment: Dict[str, List[Dict]] = {}
+        self.assignment: Dict[str, List[Dict]] = {}  # Category -> {filename, title, chunks} of each file
+        self.packing_stats = {"files_kept": 0, "files_repacked": 0, "chunks_repacked": 0}
     
     def consolidate_chunks(
         self, 
@@ -70,7 +167,7 @@ class ContentConsolidator:
         Args:
             chunks: All processed chunks
             frameworks: Extracted frameworks (handled separately)
-            
+        
         Returns:
             Dictionary of categorized consolidated documents
         """
@@ -79,87 +176,172 @@ class ContentConsolidator:
         # CRITICAL: Track all content to ensure nothing is lost
         self.content_tracker.record_original_content(chunks)
         
-        # Step 1: Remove only exact duplicates
-        deduplicated_chunks = self._remove_exact_duplicates(chunks)
-        duplicate_count = len(chunks) - len(deduplicated_chunks)
-        logger.info(f"Removed {duplicate_count} exact duplicates")
+        # Step 1: Remove exact and near-duplicates
+        deduplicated_chunks = self._remove_duplicates(chunks)
         
         # Step 2: Group by document type and semantic similarity
         grouped = self._group_by_type_and_topic(deduplicated_chunks)
         
-        # Step 3: Handle frameworks separately (they get special treatment)
-        framework_docs = []
-        if frameworks:
-            framework_docs = self._consolidate_frameworks(frameworks)
-        
-        # Step 4: Consolidate each group intelligently
+        # Step 3-4: Pack each group into files sized for the target count (frameworks get special treatment)
         consolidated = {
-            "frameworks": framework_docs,
-            "core_concepts": self._consolidate_concepts(grouped.get(DocumentType.BOOK, [])),
-            "transcripts": self._consolidate_transcripts(grouped.get(DocumentType.TRANSCRIPT, [])),
-            "templates": self._consolidate_templates(
-                grouped.get(DocumentType.TEMPLATE, []) + 
-                grouped.get(DocumentType.EMAIL, [])
-            ),
-            "guides": self._consolidate_guides(grouped.get(DocumentType.GUIDE, []))
+            category: list(documents)
+            for category, documents in self._consolidate_groups(grouped, frameworks)
         }
         
-        # Step 5: Optimize file count if needed
-        consolidated = self._optimize_file_count(consolidated)
-        
-        # Step 6: VERIFY no content was lost
+        # Step 5: VERIFY no content was lost
         preservation_rate = self.content_tracker.verify_no_content_loss(consolidated)
         
         # Log final statistics
         total_files = sum(len(docs) for docs in consolidated.values())
         logger.info(f"Consolidation complete: {total_files} files, {preservation_rate:.1f}% content preserved")
+        self._log_token_verification()
         
         return consolidated
     
-    def _remove_exact_duplicates(self, chunks: List[ProcessedChunk]) -> List[ProcessedChunk]:
-        """Remove only exact or near-exact duplicates."""
-        seen_hashes = {}
-        unique_chunks = []
-        duplicate_count = 0
+    def consolidate_stream(
+        self,
+        grouped: Mapping[DocumentType, Iterable[ProcessedChunk]],
+        frameworks: Dict[str, Framework],
+        write: Callable[[str, ConsolidatedDocument], None]
+    ) -> Dict[str, List[ConsolidatedDocument]]:
+        """
+        Consolidate deduplicated chunks category by category, without holding them all.
+        
+        Used by the streaming pipeline together with begin_stream() and
+        filter_duplicates(). Each group is read twice in document order, once
+        to plan the packing and once to build the documents, and every
+        finished document is handed to `write` straight away.
         
+        Args:
+            grouped: Deduplicated chunks per document type, each in
+                (source_file, chunk_index) order
+            frameworks: Extracted frameworks
+            write: Called with (category, document) for every output document
+        
+        Returns:
+            Documents per category in the order they were written, with their
+            content dropped (everything else is kept for reports)
+        """
+        logger.info(f"Streaming consolidation into ~{self.target_files} files")
+        
+        written = defaultdict(list)
+        
+        for category, documents in self._consolidate_groups(grouped, frameworks):
+            for doc in documents:
+                write(category, doc)
+                self.content_tracker.record_consolidated(doc)
+                written[category].append(doc.model_copy(update={"content": ""}))
+        
+        preservation_rate = self.content_tracker.preservation_rate()
+        total_files = sum(len(docs) for docs in written.values())
+        logger.info(f"Consolidation complete: {total_files} files, {preservation_rate:.1f}% content preserved")
+        self._log_token_verification()
+        
+        return dict(written)
+    
+    def load_assignment(self, path: Path):
+        """
+        Load the chunk-to-file assignment saved by a previous run.
+        
+        With stable_packing, files whose chunks are all unchanged are
+        rebuilt from the same chunks under the same filename, and only the
+        remaining chunks are packed afresh. An assignment saved with other
+        packing settings is ignored.
+        """
+        try:
+            saved = json.loads(Path(path).read_text(encoding='utf-8'))
+        except (FileNotFoundError, ValueError):
+            return
+        
+        if saved.get("version") != ASSIGNMENT_FORMAT_VERSION or saved.get("settings") != self._packing_settings():
+            logger.info("Previous file assignment was made with other settings; packing all files afresh")
+            return
+        self.previous_assignment = saved["categories"]
+    
+    def save_assignment(self, path: Path):
+        """Save this run's chunk-to-file assignment for load_assignment()."""
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text(json.dumps({
+            "version": ASSIGNMENT_FORMAT_VERSION,
+            "settings": self._packing_settings(),
+            "categories": self.assignment
+        }), encoding='utf-8')
+    
+    def _packing_settings(self) -> Dict:
+        return {
+            "packing_strategy": self.packing_strategy,
+            "consolidation_strategy": self.consolidation_strategy,
+            "target_files": self.target_files,
+            "min_tokens": self.min_tokens,
+            "target_tokens": self.target_tokens,
+            "max_tokens": self.max_tokens
+        }
+    
+    def begin_stream(self, exact: bool = False):
+        """
+        Reset duplicate tracking before chunks are fed to filter_duplicates().
+        
+        Near-duplicate candidates are verified by their exact shingle Jaccard
+        similarity when exact is set, and otherwise by the MinHash estimate,
+        which keeps memory per kept chunk fixed (the streaming pipeline's
+        choice). The estimate can land on either side of the threshold for
+        pairs close to it, so in-memory and streaming runs may collapse
+        slightly different chunks.
+        """
+        self._seen_hashes = {}
+        self._near_index = NearDuplicateIndex(threshold=self.deduplication_threshold, exact=exact)
+        self._duplicate_counts = {"exact": 0, "near": 0}
+        self.duplicate_map = {}
+    
+    def filter_duplicates(self, chunks: Iterable[ProcessedChunk]) -> Iterator[ProcessedChunk]:
+        """
+        Yield the chunks that are not exact or near-duplicates of any seen before.
+        
+        Duplicates are checked against every chunk passed in since the last
+        begin_stream(), so a corpus can be filtered in pieces. Exact
+        duplicates (after whitespace normalization) are caught by hash;
+        everything else goes through a MinHash/LSH index over word shingles,
+        so the cost stays roughly linear in the number of chunks. Every
+        collapsed chunk ID is recorded in self.duplicate_map under the ID of
+        the chunk that was kept, so content preservation can be audited.
+        """
         for chunk in chunks:
+            chunk_id = chunk.metadata.chunk_id
+            
             # Normalize whitespace for comparison
             normalized = " ".join(chunk.text.split())
             content_hash = hashlib.md5(normalized.encode()).hexdigest()
             
-            if content_hash not in seen_hashes:
-                seen_hashes[content_hash] = chunk
-                unique_chunks.append(chunk)
+            duplicate_of = self._seen_hashes.get(content_hash)
+            if duplicate_of is not None:
+                self._duplicate_counts["exact"] += 1
+            else:
+                duplicate_of = self._near_index.find_or_add(chunk_id, normalized)
+                if duplicate_of is not None:
+                    self._duplicate_counts["near"] += 1
+            
+            if duplicate_of is None:
+                self._seen_hashes[content_hash] = chunk_id
+                yield chunk
             else:
-                # Check if it's truly a duplicate
-                existing = seen_hashes[content_hash]
-                similarity = self._calculate_similarity(chunk.text, existing.text)
-                
-                if similarity < self.deduplication_threshold:
-                    # Not a true duplicate, keep it
-                    unique_chunks.append(chunk)
-                else:
-                    duplicate_count += 1
-                    logger.debug(f"Removed duplicate chunk: {chunk.metadata.chunk_id}")
-        
-        logger.info(f"Removed {duplicate_count} exact duplicates")
+                self.duplicate_map.setdefault(duplicate_of, []).append(chunk_id)
+                logger.debug(f"Collapsed duplicate chunk {chunk_id} into {duplicate_of}")
+    
+    def _remove_duplicates(self, chunks: List[ProcessedChunk]) -> List[ProcessedChunk]:
+        """Remove exact and near-duplicate chunks (see filter_duplicates)."""
+        self.begin_stream(exact=True)
+        unique_chunks = list(self.filter_duplicates(chunks))
+        self.log_duplicates()
         return unique_chunks
     
-    def _calculate_similarity(self, text1: str, text2: str) -> float:
-        """Calculate similarity between two texts."""
-        # Simple character-level similarity
-        if not text1 or not text2:
-            return 0.0
-        
-        # Normalize
-        text1 = " ".join(text1.split()).lower()
-        text2 = " ".join(text2.split()).lower()
-        
-        # Character-level similarity
-        common_chars = sum(1 for c1, c2 in zip(text1, text2) if c1 == c2)
-        max_len = max(len(text1), len(text2))
-        
-        return common_chars / max_len if max_len > 0 else 0.0
+    def log_duplicates(self):
+        """Log how many chunks filter_duplicates() collapsed."""
+        logger.info(
+            f"Removed {self._duplicate_counts['exact']} exact and "
+            f"{self._duplicate_counts['near']} near-duplicates "
+            f"(threshold {self.deduplication_threshold})"
+        )
     
     def _group_by_type_and_topic(
         self, 
@@ -178,11 +360,96 @@ class ContentConsolidator:
         
         return grouped
     
+    def _consolidate_groups(
+        self,
+        grouped: Mapping[DocumentType, Iterable[ProcessedChunk]],
+        frameworks: Dict[str, Framework] = None
+    ) -> Iterator[Tuple[str, Iterable[ConsolidatedDocument]]]:
+        """
+        Yield (category, documents) pairs; documents are produced lazily.
+        
+        Every category but frameworks is packed from its chunks: a first pass
+        measures each category's sections so the file budget can be split
+        across categories, and a second pass builds the documents. With a
+        topic strategy ("semantic" or "hybrid") each category is held in
+        memory while its chunks are reordered by topic.
+        """
+        self.assignment = {}
+        self.packing_stats = {"files_kept": 0, "files_repacked": 0, "chunks_repacked": 0}
+        
+        framework_docs = self._consolidate_frameworks(frameworks) if frameworks else []
+        yield "frameworks", framework_docs
+        
+        layouts = {
+            category: SectionLayout.measure(sections(grouped), self.stable_packing)
+            for category, sections in self._category_sections()
+        }
+        bins = self._optimize_file_count(
+            {category: sum(layout.weights) for category, layout in layouts.items()},
+            len(framework_docs)
+        )
+        
+        for category, sections in self._category_sections():
+            if self.consolidation_strategy == "source":
+                items, layout = sections(grouped), layouts[category]
+            else:
+                items = self._order_by_topic(category, list(sections(grouped)), bins.get(category, 0))
+                layout = SectionLayout.measure(items, self.stable_packing)
+            yield category, self._pack_sections(category, items, layout, bins.get(category, 0))
+    
+    def _category_sections(
+        self
+    ) -> List[Tuple[str, Callable[[Mapping], Iterator[Tuple[str, ProcessedChunk]]]]]:
+        """Packed categories with the function listing their (section title, chunk) items."""
+        return [
+            ("core_concepts", self._concept_sections),
+            ("transcripts", self._transcript_sections),
+            ("templates", self._template_sections),
+            ("guides", self._guide_sections),
+        ]
+    
+    def _order_by_topic(
+        self,
+        category: str,
+        items: List[Tuple[str, ProcessedChunk]],
+        topics: int
+    ) -> List[Tuple[str, ProcessedChunk]]:
+        """
+        Reorder a category's (section title, chunk) items so each topic is contiguous.
+        
+        "semantic" clusters individual chunks, and every topic becomes a
+        section titled after its top terms. "hybrid" clusters whole sections,
+        which keep their chunks and titles. Topics appear in order of their
+        first item, and items within a topic keep document order.
+        """
+        if topics <= 1 or len(items) <= 1:
+            return items
+        
+        if self.consolidation_strategy == "semantic":
+            labels, terms = self.topic_clusterer.cluster([chunk.text for _, chunk in items], topics)
+            titles = [self._topic_title(category, topic, words) for topic, words in enumerate(terms)]
+            items = [(titles[label], chunk) for (_, chunk), label in zip(items, labels)]
+        else:
+            section_ids = np.array(SectionLayout.measure(items).section_ids)
+            section_texts = defaultdict(list)
+            for section, (_, chunk) in zip(section_ids, items):
+                section_texts[section].append(chunk.text)
+            texts = ["\n\n".join(section_texts[section]) for section in range(len(section_texts))]
+            labels = self.topic_clusterer.cluster(texts, topics)[0][section_ids]
+        
+        return [items[i] for i in np.argsort(labels, kind='stable')]
+    
+    @staticmethod
+    def _topic_title(category: str, topic: int, terms: List[str]) -> str:
+        label = CATEGORY_TITLES.get(category, category.replace('_', ' ').title())
+        return f"{label} - {', '.join(terms).title() if terms else f'Topic {topic + 1}'}"
+    
     def _consolidate_frameworks(self, frameworks: Dict[str, Framework]) -> List[ConsolidatedDocument]:
         """Consolidate frameworks - each framework gets its own file."""
         consolidated = []
+        numbers = self._stable_numbers("frameworks", [f"{name} Framework - Complete Guide" for name in frameworks])
         
-        for i, (name, framework) in enumerate(frameworks.items(), 1):
+        for i, (name, framework) in zip(numbers, frameworks.items()):
             # Create comprehensive framework document
             content = f"# {name} Framework\n\n"
             content += f"## Overview\n\n{framework.summary}\n\n"
@@ -201,8 +468,8 @@ class ContentConsolidator:
                 category="frameworks",
                 content=content,
                 source_chunks=framework.source_chunks,
-                source_files=list(set(framework.source_chunks)),  # Unique source files
-                total_tokens=len(self.tokenizer.encode(content)),
+                source_files=list(dict.fromkeys(framework.source_chunks)),  # Unique source files, in order
+                total_tokens=self.token_counter.count(content),
                 keywords=[name.lower(), "framework", "system", "method"],
                 has_duplicates_removed=False,
                 duplicate_count=0
@@ -210,224 +477,264 @@ class ContentConsolidator:
             
             consolidated.append(doc)
         
+        if self.stable_packing:
+            self.assignment["frameworks"] = [
+                {"filename": doc.filename, "title": doc.title, "chunks": doc.source_chunks} for doc in consolidated
+            ]
         return consolidated
     
-    def _consolidate_concepts(
-        self, 
-        book_chunks: List[ProcessedChunk]
-    ) -> List[ConsolidatedDocument]:
-        """Consolidate book chapters and core concepts."""
-        if not book_chunks:
-            return []
-        
-        consolidated = []
-        current_content = []
-        current_tokens = 0
-        current_chapter = None
-        current_sources = []
-        current_files = set()
-        
-        for chunk in book_chunks:
-            chunk_tokens = chunk.token_count
-            chunk_chapter = chunk.metadata.chapter or "General"
-            
-            # Decision point: start new document?
-            should_start_new = False
-            
-            # Start new if chapter changes AND we have enough content
-            if chunk_chapter != current_chapter and current_tokens >= self.min_tokens:
-                should_start_new = True
-            
-            # Start new if adding this would exceed max tokens
-            if current_tokens + chunk_tokens > self.max_tokens:
-                should_start_new = True
-            
-            if should_start_new and current_content:
-                # Save current document
-                doc = self._create_consolidated_doc(
-                    content_list=current_content,
-                    category="core_concepts",
-                    title=f"Core Concepts - {current_chapter or 'Collection'}",
-                    sources=current_sources,
-                    files=list(current_files),
-                    doc_index=len(consolidated)
-                )
-                consolidated.append(doc)
-                
-                # Reset for new document
-                current_content = []
-                current_sources = []
-                current_files = set()
-                current_tokens = 0
-            
-            # Add chunk to current document
-            current_content.append(chunk.text)
-            current_sources.append(chunk.metadata.chunk_id)
-            current_files.add(chunk.metadata.source_file)
-            current_tokens += chunk_tokens
-            current_chapter = chunk_chapter
-        
-        # Don't forget the last document
-        if current_content:
-            doc = self._create_consolidated_doc(
-                content_list=current_content,
-                category="core_concepts",
-                title=f"Core Concepts - {current_chapter or 'Collection'}",
-                sources=current_sources,
-                files=list(current_files),
-                doc_index=len(consolidated)
-            )
-            consolidated.append(doc)
+    def _stable_numbers(
+        self, category: str, titles: List[str], kept: Optional[Dict[int, Dict]] = None
+    ) -> List[int]:
+        """
+        File numbers for a category's documents, reusing the previous run's numbers.
         
-        return consolidated
+        Without stable_packing documents are numbered by position. With it
+        kept documents (by position, their previous assignment entry) keep
+        their number, other documents take the number of a previous file
+        with the same title if it is free, and the rest take the lowest
+        numbers left.
+        """
+        if not self.stable_packing:
+            return list(range(1, len(titles) + 1))
+        
+        kept = kept or {}
+        by_title = defaultdict(list)
+        for entry in self.previous_assignment.get(category, []):
+            by_title[entry["title"]].append(self._file_number(entry["filename"]))
+        
+        numbers = [self._file_number(kept[i]["filename"]) if i in kept else None for i in range(len(titles))]
+        taken = set(number for number in numbers if number is not None)
+        for i, title in enumerate(titles):
+            if numbers[i] is None:
+                numbers[i] = next((number for number in by_title[title] if number not in taken), None)
+                taken.add(numbers[i])
+        
+        free = (number for number in range(1, len(titles) + len(taken) + 1) if number not in taken)
+        return [number if number is not None else next(free) for number in numbers]
     
-    def _consolidate_transcripts(
-        self, 
-        transcript_chunks: List[ProcessedChunk]
-    ) -> List[ConsolidatedDocument]:
-        """Consolidate transcript chunks by session/topic."""
-        if not transcript_chunks:
-            return []
-        
-        # Group by source file (each transcript)
-        by_source = defaultdict(list)
-        for chunk in transcript_chunks:
-            by_source[chunk.metadata.source_file].append(chunk)
-        
-        consolidated = []
-        
-        for source_file, chunks in by_source.items():
-            # Sort by chunk index
-            chunks.sort(key=lambda c: c.metadata.chunk_index)
-            
-            # Combine all chunks from same transcript
-            content_list = [chunk.text for chunk in chunks]
-            sources = [chunk.metadata.chunk_id for chunk in chunks]
-            total_tokens = sum(chunk.token_count for chunk in chunks)
-            
+    @staticmethod
+    def _file_number(filename: str) -> int:
+        return int(filename.split('_', 1)[0])
+    
+    def _concept_sections(self, grouped: Mapping) -> Iterator[Tuple[str, ProcessedChunk]]:
+        """Book chunks in document order, one section per chapter."""
+        for chunk in grouped.get(DocumentType.BOOK, []):
+            yield f"Core Concepts - {chunk.metadata.chapter or 'General'}", chunk
+    
+    def _transcript_sections(self, grouped: Mapping) -> Iterator[Tuple[str, ProcessedChunk]]:
+        """Transcript chunks in document order, one section per session."""
+        for chunk in grouped.get(DocumentType.TRANSCRIPT, []):
             # Extract clean title from filename
-            title = source_file.replace('_', ' ').replace('.txt', '').replace('.pdf', '')
-            title = title.title()
-            
-            # If transcript is too large, split it
-            if total_tokens > self.max_tokens:
-                # Split into multiple documents
-                parts = self._split_large_content(content_list, chunks)
-                for i, (part_content, part_chunks) in enumerate(parts):
-                    doc = self._create_consolidated_doc(
-                        content_list=part_content,
-                        category="transcripts",
-                        title=f"{title} - Part {i+1}",
-                        sources=[c.metadata.chunk_id for c in part_chunks],
-                        files=[source_file],
-                        doc_index=len(consolidated)
-                    )
-                    consolidated.append(doc)
-            else:
-                # Single document for this transcript
-                doc = self._create_consolidated_doc(
-                    content_list=content_list,
-                    category="transcripts",
-                    title=title,
-                    sources=sources,
-                    files=[source_file],
-                    doc_index=len(consolidated)
-                )
-                consolidated.append(doc)
-        
-        return consolidated
+            title = chunk.metadata.source_file.replace('_', ' ').replace('.txt', '').replace('.pdf', '')
+            yield title.title(), chunk
     
-    def _consolidate_templates(
-        self, 
-        template_chunks: List[ProcessedChunk]
-    ) -> List[ConsolidatedDocument]:
-        """Consolidate templates and emails."""
-        if not template_chunks:
-            return []
-        
-        # Group similar templates
-        email_templates = []
-        offer_templates = []
-        other_templates = []
-        
-        for chunk in template_chunks:
+    def _template_sections(self, grouped: Mapping) -> Iterator[Tuple[str, ProcessedChunk]]:
+        """Templates and emails, one section per kind of template."""
+        def kind(chunk: ProcessedChunk) -> str:
             text_lower = chunk.text.lower()
             if "email" in text_lower or "subject:" in text_lower:
-                email_templates.append(chunk)
+                return "Email Templates Collection"
             elif "offer" in text_lower or "package" in text_lower:
-                offer_templates.append(chunk)
-            else:
-                other_templates.append(chunk)
-        
-        consolidated = []
+                return "Offer Templates Collection"
+            return "Business Templates Collection"
+        
+        # One pass per kind keeps each kind's chunks in document order
+        for title in ("Email Templates Collection", "Offer Templates Collection", "Business Templates Collection"):
+            for chunk in chain(grouped.get(DocumentType.TEMPLATE, []), grouped.get(DocumentType.EMAIL, [])):
+                if kind(chunk) == title:
+                    yield title, chunk
+    
+    def _guide_sections(self, grouped: Mapping) -> Iterator[Tuple[str, ProcessedChunk]]:
+        """Guide chunks in document order, one section per guide."""
+        for chunk in grouped.get(DocumentType.GUIDE, []):
+            yield chunk.metadata.source_file.replace('_', ' ').replace('.pdf', '').title(), chunk
+    
+    def _pack_sections(
+        self,
+        category: str,
+        sections: Iterable[Tuple[str, ProcessedChunk]],
+        layout: SectionLayout,
+        bins: int
+    ) -> Iterator[ConsolidatedDocument]:
+        """
+        Pack a category's chunks into documents (see packing).
         
-        # Consolidate email templates
-        if email_templates:
-            doc = self._create_consolidated_doc(
-                content_list=[c.text for c in email_templates],
-                category="templates",
-                title="Email Templates Collection",
-                sources=[c.metadata.chunk_id for c in email_templates],
-                files=list(set(c.metadata.source_file for c in email_templates)),
-                doc_index=0
+        With the "ordered" strategy documents are contiguous runs of chunks
+        and each is yielded as soon as its last chunk is read; "first_fit"
+        needs the whole category before the first document is ready. With
+        stable_packing and a previous assignment, unchanged files are kept
+        and only the remaining chunks are packed (see _repack).
+        """
+        if not layout.weights:
+            return
+        
+        previous = self.previous_assignment.get(category) if self.stable_packing else None
+        if previous:
+            groups, kept = self._repack(layout, bins, previous)
+        else:
+            groups, kept = self._partition(layout.weights, layout.section_ends, bins), {}
+        
+        titles = self._group_titles(layout, groups)
+        for group_index, entry in kept.items():
+            titles[group_index] = entry["title"]
+        numbers = self._stable_numbers(category, titles, kept)
+        
+        if self.stable_packing:
+            self.assignment[category] = [
+                {
+                    "filename": self._doc_filename(number - 1, title),
+                    "title": title,
+                    "chunks": [layout.keys[item] for item in group]
+                }
+                for group, title, number in zip(groups, titles, numbers)
+            ]
+            self.packing_stats["files_kept"] += len(kept)
+            self.packing_stats["files_repacked"] += len(groups) - len(kept)
+            self.packing_stats["chunks_repacked"] += sum(
+                len(group) for group_index, group in enumerate(groups) if group_index not in kept
             )
-            consolidated.append(doc)
         
-        # Consolidate offer templates
-        if offer_templates:
-            doc = self._create_consolidated_doc(
-                content_list=[c.text for c in offer_templates],
-                category="templates",
-                title="Offer Templates Collection",
-                sources=[c.metadata.chunk_id for c in offer_templates],
-                files=list(set(c.metadata.source_file for c in offer_templates)),
-                doc_index=1
-            )
-            consolidated.append(doc)
+        group_of = {}
+        for group_index, group in enumerate(groups):
+            for item in group:
+                group_of[item] = group_index
+        
+        pending = defaultdict(list)
+        for item, (_, chunk) in enumerate(sections):
+            group_index = group_of[item]
+            pending[group_index].append(chunk)
+            if item == groups[group_index][-1]:
+                chunks = pending.pop(group_index)
+                pieces, token_counts, overlap = self._stitch_overlaps(chunks)
+                yield self._create_consolidated_doc(
+                    content_list=pieces,
+                    category=category,
+                    title=titles[group_index],
+                    sources=[c.metadata.chunk_id for c in chunks],
+                    files=list(dict.fromkeys(c.metadata.source_file for c in chunks)),
+                    doc_index=numbers[group_index] - 1,
+                    token_counts=token_counts,
+                    overlap=overlap
+                )
+    
+    def _partition(self, weights: Sequence[int], section_ends: Sequence[bool], bins: int) -> List[Sequence[int]]:
+        """Item indices of each packed group, in item order (see packing)."""
+        if self.packing_strategy == "ordered":
+            starts = linear_partition(weights, bins, self.max_tokens, section_ends)
+            ends = starts[1:] + [len(weights)]
+            return [range(start, end) for start, end in zip(starts, ends)]
+        
+        groups = first_fit_decreasing(weights, bins, self.max_tokens)
+        groups.sort(key=lambda group: group[0])
+        return groups
+    
+    def _repack(
+        self, layout: SectionLayout, bins: int, previous: List[Dict]
+    ) -> Tuple[List[Sequence[int]], Dict[int, Dict]]:
+        """
+        Pack a category around the previous run's files whose chunks are unchanged.
         
-        # Consolidate other templates
-        if other_templates:
-            doc = self._create_consolidated_doc(
-                content_list=[c.text for c in other_templates],
-                category="templates",
-                title="Business Templates Collection",
-                sources=[c.metadata.chunk_id for c in other_templates],
-                files=list(set(c.metadata.source_file for c in other_templates)),
-                doc_index=2
-            )
-            consolidated.append(doc)
+        Those files keep their chunks (see packing.reuse_groups); the chunks
+        left over are packed afresh, each run at the category's average
+        tokens per file.
         
-        return consolidated
+        Returns:
+            - Item indices of each group, in item order
+            - The previous assignment entry of each kept group, by group index
+        """
+        kept, runs = reuse_groups(
+            layout.keys,
+            layout.weights,
+            [entry["chunks"] for entry in previous],
+            self.min_tokens,
+            contiguous=self.packing_strategy == "ordered"
+        )
+        tokens_per_file = sum(layout.weights) / max(bins, 1)
+        
+        groups = [(items, previous[index]) for index, items in kept]
+        for run in runs:
+            weights = [layout.weights[item] for item in run]
+            run_bins = max(round(sum(weights) / tokens_per_file), 1)
+            for group in self._partition(weights, [layout.section_ends[item] for item in run], run_bins):
+                groups.append(([run[i] for i in group], None))
+        groups.sort(key=lambda entry: entry[0][0])
+        
+        return (
+            [items for items, _ in groups],
+            {group_index: entry for group_index, (_, entry) in enumerate(groups) if entry is not None}
+        )
     
-    def _consolidate_guides(
-        self, 
-        guide_chunks: List[ProcessedChunk]
-    ) -> List[ConsolidatedDocument]:
-        """Consolidate guide documents."""
-        if not guide_chunks:
-            return []
-        
-        # Group by source file
-        by_source = defaultdict(list)
-        for chunk in guide_chunks:
-            by_source[chunk.metadata.source_file].append(chunk)
-        
-        # Merge guides from same source
-        consolidated = []
-        for source_file, chunks in by_source.items():
-            chunks.sort(key=lambda c: c.metadata.chunk_index)
-            
-            doc = self._create_consolidated_doc(
-                content_list=[c.text for c in chunks],
-                category="guides",
-                title=source_file.replace('_', ' ').replace('.pdf', '').title(),
-                sources=[c.metadata.chunk_id for c in chunks],
-                files=[source_file],
-                doc_index=len(consolidated)
-            )
-            consolidated.append(doc)
+    def _stitch_overlaps(
+        self, chunks: List[ProcessedChunk]
+    ) -> Tuple[List[str], List[int], Tuple[int, int]]:
+        """
+        Join consecutive chunks of one document, dropping the span they share.
         
-        return consolidated
+        The splitter repeats up to overlap_tokens at the start of each chunk;
+        when a chunk directly follows the previous chunk of its document, that
+        repeated prefix is cut and the two are joined directly. Token counts
+        don't add up across the cut and the seam, so stitched pieces are
+        counted again.
+        
+        Returns:
+            - Text pieces (runs of stitched chunks) to join with "\n\n"
+            - Token count of each piece
+            - (tokens, characters) of overlap removed
+        """
+        pieces, token_counts, stitched = [], [], []
+        removed_tokens = removed_chars = 0
+        previous = None
+        
+        for chunk in chunks:
+            overlap = 0
+            if (previous is not None
+                    and chunk.metadata.document_id == previous.metadata.document_id
+                    and chunk.metadata.chunk_index == previous.metadata.chunk_index + 1):
+                overlap = find_overlap(previous.text, chunk.text)
+            
+            if overlap:
+                pieces[-1] += chunk.text[overlap:]
+                token_counts[-1] += chunk.token_count
+                stitched[-1] = True
+                removed_chars += overlap
+            else:
+                pieces.append(chunk.text)
+                token_counts.append(chunk.token_count)
+                stitched.append(False)
+            previous = chunk
+        
+        for i, piece in enumerate(pieces):
+            if stitched[i]:
+                exact = self.token_counter.count(piece)
+                removed_tokens += token_counts[i] - exact
+                token_counts[i] = exact
+        
+        return pieces, token_counts, (removed_tokens, removed_chars)
+    
+    @staticmethod
+    def _group_titles(layout: SectionLayout, groups: List[Sequence[int]]) -> List[str]:
+        """Title each packed document after the sections it holds."""
+        group_sections = [
+            list(dict.fromkeys(layout.section_ids[item] for item in group)) for group in groups
+        ]
+        parts = defaultdict(int)
+        for sections in group_sections:
+            for section in sections:
+                parts[section] += 1
+        
+        titles = []
+        seen = defaultdict(int)
+        for sections in group_sections:
+            names = [layout.titles[section] for section in sections]
+            if len(sections) == 1 and parts[sections[0]] > 1:
+                seen[sections[0]] += 1
+                titles.append(f"{names[0]} - Part {seen[sections[0]]}")
+            elif len(names) <= 2:
+                titles.append(" & ".join(names))
+            else:
+                titles.append(f"{names[0]} & {len(names) - 1} More")
+        return titles
     
     def _create_consolidated_doc(
         self,
@@ -436,25 +743,29 @@ class ContentConsolidator:
         title: str,
         sources: List[str],
         files: List[str],
-        doc_index: int
+        doc_index: int,
+        token_counts: Sequence[int],
+        overlap: Tuple[int, int] = (0, 0)
     ) -> ConsolidatedDocument:
-        """Create a consolidated document from content pieces."""
+        """
+        Create a consolidated document from content pieces and their token counts.
+        
+        overlap is the (tokens, characters) of chunk overlap already dropped
+        from the pieces (see _stitch_overlaps).
+        """
         # Join content with proper spacing
         content = "\n\n".join(content_list)
         
-        # Calculate tokens
-        total_tokens = len(self.tokenizer.encode(content))
+        # Add up the pieces' tokens; only verification re-encodes the joined text
+        total_tokens = self.token_counter.count_joined(content_list, token_counts, "\n\n")
+        if self.verify_tokens:
+            total_tokens = self._verify_token_count(title, content, total_tokens)
         
         # Extract keywords from content
         keywords = self._extract_doc_keywords(content)
         
-        # Generate filename
-        safe_title = title.replace(' ', '_').replace('-', '_')
-        safe_title = ''.join(c for c in safe_title if c.isalnum() or c == '_')
-        filename = f"{doc_index+1:02d}_{safe_title}.md"
-        
         return ConsolidatedDocument(
-            filename=filename,
+            filename=self._doc_filename(doc_index, title),
             title=title,
             category=category,
             content=content,
@@ -463,9 +774,42 @@ class ContentConsolidator:
             total_tokens=total_tokens,
             keywords=keywords,
             has_duplicates_removed=True,
-            duplicate_count=0  # Will be updated if needed
+            duplicate_count=self._count_collapsed(sources),
+            overlap_tokens_removed=overlap[0],
+            overlap_chars_removed=overlap[1]
         )
     
+    @staticmethod
+    def _doc_filename(doc_index: int, title: str) -> str:
+        safe_title = title.replace(' ', '_').replace('-', '_')
+        safe_title = ''.join(c for c in safe_title if c.isalnum() or c == '_')
+        return f"{doc_index+1:02d}_{safe_title}.md"
+    
+    def _verify_token_count(self, title: str, content: str, estimate: int) -> int:
+        """Exact token count of a document, recording how far the additive total was off."""
+        exact = self.token_counter.count(content)
+        drift = abs(exact - estimate)
+        
+        self.token_verification["documents"] += 1
+        if drift:
+            self.token_verification["mismatched"] += 1
+            self.token_verification["max_drift"] = max(self.token_verification["max_drift"], drift)
+            logger.debug(f"Token total of '{title}' off by {drift} ({estimate} summed, {exact} exact)")
+        
+        return exact
+    
+    def _log_token_verification(self):
+        if self.verify_tokens:
+            check = self.token_verification
+            logger.info(
+                f"Token verification: {check['mismatched']} of {check['documents']} documents "
+                f"differed from their summed chunk counts (max {check['max_drift']} tokens)"
+            )
+    
+    def _count_collapsed(self, sources: List[str]) -> int:
+        """Number of duplicate chunks that were collapsed into the given chunks."""
+        return sum(len(self.duplicate_map.get(chunk_id, ())) for chunk_id in sources)
+    
     def _extract_doc_keywords(self, content: str) -> List[str]:
         """Extract keywords from document content."""
         # Simple keyword extraction
@@ -485,104 +829,22 @@ class ContentConsolidator:
         
         return sorted(list(keywords))[:10]
     
-    def _split_large_content(
-        self, 
-        content_list: List[str], 
-        chunks: List[ProcessedChunk]
-    ) -> List[Tuple[List[str], List[ProcessedChunk]]]:
-        """Split large content into multiple documents."""
-        parts = []
-        current_content = []
-        current_chunks = []
-        current_tokens = 0
-        
-        for content, chunk in zip(content_list, chunks):
-            chunk_tokens = chunk.token_count
-            
-            if current_tokens + chunk_tokens > self.max_tokens and current_content:
-                # Save current part
-                parts.append((current_content, current_chunks))
-                current_content = []
-                current_chunks = []
-                current_tokens = 0
-            
-            current_content.append(content)
-            current_chunks.append(chunk)
-            current_tokens += chunk_tokens
-        
-        # Don't forget the last part
-        if current_content:
-            parts.append((current_content, current_chunks))
-        
-        return parts
-    
-    def _optimize_file_count(
-        self, 
-        consolidated: Dict[str, List[ConsolidatedDocument]]
-    ) -> Dict[str, List[ConsolidatedDocument]]:
-        """Optimize the file count to reach target."""
-        total_files = sum(len(docs) for docs in consolidated.values())
-        
-        logger.info(f"Current file count: {total_files}, target: {self.target_files}")
-        
-        # If we have too many files, merge smallest ones
-        if total_files > self.target_files * 1.2:  # 20% tolerance
-            consolidated = self._merge_small_documents(consolidated)
-        
-        # If we have too few files, consider splitting largest ones
-        elif total_files < self.target_files * 0.5:  # Less than half target
-            logger.warning(f"File count ({total_files}) is much lower than target ({self.target_files})")
-            # Could implement splitting logic here if needed
+    def _optimize_file_count(self, totals: Dict[str, int], fixed_files: int = 0) -> Dict[str, int]:
+        """
+        Plan how many files each packed category gets.
         
-        return consolidated
-    
-    def _merge_small_documents(
-        self, 
-        consolidated: Dict[str, List[ConsolidatedDocument]]
-    ) -> Dict[str, List[ConsolidatedDocument]]:
-        """Merge small documents within same category."""
-        for category, docs in consolidated.items():
-            if len(docs) <= 1:
-                continue
-            
-            # Sort by token count
-            docs.sort(key=lambda d: d.total_tokens)
-            
-            merged_docs = []
-            i = 0
-            
-            while i < len(docs):
-                current_doc = docs[i]
-                
-                # Try to merge with next document if both are small
-                if (i + 1 < len(docs) and 
-                    current_doc.total_tokens < self.min_tokens and
-                    docs[i + 1].total_tokens < self.min_tokens and
-                    current_doc.total_tokens + docs[i + 1].total_tokens <= self.max_tokens):
-                    
-                    # Merge documents
-                    next_doc = docs[i + 1]
-                    merged_content = f"{current_doc.content}\n\n---\n\n{next_doc.content}"
-                    
-                    merged_doc = ConsolidatedDocument(
-                        filename=current_doc.filename,
-                        title=f"{current_doc.title} & {next_doc.title}",
-                        category=category,
-                        content=merged_content,
-                        source_chunks=current_doc.source_chunks + next_doc.source_chunks,
-                        source_files=list(set(current_doc.source_files + next_doc.source_files)),
-                        total_tokens=current_doc.total_tokens + next_doc.total_tokens,
-                        keywords=list(set(current_doc.keywords + next_doc.keywords))[:10],
-                        has_duplicates_removed=True,
-                        duplicate_count=0
-                    )
-                    
-                    merged_docs.append(merged_doc)
-                    i += 2  # Skip next document
-                else:
-                    merged_docs.append(current_doc)
-                    i += 1
-            
-            consolidated[category] = merged_docs
+        The target file count, less the fixed_files already produced (one
+        per framework), is split across categories by their token totals
+        within the min/max token bounds (see packing.allocate_bins).
+        """
+        bins = allocate_bins(totals, self.target_files - fixed_files, self.min_tokens, self.max_tokens)
+        total_files = fixed_files + sum(bins.values())
+        
+        logger.info(f"Planned file count: {total_files}, target: {self.target_files}")
+        if not self.target_files * 0.5 <= total_files <= self.target_files * 1.2:
+            logger.warning(
+                f"File count ({total_files}) is far from target ({self.target_files}); "
+                f"files are kept within {self.min_tokens}-{self.max_tokens} tokens where content allows"
+            )
         
-        return consolidated
\ No newline at end of file
+        return bins
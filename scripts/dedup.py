@@ -0,0 +1,141 @@
+"""
+Near-duplicate detection with MinHash signatures and LSH banding.
+"""
+
+import logging
+from collections import defaultdict
+from typing import Optional, Tuple
+
+import numpy as np
+
+from .similarity import jaccard_many, shingle_hashes
+
+logger = logging.getLogger(__name__)
+
+
+_MERSENNE_PRIME = np.uint64((1 << 61) - 1)
+_MAX_HASH = np.uint64((1 << 32) - 1)
+
+# np.trapz was renamed in NumPy 2.0 and later removed
+_trapezoid = getattr(np, "trapezoid", None) or np.trapz
+
+
+def lsh_parameters(
+    threshold: float,
+    num_perm: int,
+    false_positive_weight: float = 0.2,
+    false_negative_weight: float = 0.8
+) -> Tuple[int, int]:
+    """
+    Choose (bands, rows) for an LSH index.
+    
+    Pairs with Jaccard similarity s become candidates with probability
+    1 - (1 - s^rows)^bands. This picks the split that minimizes the weighted
+    area of false positives (s < threshold) and false negatives
+    (s >= threshold). Misses are weighted higher because every candidate is
+    verified afterwards anyway.
+    """
+    below = np.linspace(0.0, threshold, 100)
+    above = np.linspace(threshold, 1.0, 100)
+    best = (1, num_perm)
+    best_error = float("inf")
+    
+    for rows in range(1, num_perm + 1):
+        bands = num_perm // rows
+        false_positive = _trapezoid(1 - (1 - below ** rows) ** bands, below)
+        false_negative = _trapezoid((1 - above ** rows) ** bands, above)
+        error = false_positive_weight * false_positive + false_negative_weight * false_negative
+        if error < best_error:
+            best, best_error = (bands, rows), error
+    
+    return best
+
+
+class MinHasher:
+    """Computes fixed-size MinHash signatures for hashed shingle sets."""
+    
+    def __init__(self, num_perm: int = 128, seed: int = 1):
+        generator = np.random.RandomState(seed)
+        self.num_perm = num_perm
+        # Coefficients below 2^32 keep a*x + b below 2^64 for 32-bit hashes
+        self.a = generator.randint(1, _MAX_HASH, size=num_perm, dtype=np.uint64)
+        self.b = generator.randint(0, _MAX_HASH, size=num_perm, dtype=np.uint64)
+    
+    def signature(self, hashes: np.ndarray) -> np.ndarray:
+        """MinHash signature of a shingle hash array (32-bit hashes, see shingle_hashes)."""
+        if len(hashes) == 0:
+            return np.full(self.num_perm, _MAX_HASH, dtype=np.uint64)
+        
+        # Universal hashing h(x) = (a*x + b) mod p, one row per permutation; exact in
+        # uint64 because x, a, b < 2^32 keeps a*x + b from wrapping
+        permuted = ((hashes[:, None] * self.a + self.b) % _MERSENNE_PRIME) & _MAX_HASH
+        return permuted.min(axis=0)
+
+
+class NearDuplicateIndex:
+    """
+    MinHash + LSH index that finds earlier near-duplicates of a text.
+    
+    Each text is hashed into `bands` buckets; only texts sharing a bucket are
+    compared, so the cost grows roughly linearly with the number of texts.
+    Candidates are then verified with their exact shingle Jaccard similarity,
+    or, with exact=False, with the Jaccard estimate from their signatures,
+    which keeps memory per indexed text fixed at one signature.
+    """
+    
+    def __init__(
+        self,
+        threshold: float = 0.95,
+        num_perm: int = 128,
+        shingle_size: int = 5,
+        exact: bool = True
+    ):
+        self.threshold = threshold
+        self.shingle_size = shingle_size
+        self.exact = exact
+        self.hasher = MinHasher(num_perm)
+        self.bands, self.rows = lsh_parameters(threshold, num_perm)
+        self._buckets = defaultdict(list)
+        self._keys = []
+        self._shingles = []  # Shingle hashes when exact, else signatures
+    
+    def find_or_add(self, key: str, text: str) -> Optional[str]:
+        """
+        Return the key of an indexed near-duplicate of text, or index it.
+        
+        Args:
+            key: Identifier for text (e.g. a chunk ID)
+            text: Text to check
+        
+        Returns:
+            Key of the earliest matching text, or None if text was new
+        """
+        shingles = shingle_hashes(text, self.shingle_size)
+        signature = self.hasher.signature(shingles)
+        band_keys = [
+            (band, signature[band * self.rows:(band + 1) * self.rows].tobytes())
+            for band in range(self.bands)
+        ]
+        
+        candidates = set()
+        for band_key in band_keys:
+            candidates.update(self._buckets.get(band_key, ()))
+        
+        if candidates:
+            # Earliest indexed match wins so results do not depend on set order
+            positions = sorted(candidates)
+            if self.exact:
+                scores = jaccard_many(shingles, [self._shingles[p] for p in positions])
+            else:
+                # Fraction of agreeing MinHash values estimates the Jaccard similarity
+                scores = (np.stack([self._shingles[p] for p in positions]) == signature).mean(axis=1)
+            matches = np.flatnonzero(scores >= self.threshold)
+            if len(matches):
+                return self._keys[positions[matches[0]]]
+        
+        position = len(self._keys)
+        self._keys.append(key)
+        self._shingles.append(shingles if self.exact else signature.astype(np.uint32))
+        for band_key in band_keys:
+            self._buckets[band_key].append(position)
+        return None
@@ -2,37 +2,58 @@
 Output file generation module.
 """
 
+import hashlib
 import json
 import logging
 from pathlib import Path
-from typing import Dict, List
+from typing import Dict, List, Optional
 from datetime import datetime
 
 from .models import ConsolidatedDocument
+from .tree_writer import TreeWriter
 
 logger = logging.getLogger(__name__)
 
 
 class FileGenerator:
-    """Generates markdown files and manifest for upload."""
+    """
+    Generates markdown files and manifest for upload.
     
-    def __init__(self, output_dir: Path):
+    Output is deterministic (no timestamps in the files), and each file's
+    SHA-256 is recorded in upload_manifest.json. A file whose content hash
+    matches the previous run's is not rewritten, files the run no longer
+    produces are removed, and the added / changed / removed files are
+    listed in upload_delta.json so only those need re-uploading.
+    
+    The for_upload tree is built in a staging directory from a thread pool
+    and swapped into place by finish() (see TreeWriter), so an interrupted
+    run never leaves a partial tree behind; unchanged files are hard-linked
+    from the previous tree.
+    
+    Files are numbered by their position in the category unless renumber is
+    False, in which case documents keep the filenames they were given (see
+    ContentConsolidator's stable_packing).
+    """
+    
+    def __init__(self, output_dir: Path, renumber: bool = True):
         self.output_dir = Path(output_dir)
+        self.renumber = renumber
+        self.writer = TreeWriter(self.output_dir / "for_upload")
         self.categories = ["frameworks", "core_concepts", "transcripts", "templates", "guides"]
         self.stats = {
             "total_files": 0,
             "total_tokens": 0,
             "files_by_category": {},
-            "generation_time": None
+            "generation_time": None,
+            "delta": {"added": [], "changed": [], "removed": [], "unchanged": 0},
+            "writer": {}
         }
+        self._previous_hashes: Dict[str, Optional[str]] = {}  # "category/filename" -> hash (None if unknown)
+        self._hashes: Dict[str, str] = {}  # Files of this run
     
     def generate_files(self, consolidated_docs: Dict[str, List[ConsolidatedDocument]]):
         """Generate all output files organized by category."""
-        logger.info("Generating output files")
-        start_time = datetime.now()
-        
-        # Create output directory structure
-        self._create_directory_structure()
+        self.begin()
         
         # Generate files for each category
         for category in self.categories:
@@ -40,26 +61,129 @@ class FileGenerator:
             if docs:
                 self._generate_category_files(category, docs)
         
-        # Generate upload manifest
+        self.finish(consolidated_docs)
+    
+    def begin(self):
+        """Start a run: create the output directory structure."""
+        logger.info("Generating output files")
+        self._start_time = datetime.now()
+        self._create_directory_structure()
+        self.writer.begin()
+        for category in self.categories:
+            self.writer.mkdir(category)
+        self._previous_hashes = self._load_previous_hashes()
+        self._hashes = {}
+        self.stats["delta"] = {"added": [], "changed": [], "removed": [], "unchanged": 0}
+    
+    def write_document(self, category: str, doc: ConsolidatedDocument):
+        """
+        Write one document as the next file of its category.
+        
+        Lets callers write documents as they are produced (between begin()
+        and finish()) instead of passing them all to generate_files(). The
+        file appears in for_upload once finish() swaps in the new tree.
+        """
+        category_dir = self.output_dir / "for_upload" / category
+        index = self.stats["files_by_category"].get(category, 0) + 1
+        
+        filename = self._numbered(index, doc)
+        filepath = category_dir / filename
+        doc.filename = filename  # Validation and reports refer to the file as written
+        
+        # Generate markdown content with metadata header
+        content = self._format_markdown(doc).encode('utf-8')
+        digest = hashlib.sha256(content).hexdigest()
+        
+        # Write file unless the previous run wrote the same content
+        key = f"{category}/{filename}"
+        self._hashes[key] = digest
+        delta = self.stats["delta"]
+        unchanged = key in self._previous_hashes and self._unchanged(
+            filepath, content, self._previous_hashes[key], digest
+        )
+        if unchanged:
+            delta["unchanged"] += 1
+            self.writer.keep(key)
+        else:
+            delta["changed" if key in self._previous_hashes else "added"].append(key)
+            self.writer.write(key, content)
+        
+        # Update statistics
+        self.stats["total_files"] += 1
+        self.stats["total_tokens"] += doc.total_tokens
+        self.stats["files_by_category"][category] = index
+        
+        logger.info(f"{'Unchanged' if unchanged else 'Created'}: {filename} ({doc.total_tokens} tokens)")
+    
+    def finish(self, consolidated_docs: Dict[str, List[ConsolidatedDocument]]):
+        """
+        Write the upload manifest, swap the new tree into for_upload and log statistics.
+        
+        Only document metadata is used, so consolidated_docs may hold
+        documents whose content has already been dropped.
+        """
+        # Files this run no longer produces are left out of the new tree
+        self.stats["delta"]["removed"] = sorted(set(self._previous_hashes) - set(self._hashes))
+        
+        # Generate upload manifest and delta
         self._generate_upload_manifest(consolidated_docs)
+        self._write_if_changed("upload_delta.json", json.dumps(self.stats["delta"], indent=2).encode('utf-8'))
+        self.writer.commit()
+        self.stats["writer"] = dict(self.writer.stats, mb_per_second=self.writer.throughput_mb_s())
         
         # Log statistics
-        self.stats["generation_time"] = (datetime.now() - start_time).total_seconds()
+        self.stats["generation_time"] = (datetime.now() - self._start_time).total_seconds()
         self._log_statistics()
     
+    def _write_if_changed(self, relative: str, data: bytes):
+        """Write a file of the new tree, or carry the current one over if it already holds data."""
+        current = self.output_dir / "for_upload" / relative
+        if current.is_file() and current.stat().st_size == len(data) and current.read_bytes() == data:
+            self.writer.keep(relative)
+        else:
+            self.writer.write(relative, data)
+    
+    def _numbered(self, index: int, doc: ConsolidatedDocument) -> str:
+        """Filename of the index-th document of its category."""
+        if not self.renumber:
+            return doc.filename
+        return f"{index:02d}_{doc.filename.split('_', 1)[1] if '_' in doc.filename else doc.filename}"
+    
+    def _load_previous_hashes(self) -> Dict[str, Optional[str]]:
+        """Every output file already on disk, with its hash from the previous manifest."""
+        manifest_path = self.output_dir / "for_upload" / "upload_manifest.json"
+        try:
+            manifest = json.loads(manifest_path.read_text(encoding='utf-8'))
+        except (FileNotFoundError, ValueError):
+            manifest = {}
+        
+        recorded = {}
+        for category, details in manifest.get("categories", {}).items():
+            for file_info in details.get("files", []):
+                recorded[f"{category}/{file_info['filename']}"] = file_info.get("sha256")
+        
+        previous = {}
+        for category in self.categories:
+            for filepath in (self.output_dir / "for_upload" / category).glob("*.md"):
+                key = f"{category}/{filepath.name}"
+                previous[key] = recorded.get(key)
+        return previous
+    
+    @staticmethod
+    def _unchanged(filepath: Path, content: bytes, previous_hash: Optional[str], digest: str) -> bool:
+        """Whether the file on disk already holds content."""
+        if previous_hash is None:
+            # Not in the manifest (written before hashes were recorded): hash the file
+            return hashlib.sha256(filepath.read_bytes()).hexdigest() == digest
+        # Trust the manifest unless the file was edited since (its size changed)
+        return previous_hash == digest and filepath.stat().st_size == len(content)
+    
     def _create_directory_structure(self):
         """Create the output directory structure."""
         # Main output directory
         self.output_dir.mkdir(parents=True, exist_ok=True)
         
-        # For upload directory
-        for_upload_dir = self.output_dir / "for_upload"
-        for_upload_dir.mkdir(exist_ok=True)
-        
-        # Category directories
-        for category in self.categories:
-            category_dir = for_upload_dir / category
-            category_dir.mkdir(exist_ok=True)
+        # for_upload and its category directories are staged by the writer (see begin)
         
         # Supporting directories
         (self.output_dir / "processing").mkdir(exist_ok=True)
@@ -68,27 +192,8 @@ class FileGenerator:
     
     def _generate_category_files(self, category: str, docs: List[ConsolidatedDocument]):
         """Generate files for a specific category."""
-        category_dir = self.output_dir / "for_upload" / category
-        
-        self.stats["files_by_category"][category] = 0
-        
-        for i, doc in enumerate(docs, 1):
-            # Update filename with proper numbering
-            filename = f"{i:02d}_{doc.filename.split('_', 1)[1] if '_' in doc.filename else doc.filename}"
-            filepath = category_dir / filename
-            
-            # Generate markdown content with metadata header
-            content = self._format_markdown(doc)
-            
-            # Write file
-            filepath.write_text(content, encoding='utf-8')
-            
-            # Update statistics
-            self.stats["total_files"] += 1
-            self.stats["total_tokens"] += doc.total_tokens
-            self.stats["files_by_category"][category] += 1
-            
-            logger.info(f"Created: {filepath.name} ({doc.total_tokens} tokens)")
+        for doc in docs:
+            self.write_document(category, doc)
     
     def _format_markdown(self, doc: ConsolidatedDocument) -> str:
         """Format document as markdown with metadata header."""
@@ -100,7 +205,6 @@ source_files: {', '.join(doc.source_files[:5])}  # Limit to 5 for readability
 keywords: {', '.join(doc.keywords)}
 token_count: {doc.total_tokens}
 duplicates_removed: {doc.duplicate_count if doc.has_duplicates_removed else 0}
-generated: {datetime.now().isoformat()}
 ---
 
 # {doc.title}
@@ -113,7 +217,6 @@ generated: {datetime.now().isoformat()}
     def _generate_upload_manifest(self, consolidated_docs: Dict[str, List[ConsolidatedDocument]]):
         """Generate manifest file with upload instructions."""
         manifest = {
-            "generated": datetime.now().isoformat(),
             "generator": "RAG Document Processor v1.0",
             "statistics": {
                 "total_files": self.stats["total_files"],
@@ -145,7 +248,7 @@ generated: {datetime.now().isoformat()}
         for category, docs in consolidated_docs.items():
             if not docs:
                 continue
-                
+            
             manifest["categories"][category] = {
                 "file_count": len(docs),
                 "total_tokens": sum(doc.total_tokens for doc in docs),
@@ -154,8 +257,10 @@ generated: {datetime.now().isoformat()}
             
             # Add file details
             for i, doc in enumerate(docs, 1):
+                filename = self._numbered(i, doc)
                 file_info = {
-                    "filename": f"{i:02d}_{doc.filename.split('_', 1)[1] if '_' in doc.filename else doc.filename}",
+                    "filename": filename,
+                    "sha256": self._hashes.get(f"{category}/{filename}"),
                     "title": doc.title,
                     "tokens": doc.total_tokens,
                     "keywords": doc.keywords[:5],  # Top 5 keywords
@@ -164,8 +269,7 @@ generated: {datetime.now().isoformat()}
                 manifest["categories"][category]["files"].append(file_info)
         
         # Write manifest
-        manifest_path = self.output_dir / "for_upload" / "upload_manifest.json"
-        manifest_path.write_text(json.dumps(manifest, indent=2), encoding='utf-8')
+        self._write_if_changed("upload_manifest.json", json.dumps(manifest, indent=2).encode('utf-8'))
         
         # Also create a simple upload guide
         self._generate_upload_guide()
@@ -276,5 +380,17 @@ Check `upload_manifest.json` for detailed file information.
         for category, count in self.stats['files_by_category'].items():
             logger.info(f"  {category}: {count} files")
         
+        delta = self.stats["delta"]
+        logger.info(
+            f"\nUpload delta: {len(delta['added'])} added, {len(delta['changed'])} changed, "
+            f"{len(delta['removed'])} removed, {delta['unchanged']} unchanged (see for_upload/upload_delta.json)"
+        )
+        
+        writer = self.stats["writer"]
+        logger.info(
+            f"Written: {writer['files_written']} files, {writer['bytes_written'] / 1e6:.1f} MB "
+            f"at {writer['mb_per_second']:.1f} MB/s ({writer['files_linked']} unchanged files linked)"
+        )
+        
         logger.info(f"\nGeneration time: {self.stats['generation_time']:.2f} seconds")
         logger.info("="*50)
\ No newline at end of file
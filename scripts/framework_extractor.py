@@ -3,12 +3,15 @@ Framework extraction and special handling module.
 """
 
 import re
+import math
 import logging
 from typing import Dict, List, Optional, Tuple
-from dataclasses import dataclass
+from dataclasses import dataclass, field
 
 from .models import ProcessedChunk, DocumentType, ChunkMetadata
-from .config import FRAMEWORK_PATTERNS
+from .config import CONCEPT_KEYWORDS, FRAMEWORK_NAME_STOPWORDS, KNOWN_FRAMEWORKS
+from .matching import FRAMEWORK_CATEGORIES, get_pattern_matcher
+from .tokens import get_token_counter
 
 logger = logging.getLogger(__name__)
 
@@ -24,33 +27,69 @@ class Framework:
     source_chunks: List[str]
 
 
+@dataclass
+class FrameworkCandidate:
+    """Evidence for a possible framework, gathered before any text is built."""
+    name: str
+    known: bool = False
+    mentions: int = 0
+    capitalized: int = 0  # Mentions written as a proper name ("Growth Engine", not "growth engine")
+    chunks: List[ProcessedChunk] = field(default_factory=list)
+    chunk_mentions: Dict[str, int] = field(default_factory=dict)  # Mentions per chunk ID, in order of first mention
+    structured_chunks: int = 0  # Chunks laid out as a list of components
+    
+    def add(self, chunk: ProcessedChunk, capitalized: bool = False, structured: bool = False):
+        chunk_id = chunk.metadata.chunk_id
+        if chunk_id not in self.chunk_mentions:
+            self.chunk_mentions[chunk_id] = 0
+            self.chunks.append(chunk)
+            self.structured_chunks += structured
+        self.chunk_mentions[chunk_id] += 1
+        self.mentions += 1
+        self.capitalized += capitalized
+    
+    @property
+    def score(self) -> float:
+        """Rank among candidates: known frameworks first, then named, frequent, structured ones."""
+        if self.known:
+            return math.inf
+        capitalized_share = self.capitalized / self.mentions
+        structured_share = self.structured_chunks / len(self.chunks)
+        return capitalized_share * math.log2(1 + self.mentions) * (1 + structured_share)
+
+
+# Lines that introduce a framework component: "1. Energy", "- Energy", "**Energy**:"
+_COMPONENT_LINE = re.compile(r'^\s*(?:\d+\.|[-•]|\*\*[^*\n]+\*\*:)\s*\S', re.MULTILINE)
+
+
 class FrameworkExtractor:
     """Extracts and handles frameworks with special treatment."""
     
-    def __init__(self):
+    def __init__(
+        self,
+        max_frameworks: int = 25,
+        max_chunks_per_framework: int = 12,
+        min_mentions: int = 2,
+        min_capitalized_share: float = 0.5
+    ):
+        self.token_counter = get_token_counter()
+        
+        # Caps on what pattern matches may turn into framework text
+        self.max_frameworks = max_frameworks
+        self.max_chunks_per_framework = max_chunks_per_framework
+        self.min_mentions = min_mentions
+        self.min_capitalized_share = min_capitalized_share
+        self.selection_stats = {"candidates": 0, "selected": 0, "chunks_dropped": 0, "tokens_avoided": 0}
+        
+        # Chunks whose framework hits were recorded during enrichment, and
+        # those that had to be scanned here
+        self.match_stats = {"chunks_reused": 0, "chars_reused": 0, "chunks_scanned": 0, "chars_scanned": 0}
+        
         # Known frameworks in James Kemp's content
-        self.known_frameworks = {
-            "3 E's": {
-                "components": ["Energy", "Earnings", "Experience"],
-                "aliases": ["3Es", "Three E's", "The 3 E's Framework"]
-            },
-            "Daily Client Machine": {
-                "components": ["Daily", "Consistent", "Pipeline"],
-                "aliases": ["DCM", "Daily Client Machine", "Client Machine"]
-            },
-            "Hybrid Offer": {
-                "components": ["High-ticket", "Low-ticket", "Middle-ticket"],
-                "aliases": ["Hybrid", "Hybrid Offer Framework"]
-            },
-            "Sovereign Consultant": {
-                "components": ["Independence", "Expertise", "Positioning"],
-                "aliases": ["Sovereign", "The Sovereign Consultant"]
-            },
-            "$100 Workshop": {
-                "components": ["Entry", "Value", "Upsell"],
-                "aliases": ["100 Dollar Workshop", "Low-ticket Workshop"]
-            }
-        }
+        self.known_frameworks = KNOWN_FRAMEWORKS
+        
+        # Known names, aliases and components, and framework patterns (see matching.py)
+        self.matcher = get_pattern_matcher()
     
     def extract_frameworks(self, chunks: List[ProcessedChunk]) -> Dict[str, Framework]:
         """
@@ -61,61 +100,168 @@ class FrameworkExtractor:
         """
         logger.info(f"Extracting frameworks from {len(chunks)} chunks")
         
-        frameworks = {}
-        
         # First pass: identify chunks containing frameworks
-        framework_chunks = self._identify_framework_chunks(chunks)
+        candidates = self.identify_framework_chunks(chunks)
         
         # Second pass: extract complete frameworks
-        for framework_name, chunk_list in framework_chunks.items():
-            framework = self._build_complete_framework(framework_name, chunk_list)
+        return self.build_frameworks(candidates)
+    
+    def build_frameworks(self, candidates: Dict[str, FrameworkCandidate]) -> Dict[str, Framework]:
+        """Build complete frameworks from the best-scoring candidates."""
+        frameworks = {}
+        
+        for candidate in self.select_candidates(candidates):
+            framework = self._build_complete_framework(candidate.name, candidate.chunks)
             if framework:
-                frameworks[framework_name] = framework
+                frameworks[candidate.name] = framework
         
         logger.info(f"Extracted {len(frameworks)} frameworks")
         return frameworks
     
-    def _identify_framework_chunks(self, chunks: List[ProcessedChunk]) -> Dict[str, List[ProcessedChunk]]:
-        """Identify which chunks contain framework content."""
-        framework_chunks = {}
+    def identify_framework_chunks(
+        self,
+        chunks: List[ProcessedChunk],
+        candidates: Optional[Dict[str, FrameworkCandidate]] = None
+    ) -> Dict[str, FrameworkCandidate]:
+        """
+        Identify which chunks contain framework content.
+        
+        Candidates are keyed by lowercased name, so "Growth System" and
+        "growth system" collect evidence together. Pass the result of an
+        earlier call as candidates to add to it, so a corpus can be scanned
+        one document at a time.
+        
+        Uses the framework_matches MetadataExtractor recorded on each chunk,
+        scanning only chunks that have none.
+        """
+        if candidates is None:
+            candidates = {}
         
         for chunk in chunks:
+            structured = None  # Only looked up for chunks that mention a candidate
+            matches = self._framework_matches(chunk)
+            
             # Check against known frameworks
             for framework_name, info in self.known_frameworks.items():
-                if self._chunk_contains_framework(chunk, framework_name, info):
-                    if framework_name not in framework_chunks:
-                        framework_chunks[framework_name] = []
-                    framework_chunks[framework_name].append(chunk)
+                if self._contains_framework(matches, framework_name, info):
+                    key = framework_name.lower()
+                    if key not in candidates:
+                        candidates[key] = FrameworkCandidate(framework_name, known=True)
+                    candidates[key].known = True
+                    candidates[key].name = framework_name
+                    candidates[key].add(chunk, capitalized=True)
             
             # Check against framework patterns
-            for pattern in FRAMEWORK_PATTERNS:
-                matches = re.findall(pattern, chunk.text, re.IGNORECASE)
-                for match in matches:
-                    framework_name = match[0] if isinstance(match, tuple) else match
-                    if framework_name not in framework_chunks:
-                        framework_chunks[framework_name] = []
-                    if chunk not in framework_chunks[framework_name]:
-                        framework_chunks[framework_name].append(chunk)
-        
-        return framework_chunks
+            for framework_name in matches.get("framework_pattern", ()):
+                key = framework_name.lower()
+                candidate = candidates.get(key)
+                if candidate is None:
+                    candidate = candidates[key] = FrameworkCandidate(framework_name)
+                if candidate.known and chunk.metadata.chunk_id in candidate.chunk_mentions:
+                    continue  # Already counted by the known-framework check
+                if structured is None:
+                    structured = bool(_COMPONENT_LINE.search(chunk.text))
+                capitalized = all(word[0].isupper() or word[0].isdigit() for word in framework_name.split())
+                if capitalized and not candidate.known and not candidate.name[0].isupper():
+                    candidate.name = framework_name  # Prefer the proper-name spelling
+                candidate.add(chunk, capitalized=capitalized, structured=structured)
+        
+        return candidates
     
-    def _chunk_contains_framework(self, chunk: ProcessedChunk, name: str, info: dict) -> bool:
-        """Check if a chunk contains a specific framework."""
-        text = chunk.text
-        
-        # Check main name
-        if name in text:
-            return True
+    def select_candidates(self, candidates: Dict[str, FrameworkCandidate]) -> List[FrameworkCandidate]:
+        """
+        Rank candidates and apply the caps, before any framework text is built.
+        
+        Known frameworks always qualify. Pattern matches need a name that is
+        not made of stopwords or generic concept words, at least min_mentions
+        mentions and mostly proper-name spelling; they are ranked by
+        frequency, capitalization and how many of their chunks list
+        components. A candidate whose chunks all belong to one with a longer
+        name containing it ("Flywheel" inside "Growth Flywheel") is dropped
+        as a duplicate. Each selected framework keeps at most
+        max_chunks_per_framework chunks, those mentioning it most.
+        
+        Tokens of all chunks left out are counted in selection_stats.
+        """
+        generic = set(FRAMEWORK_NAME_STOPWORDS) | set(CONCEPT_KEYWORDS)
         
-        # Check aliases
-        for alias in info.get("aliases", []):
-            if alias in text:
+        def qualifies(candidate: FrameworkCandidate) -> bool:
+            if candidate.known:
                 return True
+            words = re.findall(r"\w+", candidate.name.lower())
+            return (
+                any(word not in generic and not word.isdigit() for word in words)
+                and candidate.mentions >= self.min_mentions
+                and candidate.capitalized >= self.min_capitalized_share * candidate.mentions
+            )
+        
+        eligible = [candidate for candidate in candidates.values() if qualifies(candidate)]
+        duplicates = {
+            candidate.name for candidate in eligible for other in eligible
+            if len(other.name) > len(candidate.name)
+            and candidate.name.lower() in other.name.lower()
+            and candidate.chunk_mentions.keys() <= other.chunk_mentions.keys()
+        }
+        ranked = sorted(
+            (candidate for candidate in eligible if candidate.name not in duplicates),
+            key=lambda candidate: (-candidate.score, -candidate.mentions, candidate.name)
+        )
+        
+        selected = ranked[:self.max_frameworks]
+        kept = {id(candidate) for candidate in selected}
+        tokens_avoided = sum(
+            chunk.token_count
+            for candidate in candidates.values() if id(candidate) not in kept
+            for chunk in candidate.chunks
+        )
+        chunks_dropped = 0
+        for candidate in selected:
+            if len(candidate.chunks) > self.max_chunks_per_framework:
+                # Keep the chunks that mention the framework most, in their original order
+                by_mentions = sorted(
+                    range(len(candidate.chunks)),
+                    key=lambda i: -candidate.chunk_mentions[candidate.chunks[i].metadata.chunk_id]
+                )
+                keep = set(by_mentions[:self.max_chunks_per_framework])
+                dropped = [chunk for i, chunk in enumerate(candidate.chunks) if i not in keep]
+                candidate.chunks = [chunk for i, chunk in enumerate(candidate.chunks) if i in keep]
+                chunks_dropped += len(dropped)
+                tokens_avoided += sum(chunk.token_count for chunk in dropped)
+        
+        self.selection_stats = {
+            "candidates": len(candidates),
+            "selected": len(selected),
+            "chunks_dropped": chunks_dropped,
+            "tokens_avoided": tokens_avoided
+        }
+        logger.info(
+            f"Selected {len(selected)} of {len(candidates)} framework candidates "
+            f"({tokens_avoided:,} framework tokens avoided)"
+        )
+        return selected
+    
+    def _framework_matches(self, chunk: ProcessedChunk) -> Dict[str, List[str]]:
+        """A chunk's recorded framework hits, scanning it if it has none."""
+        matches = chunk.metadata.framework_matches
+        if matches is not None:
+            self.match_stats["chunks_reused"] += 1
+            self.match_stats["chars_reused"] += len(chunk.text)
+            return matches
+        
+        self.match_stats["chunks_scanned"] += 1
+        self.match_stats["chars_scanned"] += len(chunk.text)
+        return self.matcher.texts(chunk.text, FRAMEWORK_CATEGORIES)
+    
+    def _contains_framework(self, matches: Dict[str, List[str]], name: str, info: dict) -> bool:
+        """Check if a chunk's framework hits (see _framework_matches) contain a specific framework."""
+        # Check main name and aliases
+        if matches.get(f"framework:{name}"):
+            return True
         
         # Check if all components are mentioned
         components = info.get("components", [])
         if components:
-            component_count = sum(1 for comp in components if comp in text)
+            component_count = len(set(matches.get(f"framework_component:{name}", ())))
             if component_count >= len(components) * 0.7:  # At least 70% of components
                 return True
         
@@ -275,9 +421,22 @@ class FrameworkExtractor:
         framework_chunks = []
         
         for name, framework in frameworks.items():
+            complete_text = f"# {name} Framework\n\n{framework.complete_text}"
+            component_texts = [
+                f"## {name} Framework - {comp_name}\n\n{comp_text}"
+                for comp_name, comp_text in framework.components.items()
+            ]
+            summary_text = f"## {name} Framework - Summary\n\n{framework.summary}"
+            application_text = f"## {name} Framework - Application\n\n{framework.application}"
+            
+            # Exact counts for all representations in one batch
+            token_counts = self.token_counter.count_batch(
+                [complete_text, *component_texts, summary_text, application_text]
+            )
+            
             # 1. Complete framework chunk
             complete_chunk = ProcessedChunk(
-                text=f"# {name} Framework\n\n{framework.complete_text}",
+                text=complete_text,
                 metadata=ChunkMetadata(
                     chunk_id=f"framework_{name}_complete",
                     document_id=f"framework_{name}",
@@ -290,14 +449,14 @@ class FrameworkExtractor:
                     chunk_index=0,
                     total_chunks_in_section=4
                 ),
-                token_count=int(len(framework.complete_text.split()) * 1.3)  # Rough estimate
+                token_count=token_counts[0]
             )
             framework_chunks.append(complete_chunk)
             
             # 2. Component chunks
-            for i, (comp_name, comp_text) in enumerate(framework.components.items()):
+            for i, comp_name in enumerate(framework.components):
                 comp_chunk = ProcessedChunk(
-                    text=f"## {name} Framework - {comp_name}\n\n{comp_text}",
+                    text=component_texts[i],
                     metadata=ChunkMetadata(
                         chunk_id=f"framework_{name}_component_{i}",
                         document_id=f"framework_{name}",
@@ -310,13 +469,13 @@ class FrameworkExtractor:
                         chunk_index=i + 1,
                         total_chunks_in_section=len(framework.components) + 3
                     ),
-                    token_count=int(len(comp_text.split()) * 1.3)
+                    token_count=token_counts[i + 1]
                 )
                 framework_chunks.append(comp_chunk)
             
             # 3. Summary chunk
             summary_chunk = ProcessedChunk(
-                text=f"## {name} Framework - Summary\n\n{framework.summary}",
+                text=summary_text,
                 metadata=ChunkMetadata(
                     chunk_id=f"framework_{name}_summary",
                     document_id=f"framework_{name}",
@@ -329,13 +488,13 @@ class FrameworkExtractor:
                     chunk_index=len(framework.components) + 1,
                     total_chunks_in_section=len(framework.components) + 3
                 ),
-                token_count=int(len(framework.summary.split()) * 1.3)
+                token_count=token_counts[-2]
             )
             framework_chunks.append(summary_chunk)
             
             # 4. Application chunk
             app_chunk = ProcessedChunk(
-                text=f"## {name} Framework - Application\n\n{framework.application}",
+                text=application_text,
                 metadata=ChunkMetadata(
                     chunk_id=f"framework_{name}_application",
                     document_id=f"framework_{name}",
@@ -348,7 +507,7 @@ class FrameworkExtractor:
                     chunk_index=len(framework.components) + 2,
                     total_chunks_in_section=len(framework.components) + 3
                 ),
-                token_count=int(len(framework.application.split()) * 1.3)
+                token_count=token_counts[-1]
             )
             framework_chunks.append(app_chunk)
         
@@ -2,7 +2,6 @@
 Document loading and classification module.
 """
 
-import re
 from pathlib import Path
 from typing import Tuple, Dict, List, Optional
 import logging
@@ -10,7 +9,9 @@ from unstructured.partition.auto import partition
 from unstructured.documents.elements import Element
 
 from .models import DocumentType
-from .config import CONCEPT_KEYWORDS
+from .config import CONCEPT_KEYWORDS, DOCUMENT_TYPE_MARKERS, DOCUMENT_TYPE_PATTERNS
+from .matching import get_pattern_matcher
+from .parse_cache import ParseCache
 
 logger = logging.getLogger(__name__)
 
@@ -18,8 +19,13 @@ logger = logging.getLogger(__name__)
 class DocumentLoader:
     """Loads and classifies documents from various formats."""
     
-    def __init__(self):
+    def __init__(self, cache: Optional[ParseCache] = None):
         self.supported_extensions = {'.pdf', '.txt', '.md', '.docx'}
+        self.cache = cache
+        self.matcher = get_pattern_matcher()
+        self.document_type_categories = [
+            f"document_type:{doc_type}" for doc_type in (*DOCUMENT_TYPE_MARKERS, *DOCUMENT_TYPE_PATTERNS)
+        ]
     
     async def load_and_classify_document(
         self, file_path: Path
@@ -32,63 +38,96 @@ class DocumentLoader:
             - Document type
             - Metadata dictionary
         """
+        return self.load_document(file_path)
+    
+    def load_document(self, file_path: Path) -> Tuple[str, DocumentType, Dict]:
+        """Synchronous variant of load_and_classify_document (used by worker processes)."""
         logger.info(f"Loading document: {file_path}")
         
-        # Use unstructured for robust parsing
         try:
-            # Try hi_res for PDFs first, fallback to fast if poppler not available
-            if file_path.suffix == ".pdf":
-                try:
-                    # Try hi_res strategy first
-                    elements = partition(
-                        filename=str(file_path),
-                        strategy="hi_res",
-                        include_page_breaks=True,
-                        include_metadata=True
-                    )
-                except Exception as e:
-                    if "poppler" in str(e).lower():
-                        logger.warning(f"Poppler not installed, using fast strategy for {file_path.name}")
-                        # Fallback to fast strategy which doesn't require poppler
-                        elements = partition(
-                            filename=str(file_path),
-                            strategy="fast",
-                            include_page_breaks=True,
-                            include_metadata=True
-                        )
-                    else:
-                        raise
-            else:
-                # Non-PDF files
-                elements = partition(
-                    filename=str(file_path),
-                    strategy="auto",
-                    include_page_breaks=True,
-                    include_metadata=True
-                )
+            parsed = self._parse(file_path)
             
             # Combine all text elements
-            text = "\n".join([str(el) for el in elements])
+            text = "\n".join(parsed["texts"])
             
             # Classify document type
             doc_type = self._classify_document(text, file_path.name)
             
             # Extract metadata
-            metadata = self._extract_metadata(elements, file_path)
+            metadata = self._extract_metadata(parsed, file_path)
             
             logger.info(f"Loaded {file_path.name} as {doc_type} with {len(text)} chars")
             
             return text, doc_type, metadata
-            
+        
         except Exception as e:
             logger.error(f"Error loading {file_path}: {str(e)}")
             raise
     
+    def _parse(self, file_path: Path) -> Dict:
+        """Partition a file, going through the parse cache when one is configured."""
+        # Try hi_res for PDFs first, fallback to fast if poppler not available
+        strategy = "hi_res" if file_path.suffix == ".pdf" else "auto"
+        
+        cache_key = None
+        if self.cache:
+            cache_key = self.cache.key_for(file_path, strategy)
+            parsed = self.cache.get(cache_key)
+            if parsed is not None:
+                logger.info(f"Parse cache hit for {file_path.name}")
+                return parsed
+        
+        elements, used_strategy = self._partition(file_path, strategy)
+        parsed = self._summarize_elements(elements)
+        
+        # A fallback parse isn't what the key names; leave it uncached so hi_res is retried
+        if self.cache and used_strategy == strategy:
+            self.cache.put(cache_key, parsed)
+        
+        return parsed
+    
+    def _partition(self, file_path: Path, strategy: str) -> Tuple[List[Element], str]:
+        """Run unstructured's partition, returning the elements and the strategy that produced them."""
+        # Use unstructured for robust parsing
+        try:
+            return partition(
+                filename=str(file_path),
+                strategy=strategy,
+                include_page_breaks=True,
+                include_metadata=True
+            ), strategy
+        except Exception as e:
+            if strategy == "hi_res" and "poppler" in str(e).lower():
+                logger.warning(f"Poppler not installed, using fast strategy for {file_path.name}")
+                # Fallback to fast strategy which doesn't require poppler
+                return partition(
+                    filename=str(file_path),
+                    strategy="fast",
+                    include_page_breaks=True,
+                    include_metadata=True
+                ), "fast"
+            raise
+    
+    def _summarize_elements(self, elements: List[Element]) -> Dict:
+        """Reduce partition elements to the text and metadata the loader uses."""
+        parsed = {
+            "texts": [],
+            "page_numbers": [],
+            "element_types": []
+        }
+        
+        for element in elements:
+            parsed["texts"].append(str(element))
+            element_metadata = getattr(element, 'metadata', None)
+            parsed["page_numbers"].append(getattr(element_metadata, 'page_number', None))
+            parsed["element_types"].append(type(element).__name__)
+        
+        return parsed
+    
     def _classify_document(self, text: str, filename: str) -> DocumentType:
         """Classify document based on content and filename patterns."""
         
         # Normalize for comparison
-        text_lower = text.lower()
         filename_lower = filename.lower()
         
         # Check filename patterns first
@@ -104,39 +143,38 @@ class DocumentLoader:
         if "guide" in filename_lower or "sop" in filename_lower:
             return DocumentType.GUIDE
         
-        # Check content patterns
-        if any(keyword in text_lower for keyword in ["chapter", "table of contents", "introduction"]):
+        # Check content patterns (one scan finds every marker)
+        found = self.matcher.found(text, self.document_type_categories)
+        if found["document_type:book"]:
             return DocumentType.BOOK
         
         # Count framework indicators
-        framework_count = sum(1 for keyword in ["framework", "system", "method", "process"] 
-                            if keyword in text_lower)
-        
-        if framework_count >= 3:
+        if len(found["document_type:framework"]) >= 3:
             return DocumentType.FRAMEWORK
         
         # Check for transcript patterns
-        if re.search(r'\[[\d:]+\]|\d+:\d+|Speaker:|Q:|A:', text):
+        if found["document_type:transcript"]:
             return DocumentType.TRANSCRIPT
         
         # Check for email patterns
-        if re.search(r'Subject:|From:|To:|Dear\s+\w+|Hi\s+\w+', text):
+        if found["document_type:email"]:
             return DocumentType.EMAIL
         
         # Default to guide for instructional content
-        if any(word in text_lower for word in ["step", "how to", "guide", "instructions"]):
+        if found["document_type:guide"]:
             return DocumentType.GUIDE
         
         # Default to book
         return DocumentType.BOOK
     
-    def _extract_metadata(self, elements: List[Element], file_path: Path) -> Dict:
-        """Extract metadata from document elements."""
+    def _extract_metadata(self, parsed: Dict, file_path: Path) -> Dict:
+        """Extract metadata from parsed document elements."""
+        texts = parsed["texts"]
         metadata = {
             "filename": file_path.name,
             "file_path": str(file_path),
             "file_type": file_path.suffix,
-            "total_elements": len(elements),
+            "total_elements": len(texts),
             "total_pages": 0,
             "title": None,
             "has_images": False,
@@ -144,8 +182,8 @@ class DocumentLoader:
         }
         
         # Extract title from first few elements
-        for i, element in enumerate(elements[:5]):
-            element_text = str(element).strip()
+        for element_text in texts[:5]:
+            element_text = element_text.strip()
             if element_text and len(element_text) > 10 and len(element_text) < 100:
                 # Likely a title
                 metadata["title"] = element_text
@@ -156,18 +194,12 @@ class DocumentLoader:
             metadata["title"] = file_path.stem.replace("_", " ").title()
         
         # Count pages and element types
-        page_numbers = set()
-        for element in elements:
-            if hasattr(element, 'metadata'):
-                if hasattr(element.metadata, 'page_number'):
-                    page_numbers.add(element.metadata.page_number)
-                
-                # Check element type
-                element_type = getattr(element, '__class__.__name__', '')
-                if 'Image' in element_type:
-                    metadata["has_images"] = True
-                elif 'Table' in element_type:
-                    metadata["has_tables"] = True
+        page_numbers = {page for page in parsed["page_numbers"] if page is not None}
+        for element_type in parsed["element_types"]:
+            if 'Image' in element_type:
+                metadata["has_images"] = True
+            elif 'Table' in element_type:
+                metadata["has_tables"] = True
         
         metadata["total_pages"] = len(page_numbers) if page_numbers else 1
         
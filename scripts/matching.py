@@ -0,0 +1,276 @@
+"""
+Single-pass matching of many literal terms and regexes, filed under categories.
+"""
+
+import hashlib
+import json
+import re
+import threading
+from collections import defaultdict
+from operator import itemgetter
+from typing import Collection, Dict, Iterable, List, NamedTuple, Optional, Set, Tuple
+
+import ahocorasick
+
+from .config import (
+    BUSINESS_TERMS, CONCEPT_CATEGORY_INDICATORS, CONCEPT_KEYWORDS, DOCUMENT_TYPE_MARKERS,
+    DOCUMENT_TYPE_PATTERNS, FRAMEWORK_PATTERNS, JK_CONCEPTS, KNOWN_FRAMEWORKS,
+    TRANSCRIPT_TOPIC_KEYWORDS, TRANSCRIPT_TOPIC_PATTERNS
+)
+
+
+class PatternHit(NamedTuple):
+    """One match of a configured term or regex."""
+    category: str
+    pattern: str  # The term or regex as configured
+    text: str  # Matched text; a regex's first group when it has one
+    start: int
+    end: int
+
+
+class _Alternation:
+    """Regexes joined into one alternation, each wrapped in a group that tells which one matched."""
+    
+    def __init__(self, patterns: List[Tuple[str, str]], flags: int = 0):
+        self.patterns = patterns
+        self.flags = flags
+        self._subsets: Dict[frozenset, Optional["_Alternation"]] = {}
+        
+        parts = []
+        self.members = {}  # Index of each regex's wrapping group -> (category, regex, group to report)
+        index = 1
+        for category, pattern in patterns:
+            groups = re.compile(pattern).groups
+            parts.append(f"({pattern})")
+            self.members[index] = (category, pattern, index + 1 if groups else index)
+            index += 1 + groups
+        self.regex = re.compile("|".join(parts), flags)
+    
+    def without(self, excluded: frozenset) -> Optional["_Alternation"]:
+        """Alternation of the regexes not in excluded ((category, regex) pairs); None if none are left."""
+        if excluded not in self._subsets:
+            remaining = [entry for entry in self.patterns if entry not in excluded]
+            self._subsets[excluded] = _Alternation(remaining, self.flags) if remaining else None
+        return self._subsets[excluded]
+
+
+class _CompiledView:
+    """Automata and regex alternations for one selection of categories."""
+    
+    def __init__(self, literals: List[Tuple[str, str, bool]], patterns: List[Tuple[str, str, bool]]):
+        self.folded = self._automaton([(c, t) for c, t, case_sensitive in literals if not case_sensitive], str.lower)
+        self.exact = self._automaton([(c, t) for c, t, case_sensitive in literals if case_sensitive], str)
+        
+        exact_patterns = [(c, p) for c, p, ignore_case in patterns if not ignore_case]
+        folded_patterns = [(c, p) for c, p, ignore_case in patterns if ignore_case]
+        self.exact_regex = _Alternation(exact_patterns) if exact_patterns else None
+        self.folded_regex = _Alternation(folded_patterns) if folded_patterns else None
+        # For texts whose length changes when lowercased, so offsets would not line up
+        self.ignore_case_regex = _Alternation(folded_patterns, re.IGNORECASE) if folded_patterns else None
+    
+    @staticmethod
+    def _automaton(terms: List[Tuple[str, str]], normalize) -> Optional[ahocorasick.Automaton]:
+        if not terms:
+            return None
+        automaton = ahocorasick.Automaton()
+        for category, term in terms:
+            key = normalize(term)
+            entries = automaton.get(key, ())
+            automaton.add_word(key, entries + ((category, term, len(key)),))
+        automaton.make_automaton()
+        return automaton
+    
+    def passes(self, text: str):
+        """(automata, alternations) with the text each runs over."""
+        lowered = text.lower() if self.folded is not None or self.folded_regex is not None else text
+        automata = [(self.folded, lowered), (self.exact, text)]
+        if len(lowered) == len(text):
+            alternations = [(self.folded_regex, lowered), (self.exact_regex, text)]
+        else:
+            alternations = [(self.ignore_case_regex, text), (self.exact_regex, text)]
+        return (
+            [(automaton, haystack) for automaton, haystack in automata if automaton is not None],
+            [(alternation, haystack) for alternation, haystack in alternations if alternation is not None]
+        )
+
+
+class PatternMatcher:
+    """
+    Finds every configured term and regex in a text in one pass.
+    
+    Literal terms go into two Aho-Corasick automata, and regexes into two
+    alternations: the case-insensitive ones run over the lowercased text,
+    the others over the text as written. They are compiled once for each
+    selection of categories a caller scans for, so a scan only walks the
+    hits it asked for. In scan(), literal hits may overlap and regex hits
+    of one alternation are leftmost and non-overlapping, as with
+    re.finditer; found() reports every regex that matches anywhere.
+    
+    Case-insensitive regexes must be written in lowercase (escapes such as
+    \\S aside), since they are matched against lowercased text; that keeps
+    the regex engine's fast literal search, which re.IGNORECASE disables.
+    """
+    
+    def __init__(self):
+        self._literals: List[Tuple[str, str, bool]] = []  # (category, term, case_sensitive)
+        self._patterns: List[Tuple[str, str, bool]] = []  # (category, regex, ignore_case)
+        self._views: Dict[Optional[frozenset], _CompiledView] = {}
+        self._lock = threading.Lock()
+    
+    def add_literals(self, category: str, terms: Iterable[str], case_sensitive: bool = False):
+        """File literal terms under a category."""
+        self._literals.extend((category, term, case_sensitive) for term in terms)
+        self._views.clear()
+    
+    def add_patterns(self, category: str, patterns: Iterable[str], ignore_case: bool = False):
+        """File regexes under a category."""
+        for pattern in patterns:
+            re.compile(pattern)  # Fail here rather than on the first scan
+            if ignore_case and re.sub(r'\\.', '', pattern) != re.sub(r'\\.', '', pattern).lower():
+                raise ValueError(f"Case-insensitive pattern {pattern!r} must be written in lowercase")
+            self._patterns.append((category, pattern, ignore_case))
+        self._views.clear()
+    
+    def fingerprint(self) -> str:
+        """Digest of every term and regex filed so far, with its category and case handling."""
+        tables = {"literals": self._literals, "patterns": self._patterns}
+        return hashlib.sha256(json.dumps(tables).encode()).hexdigest()[:16]
+    
+    def scan(self, text: str, categories: Optional[Collection[str]] = None) -> List[PatternHit]:
+        """
+        Every hit in text, ordered by position.
+        
+        Args:
+            text: Text to scan
+            categories: Only report these categories (default: all)
+        """
+        automata, alternations = self._view(categories).passes(text)
+        hits = []
+        
+        for automaton, haystack in automata:
+            for end, entries in automaton.iter(haystack):
+                for category, term, length in entries:
+                    start = end + 1 - length
+                    hits.append(PatternHit(category, term, text[start:end + 1], start, end + 1))
+        
+        for alternation, haystack in alternations:
+            for match in alternation.regex.finditer(haystack):
+                # The wrapping group of the matching regex closes last
+                category, pattern, group = alternation.members[match.lastindex]
+                start, end = match.span(group)
+                hits.append(PatternHit(category, pattern, text[start:end], match.start(), match.end()))
+        
+        hits.sort(key=lambda hit: hit.start)
+        return hits
+    
+    def texts(self, text: str, categories: Optional[Collection[str]] = None) -> Dict[str, List[str]]:
+        """Matched text of every hit per category, as scan() reports them (cheaper than scan)."""
+        automata, alternations = self._view(categories).passes(text)
+        texts = defaultdict(list)
+        
+        for automaton, haystack in automata:
+            for end, entries in automaton.iter(haystack):
+                for category, _, length in entries:
+                    texts[category].append(text[end + 1 - length:end + 1])
+        
+        for alternation, haystack in alternations:
+            for match in alternation.regex.finditer(haystack):
+                category, _, group = alternation.members[match.lastindex]
+                start, end = match.span(group)
+                texts[category].append(text[start:end])
+        
+        return dict(texts)
+    
+    def found(self, text: str, categories: Optional[Collection[str]] = None) -> Dict[str, Set[str]]:
+        """Distinct terms and regexes found per category (cheaper than scan)."""
+        automata, alternations = self._view(categories).passes(text)
+        found = defaultdict(set)
+        
+        for automaton, haystack in automata:
+            for entries in set(map(itemgetter(1), automaton.iter(haystack))):
+                for category, term, _ in entries:
+                    found[category].add(term)
+        
+        # Search again from each hit without the regexes already found, so
+        # the scan ends as soon as nothing is left to find
+        for alternation, haystack in alternations:
+            seen = set()
+            position = 0
+            current = alternation
+            while current is not None:
+                match = current.regex.search(haystack, position)
+                if match is None:
+                    break
+                category, pattern, _ = current.members[match.lastindex]
+                found[category].add(pattern)
+                seen.add((category, pattern))
+                position = match.start()
+                current = alternation.without(frozenset(seen))
+        
+        return found
+    
+    def _view(self, categories: Optional[Collection[str]]) -> _CompiledView:
+        wanted = None if categories is None else frozenset(categories)
+        view = self._views.get(wanted)
+        if view is None:
+            with self._lock:
+                view = self._views[wanted] = _CompiledView(
+                    [entry for entry in self._literals if wanted is None or entry[0] in wanted],
+                    [entry for entry in self._patterns if wanted is None or entry[0] in wanted]
+                )
+        return view
+
+
+def build_pattern_matcher() -> PatternMatcher:
+    """
+    Matcher for every pattern table in config.py.
+    
+    Categories:
+        concept_keyword, business_term, jk_concept, framework_pattern,
+        concept_category:<category>, framework:<name> (name and aliases),
+        framework_component:<name>, document_type:<type>, transcript_topic:<topic>
+    """
+    matcher = PatternMatcher()
+    matcher.add_literals("concept_keyword", CONCEPT_KEYWORDS)
+    matcher.add_literals("business_term", BUSINESS_TERMS)
+    matcher.add_literals("jk_concept", JK_CONCEPTS, case_sensitive=True)
+    matcher.add_patterns("framework_pattern", FRAMEWORK_PATTERNS, ignore_case=True)
+    
+    for category, indicators in CONCEPT_CATEGORY_INDICATORS.items():
+        matcher.add_literals(f"concept_category:{category}", indicators)
+    
+    for name, info in KNOWN_FRAMEWORKS.items():
+        matcher.add_literals(f"framework:{name}", [name, *info["aliases"]], case_sensitive=True)
+        matcher.add_literals(f"framework_component:{name}", info["components"], case_sensitive=True)
+    
+    for doc_type, markers in DOCUMENT_TYPE_MARKERS.items():
+        matcher.add_literals(f"document_type:{doc_type}", markers)
+    for doc_type, patterns in DOCUMENT_TYPE_PATTERNS.items():
+        matcher.add_patterns(f"document_type:{doc_type}", patterns)
+    
+    for topic, keywords in TRANSCRIPT_TOPIC_KEYWORDS.items():
+        matcher.add_literals(f"transcript_topic:{topic}", keywords)
+    for topic, patterns in TRANSCRIPT_TOPIC_PATTERNS.items():
+        matcher.add_patterns(f"transcript_topic:{topic}", patterns, ignore_case=True)
+    
+    return matcher
+
+
+# What MetadataExtractor records on each chunk for FrameworkExtractor
+FRAMEWORK_CATEGORIES = ["framework_pattern"] + [
+    f"{kind}:{name}" for name in KNOWN_FRAMEWORKS for kind in ("framework", "framework_component")
+]
+
+
+_pattern_matcher: Optional[PatternMatcher] = None
+_pattern_matcher_lock = threading.Lock()
+
+
+def get_pattern_matcher() -> PatternMatcher:
+    """Return the process-wide matcher for the config.py tables, building it on first use."""
+    global _pattern_matcher
+    if _pattern_matcher is None:
+        with _pattern_matcher_lock:
+            if _pattern_matcher is None:
+                _pattern_matcher = build_pattern_matcher()
+    return _pattern_matcher
@@ -8,7 +8,8 @@ from typing import List, Set, Dict
 from collections import Counter
 
 from .models import ProcessedChunk
-from .config import CONCEPT_KEYWORDS, FRAMEWORK_PATTERNS
+from .config import CONCEPT_CATEGORY_INDICATORS, RELATED_CONCEPTS
+from .matching import FRAMEWORK_CATEGORIES, get_pattern_matcher
 
 logger = logging.getLogger(__name__)
 
@@ -17,64 +18,51 @@ class MetadataExtractor:
     """Extracts and enriches metadata from document chunks."""
     
     def __init__(self):
-        # Common business/consulting terms for James Kemp's content
-        self.business_terms = {
-            "consultant", "consulting", "client", "customer", "business",
-            "revenue", "profit", "scale", "leverage", "offer", "service",
-            "framework", "system", "process", "strategy", "tactic",
-            "workshop", "course", "coaching", "mentor", "expert",
-            "sovereign", "transformation", "results", "outcome"
-        }
-        
-        # James Kemp specific concepts
-        self.jk_concepts = {
-            "3 E's", "Energy", "Earnings", "Experience",
-            "Daily Client Machine", "DCM",
-            "Hybrid Offer", "Sovereign Consultant",
-            "3k Code", "$100 Workshop",
-            "Offer Code", "Install Offer"
-        }
+        # Concept keywords, business terms, James Kemp concepts and category
+        # indicators are all found in one pass per chunk (see matching.py)
+        self.matcher = get_pattern_matcher()
+        self.categories = [
+            "concept_keyword", "business_term", "jk_concept",
+            *(f"concept_category:{category}" for category in CONCEPT_CATEGORY_INDICATORS)
+        ]
     
     def enrich_chunks(self, chunks: List[ProcessedChunk]) -> List[ProcessedChunk]:
         """Enrich chunks with extracted metadata."""
         logger.info(f"Enriching metadata for {len(chunks)} chunks")
         
         for chunk in chunks:
+            found = self.matcher.found(chunk.text, self.categories)
+            
+            # Record framework hits in full for FrameworkExtractor, which
+            # would otherwise scan every chunk for them again
+            chunk.metadata.framework_matches = self.matcher.texts(chunk.text, FRAMEWORK_CATEGORIES)
+            
             # Extract keywords
-            chunk.metadata.keywords = self._extract_keywords(chunk.text)
+            chunk.metadata.keywords = self._extract_keywords(chunk.text, found)
             
             # Extract entities (people, concepts, frameworks)
-            chunk.metadata.entities = self._extract_entities(chunk.text)
+            chunk.metadata.entities = self._extract_entities(
+                chunk.text, found, chunk.metadata.framework_matches.get("framework_pattern", [])
+            )
             
             # Categorize concept type
-            chunk.metadata.concept_category = self._categorize_concept(chunk.text)
+            chunk.metadata.concept_category = self._categorize_concept(found)
             
             # Find related concepts
-            chunk.metadata.related_concepts = self._find_related_concepts(chunk.text)
+            chunk.metadata.related_concepts = self._find_related_concepts(chunk.text, found)
         
         return chunks
     
-    def _extract_keywords(self, text: str) -> List[str]:
+    def _extract_keywords(self, text: str, found: Dict[str, Set[str]]) -> List[str]:
         """Extract relevant keywords from text."""
-        # Convert to lowercase for matching
-        text_lower = text.lower()
-        
         keywords = set()
         
-        # Add concept keywords found in text
-        for keyword in CONCEPT_KEYWORDS:
-            if keyword in text_lower:
-                keywords.add(keyword)
-        
-        # Add business terms found in text
-        for term in self.business_terms:
-            if term in text_lower:
-                keywords.add(term)
+        # Add concept keywords and business terms found in text
+        keywords.update(found.get("concept_keyword", ()))
+        keywords.update(found.get("business_term", ()))
         
         # Add specific JK concepts (case-sensitive)
-        for concept in self.jk_concepts:
-            if concept in text:
-                keywords.add(concept.lower())
+        keywords.update(concept.lower() for concept in found.get("jk_concept", ()))
         
         # Extract potential keywords using simple heuristics
         # Look for capitalized phrases (potential concepts)
@@ -86,22 +74,12 @@ class MetadataExtractor:
         # Limit to top 10 keywords
         return sorted(list(keywords))[:10]
     
-    def _extract_entities(self, text: str) -> List[str]:
+    def _extract_entities(self, text: str, found: Dict[str, Set[str]], framework_names: List[str]) -> List[str]:
         """Extract named entities and important concepts."""
-        entities = set()
-        
-        # Extract JK specific concepts
-        for concept in self.jk_concepts:
-            if concept in text:
-                entities.add(concept)
+        entities = set(found.get("jk_concept", ()))
         
-        # Extract framework names using patterns
-        for pattern in FRAMEWORK_PATTERNS:
-            matches = re.findall(pattern, text, re.IGNORECASE)
-            for match in matches:
-                if isinstance(match, tuple):
-                    match = match[0]
-                entities.add(match)
+        # Add framework names matched by the patterns
+        entities.update(framework_names)
         
         # Extract quoted concepts
         quoted = re.findall(r'"([^"]+)"', text)
@@ -115,21 +93,12 @@ class MetadataExtractor:
         
         return sorted(list(entities))[:15]  # Limit to 15 entities
     
-    def _categorize_concept(self, text: str) -> str:
+    def _categorize_concept(self, found: Dict[str, Set[str]]) -> str:
         """Categorize the type of concept in the chunk."""
-        text_lower = text.lower()
-        
-        # Count occurrences of category indicators
-        categories = {
-            "framework": ["framework", "system", "model", "structure"],
-            "strategy": ["strategy", "approach", "method", "plan"],
-            "tactic": ["tactic", "technique", "tip", "hack", "tool"],
-            "mindset": ["mindset", "belief", "principle", "philosophy", "thinking"]
-        }
-        
+        # Count distinct category indicators
         category_scores = {}
-        for category, indicators in categories.items():
-            score = sum(1 for indicator in indicators if indicator in text_lower)
+        for category in CONCEPT_CATEGORY_INDICATORS:
+            score = len(found.get(f"concept_category:{category}", ()))
             if score > 0:
                 category_scores[category] = score
         
@@ -139,26 +108,13 @@ class MetadataExtractor:
         
         return "strategy"  # Default
     
-    def _find_related_concepts(self, text: str) -> List[str]:
+    def _find_related_concepts(self, text: str, found: Dict[str, Set[str]]) -> List[str]:
         """Find concepts that are related to the content."""
         related = set()
         
-        # Map of concept relationships
-        concept_map = {
-            "3 E's": ["Energy", "Earnings", "Experience", "leverage", "evaluation"],
-            "Energy": ["3 E's", "passion", "motivation", "burnout"],
-            "Earnings": ["3 E's", "revenue", "profit", "pricing"],
-            "Experience": ["3 E's", "expertise", "results", "transformation"],
-            "Daily Client Machine": ["DCM", "consistency", "pipeline", "acquisition"],
-            "Hybrid Offer": ["offer", "package", "service", "value"],
-            "Sovereign Consultant": ["independence", "freedom", "expertise", "positioning"],
-            "$100 Workshop": ["workshop", "low-ticket", "entry", "funnel"],
-        }
-        
-        # Find which concepts are mentioned
-        for concept, related_concepts in concept_map.items():
-            if concept in text:
-                related.update(related_concepts)
+        # Find which concepts are mentioned (every RELATED_CONCEPTS key is a JK concept)
+        for concept in found.get("jk_concept", ()):
+            related.update(RELATED_CONCEPTS.get(concept, ()))
         
         # Remove concepts that are already in the text
         related = {r for r in related if r not in text}
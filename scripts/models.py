@@ -2,7 +2,7 @@
 Data models for the RAG document processing pipeline.
 """
 
-from pydantic import BaseModel, Field, field_validator
+from pydantic import BaseModel, Field, model_validator
 from typing import List, Dict, Optional, Literal
 from datetime import datetime
 from enum import Enum
@@ -33,17 +33,19 @@ class ChunkMetadata(BaseModel):
     entities: List[str] = Field(default_factory=list)
     concept_category: Optional[Literal["framework", "strategy", "tactic", "mindset"]] = None
     related_concepts: List[str] = Field(default_factory=list)
+    # Every framework pattern and known-framework hit by matcher category (None until enriched)
+    framework_matches: Optional[Dict[str, List[str]]] = None
     chunk_index: int
     total_chunks_in_section: int
     timestamp: datetime = Field(default_factory=datetime.now)
     
-    @field_validator('chunk_id', mode='before')
-    @classmethod
-    def generate_chunk_id(cls, v, info):
-        if not v:
-            content = f"{info.data.get('document_id')}_{info.data.get('chunk_index')}"
-            return hashlib.md5(content.encode()).hexdigest()[:16]
-        return v
+    @model_validator(mode='after')
+    def generate_chunk_id(self):
+        # Runs after field validation so document_id and chunk_index are available
+        if not self.chunk_id:
+            content = f"{self.document_id}_{self.chunk_index}"
+            self.chunk_id = hashlib.md5(content.encode()).hexdigest()[:16]
+        return self
 
 
 class ProcessedChunk(BaseModel):
@@ -66,6 +68,8 @@ class ConsolidatedDocument(BaseModel):
     keywords: List[str]
     has_duplicates_removed: bool = False
     duplicate_count: int = 0
+    overlap_tokens_removed: int = 0  # Chunk overlap dropped when stitching chunks back together
+    overlap_chars_removed: int = 0
 
 
 class ChunkingStrategy(BaseModel):
@@ -86,7 +90,28 @@ class ProcessingConfig(BaseModel):
     target_tokens_per_file: int = 3500
     max_tokens_per_file: int = 5000
     deduplication_threshold: float = 0.95
+    packing_strategy: Literal["ordered", "first_fit"] = "ordered"  # How chunks are packed into files
+    consolidation_strategy: Literal["source", "semantic", "hybrid"] = "source"  # Group chunks by source or topic
+    stable_packing: bool = False  # Keep the previous run's files whose chunks are unchanged; repack only the rest
+    max_frameworks: int = 25  # Frameworks built from the best-scoring candidates
+    max_chunks_per_framework: int = 12  # Source chunks copied into each framework
+    verify_token_counts: bool = False  # Re-encode output documents to check their summed token totals
     preserve_content: bool = True
+    workers: int = 1  # Ingestion worker processes (1 = sequential)
+    use_parse_cache: bool = True
+    clear_parse_cache: bool = False
+    parse_cache_dir: Optional[str] = None  # Defaults to <output_dir>/cache/partition
+    parse_cache_max_mb: int = 1024
+    incremental: bool = True  # Reuse stored chunks of unchanged input documents
+    full_rebuild: bool = False  # Re-ingest every document and repack every file (the chunk store is still refreshed)
+    chunk_store_dir: Optional[str] = None  # Defaults to <output_dir>/cache/chunks
+    streaming: bool = False  # Bounded-memory mode: staged ingestion, spill-to-disk consolidation
+    memory_budget_mb: int = 512  # Chunks buffered in memory before spilling (streaming mode)
+    stream_queue_size: int = 8  # Documents waiting between streaming stages
+    spill_dir: Optional[str] = None  # Defaults to <output_dir>/cache/spill
+    checkpoint: bool = True  # Write a checkpoint after each pipeline stage
+    checkpoint_dir: Optional[str] = None  # Defaults to <output_dir>/cache/checkpoints
+    resume_from: Optional[Literal["loaded", "chunks", "frameworks", "consolidated"]] = None
     verbose: bool = False
 
 
@@ -0,0 +1,298 @@
+"""
+Bin packing of token-weighted chunks into output files.
+"""
+
+import math
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+
+PACKING_STRATEGIES = ("ordered", "first_fit")
+
+# Cutting a section (chapter, transcript, ...) across two files costs as much
+# as a file missing its token target by this fraction of the target
+SECTION_CUT_DEVIATION = 0.25
+
+
+def allocate_bins(
+    totals: Dict[str, int],
+    target_files: int,
+    min_tokens: int,
+    max_tokens: int
+) -> Dict[str, int]:
+    """
+    Split a file budget across categories in proportion to their tokens.
+    
+    Every category gets at least enough files to stay under max_tokens and,
+    where its content allows, few enough to keep files above min_tokens.
+    
+    Args:
+        totals: Token total per category
+        target_files: Files wanted across all categories
+        min_tokens: Smallest desirable file
+        max_tokens: Largest allowed file
+    
+    Returns:
+        Number of files per category (categories without tokens are left out)
+    """
+    grand_total = sum(totals.values())
+    if not grand_total:
+        return {}
+    
+    tokens_per_file = min(max(grand_total / max(target_files, 1), min_tokens), max_tokens)
+    
+    bins = {}
+    for category, total in totals.items():
+        if not total:
+            continue
+        fewest = math.ceil(total / max_tokens)
+        most = max(fewest, total // min_tokens, 1)
+        bins[category] = min(max(round(total / tokens_per_file), fewest), most)
+    
+    return bins
+
+
+def linear_partition(
+    weights: Sequence[int],
+    bins: int,
+    max_tokens: int,
+    section_ends: Optional[Sequence[bool]] = None
+) -> List[int]:
+    """
+    Order-preserving partition of weighted items into about `bins` groups.
+    
+    Dynamic programming over cut points: every group costs its squared
+    deviation from total / bins, plus a fixed penalty when it ends inside a
+    section, and no group exceeds max_tokens unless it is a single item.
+    Only cut points within max_tokens of each other are considered, so the
+    work is O(n * items per group).
+    
+    Args:
+        weights: Token count of each item, in order
+        bins: Number of groups wanted
+        max_tokens: Largest allowed group
+        section_ends: Whether each item is the last of its section (cutting
+            after it is free); defaults to every item
+    
+    Returns:
+        Start index of every group, beginning with 0
+    """
+    n = len(weights)
+    if n == 0:
+        return []
+    
+    prefix = np.zeros(n + 1, dtype=np.float64)
+    np.cumsum(weights, out=prefix[1:])
+    goal = prefix[-1] / max(bins, 1)
+    cut_penalty = (SECTION_CUT_DEVIATION * goal) ** 2
+    
+    # Leftmost start of a group ending before item j that fits in max_tokens
+    lowest = np.searchsorted(prefix, prefix - max_tokens, side='left')
+    
+    cost = np.zeros(n + 1)
+    start = np.zeros(n + 1, dtype=np.int64)
+    for j in range(1, n + 1):
+        lo = min(lowest[j], j - 1)
+        candidates = cost[lo:j] + (prefix[j] - prefix[lo:j] - goal) ** 2
+        best = int(candidates.argmin())
+        start[j] = lo + best
+        cost[j] = candidates[best]
+        if section_ends is not None and j < n and not section_ends[j - 1]:
+            cost[j] += cut_penalty
+    
+    starts = []
+    j = n
+    while j > 0:
+        j = int(start[j])
+        starts.append(j)
+    return starts[::-1]
+
+
+def capped_partition(
+    weights: Sequence[int],
+    sizes: Sequence[int],
+    max_weight: int,
+    max_size: int,
+    max_groups: Optional[int] = None
+) -> Optional[List[int]]:
+    """
+    Order-preserving partition into few groups within a weight and a size cap.
+    
+    Consecutive items are filled greedily into groups within a weight limit
+    and max_size; bisection finds the smallest limit up to max_weight that
+    needs no more groups than allowed, which evens out the groups. An item
+    over a cap on its own gets a group to itself.
+    
+    Args:
+        weights: Token count of each item, in order
+        sizes: Byte size of each item
+        max_weight: Largest allowed group weight
+        max_size: Largest allowed group size
+        max_groups: Most groups allowed (default: the fewest the caps allow)
+    
+    Returns:
+        Start index of every group, beginning with 0, or None if the caps
+        need more than max_groups groups
+    """
+    def fill(limit: int) -> List[int]:
+        starts = [0]
+        weight = size = 0
+        for i, (item_weight, item_size) in enumerate(zip(weights, sizes)):
+            if i > starts[-1] and (weight + item_weight > limit or size + item_size > max_size):
+                starts.append(i)
+                weight = size = 0
+            weight += item_weight
+            size += item_size
+        return starts
+    
+    if not weights:
+        return []
+    fewest = len(fill(max_weight))
+    if max_groups is None:
+        max_groups = fewest
+    elif fewest > max_groups:
+        return None
+    
+    low, high = 1, max_weight
+    while low < high:
+        middle = (low + high) // 2
+        if len(fill(middle)) <= max_groups:
+            high = middle
+        else:
+            low = middle + 1
+    return fill(low)
+
+
+def first_fit_decreasing(weights: Sequence[int], bins: int, max_tokens: int) -> List[List[int]]:
+    """
+    Pack weighted items into about `bins` groups, ignoring their order.
+    
+    Items are placed largest first into the first group that stays within
+    total / bins (capped at max_tokens), else the first that stays within max_tokens, else a new
+    group. A segment tree over the groups' free space finds that group in
+    O(log n), so packing is O(n log n).
+    
+    Returns:
+        Item indices of each non-empty group, each in ascending order
+    """
+    n = len(weights)
+    if n == 0:
+        return []
+    
+    capacity = max(min(math.ceil(sum(weights) / max(bins, 1)), max_tokens), 1)
+    slack = max_tokens - capacity
+    
+    size = 1
+    while size < n:
+        size *= 2
+    # Free space below `capacity` per group; unopened groups are full-size
+    tree = [capacity] * (2 * size)
+    
+    def leftmost(at_least: int) -> int:
+        if tree[1] < at_least:
+            return -1
+        node = 1
+        while node < size:
+            node = 2 * node if tree[2 * node] >= at_least else 2 * node + 1
+        return node - size
+    
+    def take(position: int, amount: int):
+        node = position + size
+        tree[node] -= amount
+        node //= 2
+        while node:
+            tree[node] = max(tree[2 * node], tree[2 * node + 1])
+            node //= 2
+    
+    groups: List[List[int]] = []
+    for i in sorted(range(n), key=lambda i: -weights[i]):
+        weight = weights[i]
+        position = leftmost(weight)
+        if position < 0 or (position == len(groups) and len(groups) >= bins):
+            # Overfill an open group up to max_tokens before exceeding `bins`
+            overfill = leftmost(weight - slack)
+            position = overfill if 0 <= overfill < len(groups) else len(groups)
+        if position == len(groups):
+            groups.append([])
+        groups[position].append(i)
+        take(position, weight)
+    
+    return [sorted(group) for group in groups]
+
+
+def reuse_groups(
+    keys: Sequence[str],
+    weights: Sequence[int],
+    previous: Sequence[Sequence[str]],
+    min_tokens: int,
+    contiguous: bool = True
+) -> Tuple[List[Tuple[int, List[int]]], List[List[int]]]:
+    """
+    Keep the groups of a previous packing whose items are all unchanged.
+    
+    A previous group (the keys of its items) is kept when every key is still
+    present, in the same order, and, if contiguous, its items still form an
+    unbroken run. The remaining items are left to repack: as the runs between
+    kept groups when contiguous, else as one run. A run lighter than
+    min_tokens releases a neighbouring kept group into it (the preceding one
+    first; the lightest when not contiguous) so edits don't leave small
+    groups behind.
+    
+    Args:
+        keys: Key of each item, in order (content-derived, unique)
+        weights: Token count of each item
+        previous: Item keys of each previous group
+        min_tokens: Lightest run left to repack on its own
+        contiguous: Whether groups are runs of consecutive items
+    
+    Returns:
+        - (previous group index, item indices) of every kept group, in item order
+        - Item indices of each run to repack, in item order
+    """
+    position = {key: i for i, key in enumerate(keys)}
+    owner: List[Optional[int]] = [None] * len(keys)
+    kept: Dict[int, List[int]] = {}
+    
+    for index, group in enumerate(previous):
+        items = [position.get(key) for key in group]
+        if not items or None in items or any(b <= a for a, b in zip(items, items[1:])):
+            continue
+        if contiguous and items[-1] - items[0] + 1 != len(items):
+            continue
+        if any(owner[i] is not None for i in items):
+            continue
+        for i in items:
+            owner[i] = index
+        kept[index] = items
+    
+    def release(index: int):
+        for i in kept.pop(index):
+            owner[i] = None
+    
+    while True:
+        if contiguous:
+            # Alternate kept groups and runs of items to repack
+            segments: List[Tuple[Optional[int], List[int]]] = []
+            for i, index in enumerate(owner):
+                if segments and segments[-1][0] == index:
+                    segments[-1][1].append(i)
+                else:
+                    segments.append((index, [i]))
+            runs = [items for index, items in segments if index is None]
+            light = next((
+                s for s, (index, items) in enumerate(segments)
+                if index is None and sum(weights[i] for i in items) < min_tokens and len(segments) > 1
+            ), None)
+            if light is None:
+                break
+            neighbour = segments[light - 1] if light > 0 else segments[light + 1]
+            release(neighbour[0])
+        else:
+            run = [i for i, index in enumerate(owner) if index is None]
+            runs = [run] if run else []
+            if not run or not kept or sum(weights[i] for i in run) >= min_tokens:
+                break
+            release(min(kept, key=lambda index: sum(weights[i] for i in kept[index])))
+    
+    return sorted(kept.items(), key=lambda entry: entry[1][0]), runs
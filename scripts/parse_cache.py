@@ -0,0 +1,127 @@
+"""
+Persistent on-disk cache for unstructured partition results.
+"""
+
+import hashlib
+import json
+import logging
+import os
+from importlib import metadata as importlib_metadata
+from pathlib import Path
+from typing import Dict, Optional
+
+from .models import ProcessingConfig
+
+logger = logging.getLogger(__name__)
+
+
+def _unstructured_version() -> str:
+    """Version of the installed unstructured package (part of every cache key)."""
+    try:
+        return importlib_metadata.version("unstructured")
+    except importlib_metadata.PackageNotFoundError:
+        return "unknown"
+
+
+class ParseCache:
+    """
+    Content-addressed cache of parsed documents.
+    
+    Entries are keyed by the file's content hash, the partition strategy and
+    the unstructured version, so editing a file, switching strategy or
+    upgrading unstructured all miss the cache. The cache is bounded by total
+    size; the least recently used entries are evicted first.
+    """
+    
+    def __init__(self, cache_dir: Path, max_bytes: int = 1024 * 1024 * 1024):
+        self.cache_dir = Path(cache_dir)
+        self.max_bytes = max_bytes
+        self.unstructured_version = _unstructured_version()
+        self.stats = {"hits": 0, "misses": 0, "evictions": 0}
+    
+    @classmethod
+    def from_config(cls, config: ProcessingConfig) -> "ParseCache":
+        """Create the cache described by a processing config."""
+        cache_dir = config.parse_cache_dir or str(Path(config.output_dir) / "cache" / "partition")
+        return cls(Path(cache_dir), max_bytes=config.parse_cache_max_mb * 1024 * 1024)
+    
+    def key_for(self, file_path: Path, strategy: str) -> str:
+        """Build the cache key for a file parsed with a given strategy."""
+        digest = hashlib.sha256()
+        with open(file_path, 'rb') as f:
+            for block in iter(lambda: f.read(1024 * 1024), b''):
+                digest.update(block)
+        
+        digest.update(f"|{strategy}|{self.unstructured_version}".encode())
+        return digest.hexdigest()
+    
+    def get(self, key: str) -> Optional[Dict]:
+        """Return the cached parse result for a key, or None on a miss."""
+        entry_path = self._entry_path(key)
+        
+        try:
+            parsed = json.loads(entry_path.read_text(encoding='utf-8'))
+        except (FileNotFoundError, ValueError):
+            self.stats["misses"] += 1
+            return None
+        
+        # Touch the entry so eviction sees it as recently used
+        try:
+            os.utime(entry_path)
+        except OSError:
+            pass
+        
+        self.stats["hits"] += 1
+        return parsed
+    
+    def put(self, key: str, parsed: Dict):
+        """Store a parse result and evict old entries if over budget."""
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        entry_path = self._entry_path(key)
+        
+        # Write-then-rename so concurrent workers never see partial entries
+        tmp_path = entry_path.with_suffix(f".tmp{os.getpid()}")
+        tmp_path.write_text(json.dumps(parsed), encoding='utf-8')
+        os.replace(tmp_path, entry_path)
+        
+        self._evict()
+    
+    def clear(self):
+        """Remove every cached entry."""
+        if not self.cache_dir.exists():
+            return
+        
+        removed = 0
+        for entry_path in self.cache_dir.glob("*.json"):
+            entry_path.unlink(missing_ok=True)
+            removed += 1
+        
+        logger.info(f"Cleared {removed} entries from parse cache {self.cache_dir}")
+    
+    def _entry_path(self, key: str) -> Path:
+        return self.cache_dir / f"{key}.json"
+    
+    def _evict(self):
+        """Drop least recently used entries until the cache fits its budget."""
+        entries = []
+        total_bytes = 0
+        
+        for entry_path in self.cache_dir.glob("*.json"):
+            try:
+                stat = entry_path.stat()
+            except FileNotFoundError:
+                continue  # Evicted by another worker
+            entries.append((stat.st_mtime, stat.st_size, entry_path))
+            total_bytes += stat.st_size
+        
+        if total_bytes <= self.max_bytes:
+            return
+        
+        entries.sort()
+        for _, size, entry_path in entries:
+            if total_bytes <= self.max_bytes:
+                break
+            entry_path.unlink(missing_ok=True)
+            total_bytes -= size
+            self.stats["evictions"] += 1
+            logger.debug(f"Evicted parse cache entry {entry_path.name}")
@@ -2,25 +2,176 @@
 Main processing pipeline that orchestrates the document processing flow.
 """
 
-import asyncio
+import json
 import logging
+import os
+import shutil
+import tempfile
+from concurrent.futures import Future, ProcessPoolExecutor
+from collections import defaultdict, deque
+from dataclasses import dataclass, field
 from pathlib import Path
-from typing import List, Dict, Optional
+from typing import Callable, Iterator, List, Dict, Optional, Set, Tuple
 from datetime import datetime
 import hashlib
 
-from .models import ProcessingConfig, ProcessedChunk, DocumentType
+from .models import ProcessingConfig, ProcessedChunk, ConsolidatedDocument, DocumentType
 from .loaders import DocumentLoader
+from .parse_cache import ParseCache
+from .chunk_store import ChunkStore
+from .checkpoint import (
+    STAGES, CheckpointStore, NullRecordWriter, chunk_from_record, chunk_to_record,
+    document_from_record, document_to_record, framework_from_record, framework_to_record, pack_record
+)
 from .chunkers import IntelligentChunker
 from .metadata import MetadataExtractor
 from .transcript_cleaner import TranscriptCleaner
-from .framework_extractor import FrameworkExtractor
+from .framework_extractor import Framework, FrameworkExtractor
 from .consolidator import ContentConsolidator
 from .file_generator import FileGenerator
+from .validator import QualityValidator
+from .streaming import SpillManager, StagePipeline, peak_rss_mb
 
 logger = logging.getLogger(__name__)
 
 
+# Statistics stored with the "consolidated" checkpoint (see DocumentProcessor._consolidated_meta)
+_CHECKPOINTED_STATS = (
+    "total_input_files", "total_chunks", "total_frameworks", "framework_selection", "framework_matching",
+    "reused_documents", "recomputed_documents", "retracted_documents", "errors"
+)
+
+
+@dataclass
+class IngestItem:
+    """One document on its way through the ingestion stages."""
+    file_path: Path
+    document_id: str
+    text: Optional[str] = None
+    loaded_text: Optional[str] = None  # Text as loaded, kept for the "loaded" checkpoint
+    loaded_part: Optional[Path] = None  # Or its checkpoint record, packed by a worker
+    doc_type: Optional[DocumentType] = None
+    metadata: Dict = field(default_factory=dict)
+    chunker: Optional[IntelligentChunker] = None
+    chunks: List[ProcessedChunk] = field(default_factory=list)
+    error: Optional[Exception] = None
+
+
+class DocumentIngestor:
+    """Runs load → clean → chunk → enrich for a single document."""
+    
+    def __init__(self, config: ProcessingConfig):
+        self.config = config
+        cache = ParseCache.from_config(config) if config.use_parse_cache else None
+        self.loader = DocumentLoader(cache=cache)
+        self.transcript_cleaner = TranscriptCleaner()
+        self.metadata_extractor = MetadataExtractor()
+        self.keep_loaded = config.checkpoint
+        self.parts_dir = CheckpointStore.from_config(config).parts_dir("loaded")
+    
+    @property
+    def stages(self) -> List[Tuple[str, Callable[[IngestItem], None]]]:
+        """The ingestion stages in order, as (name, function) pairs."""
+        return [
+            ("load", self.load),
+            ("clean", self.clean),
+            ("chunk", self.chunk),
+            ("enrich", self.enrich),
+        ]
+    
+    def ingest(self, file_path: Path, document_id: str) -> List[ProcessedChunk]:
+        """Turn one input file into enriched chunks."""
+        item = IngestItem(file_path=file_path, document_id=document_id)
+        for _, stage in self.stages:
+            stage(item)
+        return item.chunks
+    
+    def ingest_item(self, item: IngestItem) -> IngestItem:
+        """Run every stage on an item, recording a failure on item.error."""
+        try:
+            for _, stage in self.stages:
+                stage(item)
+        except Exception as e:
+            item.error = e
+        item.chunker = None
+        return item
+    
+    def pack_loaded(self, item: IngestItem):
+        """Move the loaded text into a packed "loaded" record on disk for the parent to append."""
+        self.parts_dir.mkdir(parents=True, exist_ok=True)
+        fd, path = tempfile.mkstemp(suffix=".part", dir=self.parts_dir)
+        with os.fdopen(fd, 'wb') as f:
+            f.write(pack_record(self.loaded_record(item)))
+        item.loaded_part = Path(path)
+    
+    @staticmethod
+    def loaded_record(item: IngestItem) -> Dict:
+        """Checkpoint record of a loaded document (the loaded text is released)."""
+        record = {
+            "file": item.file_path.name,
+            "document_id": item.document_id,
+            "text": item.loaded_text,
+            "doc_type": item.doc_type.value,
+            "metadata": item.metadata
+        }
+        item.loaded_text = None
+        return record
+    
+    def load(self, item: IngestItem):
+        """Load and classify document (skipped for text restored from a checkpoint)."""
+        if item.text is not None:
+            return
+        item.text, item.doc_type, item.metadata = self.loader.load_document(item.file_path)
+        if self.keep_loaded:
+            item.loaded_text = item.text
+    
+    def clean(self, item: IngestItem):
+        """Clean transcripts."""
+        if item.doc_type == DocumentType.TRANSCRIPT:
+            logger.info("Cleaning transcript...")
+            item.text = self.transcript_cleaner.clean_transcript(item.text)
+    
+    def chunk(self, item: IngestItem):
+        """Chunk the document (the full text is dropped afterwards)."""
+        item.chunker = IntelligentChunker()
+        item.chunks = item.chunker.chunk_document(
+            text=item.text,
+            doc_type=item.doc_type,
+            document_id=item.document_id,
+            source_file=item.file_path.name,
+            metadata=item.metadata
+        )
+        item.text = None
+    
+    def enrich(self, item: IngestItem):
+        """Enrich metadata and merge small chunks if needed."""
+        chunks = self.metadata_extractor.enrich_chunks(item.chunks)
+        item.chunks = item.chunker.merge_small_chunks(chunks)
+
+
+# Per-process ingestor used by the worker pool (set by _init_worker)
+_worker_ingestor: Optional[DocumentIngestor] = None
+
+
+def _init_worker(config: ProcessingConfig):
+    """Build the ingestion components once per worker process."""
+    global _worker_ingestor
+    _worker_ingestor = DocumentIngestor(config)
+
+
+def _ingest_in_worker(item: IngestItem) -> IngestItem:
+    """
+    Worker entry point - must live at module level to be picklable.
+    
+    The parent only copies the loaded text into the "loaded" checkpoint, so
+    it is written out here instead of being sent back.
+    """
+    item = _worker_ingestor.ingest_item(item)
+    if item.loaded_text is not None:
+        _worker_ingestor.pack_loaded(item)
+    return item
+
+
 class DocumentProcessor:
     """Main pipeline for processing documents into consolidated files."""
     
@@ -29,13 +180,34 @@ class DocumentProcessor:
         self.input_dir = Path(config.input_dir)
         self.output_dir = Path(config.output_dir)
         
+        if config.clear_parse_cache:
+            ParseCache.from_config(config).clear()
+        
         # Initialize components
-        self.loader = DocumentLoader()
-        self.metadata_extractor = MetadataExtractor()
-        self.transcript_cleaner = TranscriptCleaner()
-        self.framework_extractor = FrameworkExtractor()
-        self.consolidator = ContentConsolidator(target_file_count=config.target_file_count)
-        self.file_generator = FileGenerator(self.output_dir)
+        self.ingestor = DocumentIngestor(config)
+        self.loader = self.ingestor.loader
+        self.metadata_extractor = self.ingestor.metadata_extractor
+        self.transcript_cleaner = self.ingestor.transcript_cleaner
+        self.framework_extractor = FrameworkExtractor(
+            max_frameworks=config.max_frameworks,
+            max_chunks_per_framework=config.max_chunks_per_framework
+        )
+        self.consolidator = ContentConsolidator(
+            target_file_count=config.target_file_count,
+            deduplication_threshold=config.deduplication_threshold,
+            packing_strategy=config.packing_strategy,
+            consolidation_strategy=config.consolidation_strategy,
+            verify_tokens=config.verify_token_counts,
+            stable_packing=config.stable_packing
+        )
+        self.assignment_path = self.output_dir / "cache" / "assignment.json"
+        if config.stable_packing and not config.full_rebuild:
+            self.consolidator.load_assignment(self.assignment_path)
+        self.file_generator = FileGenerator(self.output_dir, renumber=not config.stable_packing)
+        self.validator = QualityValidator(self.output_dir)
+        self.validation_results = None
+        self.chunk_store = ChunkStore.from_config(config) if config.incremental else None
+        self.checkpoints = CheckpointStore.from_config(config)
         
         # Statistics
         self.stats = {
@@ -44,11 +216,27 @@ class DocumentProcessor:
             "total_input_files": 0,
             "total_chunks": 0,
             "total_frameworks": 0,
+            "framework_selection": {},
+            "framework_matching": {},
+            "packing": {},
+            "peak_rss_mb": None,
+            "reused_documents": [],
+            "recomputed_documents": [],
+            "retracted_documents": [],
             "errors": []
         }
     
-    async def process_knowledge_base(self):
-        """Main processing method - orchestrates the entire pipeline."""
+    async def process_knowledge_base(self) -> Optional[Dict[str, List[ConsolidatedDocument]]]:
+        """
+        Main processing method - orchestrates the entire pipeline.
+        
+        Output documents are validated as they are written, into
+        validation_results.
+        
+        Returns:
+            Documents per category as written (content dropped in streaming
+            mode), or None if no chunks were created
+        """
         logger.info("="*60)
         logger.info("STARTING RAG DOCUMENT PROCESSING PIPELINE")
         logger.info("="*60)
@@ -56,28 +244,17 @@ class DocumentProcessor:
         self.stats["start_time"] = datetime.now()
         
         try:
-            # Step 1: Load and process all documents
-            all_chunks = await self._load_all_documents()
+            # Steps 1-5: Load, extract, consolidate and write
+            if self.config.streaming:
+                consolidated = self._process_streaming()
+            else:
+                consolidated = await self._process_in_memory()
             
-            if not all_chunks:
+            if consolidated is None:
                 logger.error("No chunks created from documents!")
-                return
-            
-            # Step 2: Extract frameworks separately
-            frameworks = self.framework_extractor.extract_frameworks(all_chunks)
-            self.stats["total_frameworks"] = len(frameworks)
-            logger.info(f"Extracted {len(frameworks)} frameworks")
-            
-            # Step 3: Add framework chunks to main chunks
-            framework_chunks = self.framework_extractor.create_framework_chunks(frameworks)
-            all_chunks.extend(framework_chunks)
-            logger.info(f"Total chunks including frameworks: {len(all_chunks)}")
+                return None
             
-            # Step 4: Consolidate chunks into optimal documents
-            consolidated = self.consolidator.consolidate_chunks(all_chunks, frameworks)
-            
-            # Step 5: Generate output files
-            self.file_generator.generate_files(consolidated)
+            self.stats["peak_rss_mb"] = peak_rss_mb()
             
             # Step 6: Generate reports
             await self._generate_reports(consolidated)
@@ -85,11 +262,157 @@ class DocumentProcessor:
             self.stats["end_time"] = datetime.now()
             self._log_final_statistics()
             
+            return consolidated
+        
         except Exception as e:
             logger.error(f"Pipeline error: {str(e)}")
             self.stats["errors"].append(str(e))
             raise
     
+    async def _process_in_memory(self) -> Optional[Dict[str, List[ConsolidatedDocument]]]:
+        """Run steps 1-5 with every chunk of the corpus in memory."""
+        if self._resuming_from("consolidated"):
+            consolidated = defaultdict(list)
+            for category, doc in self._restore_consolidated():
+                consolidated[category].append(doc)
+            self.file_generator.generate_files(consolidated)
+            self.validation_results = self.validator.validate_documents(consolidated)
+            return dict(consolidated)
+        
+        # Step 1: Load and process all documents
+        if self._resuming_from("chunks"):
+            all_chunks = [chunk for _, chunks in self._restore_chunks() for chunk in chunks]
+        else:
+            all_chunks = await self._load_all_documents()
+        
+        if not all_chunks:
+            return None
+        
+        # Step 2: Extract frameworks separately
+        if self._resuming_from("frameworks"):
+            frameworks = self._restore_frameworks()
+        else:
+            frameworks = self.framework_extractor.extract_frameworks(all_chunks)
+            self._checkpoint_frameworks(frameworks)
+        self.stats["total_frameworks"] = len(frameworks)
+        logger.info(f"Extracted {len(frameworks)} frameworks")
+        
+        # Step 3: Add framework chunks to main chunks
+        framework_chunks = self.framework_extractor.create_framework_chunks(frameworks)
+        all_chunks.extend(framework_chunks)
+        logger.info(f"Total chunks including frameworks: {len(all_chunks)}")
+        
+        # Step 4: Consolidate chunks into optimal documents
+        consolidated = self.consolidator.consolidate_chunks(all_chunks, frameworks)
+        self._save_assignment()
+        with self.checkpoints.writer("consolidated", self._consolidated_meta()) as checkpoint:
+            for category, docs in consolidated.items():
+                for doc in docs:
+                    checkpoint.write(document_to_record(category, doc))
+        
+        # Step 5: Generate and validate output files
+        self.file_generator.generate_files(consolidated)
+        self.validation_results = self.validator.validate_documents(consolidated)
+        
+        return consolidated
+    
+    def _process_streaming(self) -> Optional[Dict[str, List[ConsolidatedDocument]]]:
+        """
+        Run steps 1-5 in bounded memory.
+        
+        Documents flow through the ingestion stages on background threads
+        joined by bounded queues. Each document's chunks are deduplicated as
+        they arrive and buffered per document type, spilling sorted runs to
+        disk beyond the memory budget. Consolidation then reads each type back
+        in document order and writes every file as soon as it is produced.
+        
+        Returns:
+            Documents per category with their content dropped (for reports),
+            or None if no chunks were created
+        """
+        if self._resuming_from("consolidated"):
+            self.file_generator.begin()
+            self.validator.begin()
+            consolidated = defaultdict(list)
+            for category, doc in self._restore_consolidated():
+                self.file_generator.write_document(category, doc)
+                self.validator.visit_document(category, doc)
+                consolidated[category].append(doc.model_copy(update={"content": ""}))
+            self.file_generator.finish(consolidated)
+            self.validation_results = self.validator.finish()
+            return dict(consolidated)
+        
+        logger.info(f"Streaming documents (memory budget {self.config.memory_budget_mb} MB)")
+        if self.config.workers > 1:
+            logger.warning("Streaming mode runs ingestion stages on threads; workers is ignored")
+        
+        spill_dir = Path(self.config.spill_dir or self.output_dir / "cache" / "spill")
+        buffers = SpillManager(spill_dir, self.config.memory_budget_mb * 1024 * 1024)
+        framework_candidates = {}
+        self.consolidator.begin_stream()
+        
+        try:
+            # Step 1: Ingest, deduplicate and buffer chunks document by document
+            if self._resuming_from("chunks"):
+                documents = self._restore_chunks()
+            else:
+                documents = self._stream_documents()
+            
+            for _, chunks in documents:
+                self.framework_extractor.identify_framework_chunks(chunks, framework_candidates)
+                self._buffer_chunks(chunks, buffers)
+            
+            logger.info(f"\nTotal chunks created: {self.stats['total_chunks']}")
+            if not self.stats["total_chunks"]:
+                return None
+            
+            # Steps 2-3: Extract frameworks and add their chunks
+            if self._resuming_from("frameworks"):
+                frameworks = self._restore_frameworks()
+            else:
+                frameworks = self.framework_extractor.build_frameworks(framework_candidates)
+                self._checkpoint_frameworks(frameworks)
+            self.stats["total_frameworks"] = len(frameworks)
+            self._buffer_chunks(self.framework_extractor.create_framework_chunks(frameworks), buffers)
+            self.consolidator.log_duplicates()
+            
+            # Steps 4-5: Consolidate, write and validate category by category
+            self.file_generator.begin()
+            self.validator.begin()
+            with self.checkpoints.writer("consolidated", self._consolidated_meta()) as checkpoint:
+                def write(category: str, doc: ConsolidatedDocument):
+                    self.file_generator.write_document(category, doc)
+                    self.validator.visit_document(category, doc)
+                    checkpoint.write(document_to_record(category, doc))
+                
+                consolidated = self.consolidator.consolidate_stream(buffers, frameworks, write)
+            self._save_assignment()
+            self.file_generator.finish(consolidated)
+            self.validation_results = self.validator.finish()
+            
+            return consolidated
+        finally:
+            self.stats["spill"] = dict(buffers.stats)
+            buffers.close()
+    
+    def _stream_documents(self) -> Iterator[Tuple[Path, List[ProcessedChunk]]]:
+        """Ingest documents through the threaded stage pipeline (streaming mode)."""
+        documents = self.loader.get_all_documents(self.input_dir)
+        self.stats["total_input_files"] = len(documents)
+        logger.info(f"Found {len(documents)} documents to process")
+        
+        reusable = self._find_reusable(documents)
+        pending = [file_path for file_path in documents if file_path not in reusable]
+        stages = StagePipeline(self.ingestor.stages, queue_size=self.config.stream_queue_size)
+        
+        return self._collect_documents(documents, reusable, stages.run(self._pending_items(pending)))
+    
+    def _buffer_chunks(self, chunks: List[ProcessedChunk], buffers: SpillManager):
+        """Track, deduplicate and buffer chunks by document type (streaming mode)."""
+        self.consolidator.content_tracker.record_original_content(chunks)
+        for chunk in self.consolidator.filter_duplicates(chunks):
+            buffers.add(chunk.metadata.document_type, chunk)
+    
     async def _load_all_documents(self) -> List[ProcessedChunk]:
         """Load and process all documents from input directory."""
         all_chunks = []
@@ -100,50 +423,256 @@ class DocumentProcessor:
         
         logger.info(f"Found {len(documents)} documents to process")
         
-        # Process each document
-        for i, file_path in enumerate(documents, 1):
-            logger.info(f"\nProcessing [{i}/{len(documents)}]: {file_path.name}")
-            
-            try:
-                # Load and classify document
-                text, doc_type, metadata = await self.loader.load_and_classify_document(file_path)
-                
-                # Clean transcripts
-                if doc_type == DocumentType.TRANSCRIPT:
-                    logger.info("Cleaning transcript...")
-                    text = self.transcript_cleaner.clean_transcript(text)
-                
-                # Generate document ID
-                doc_id = self._generate_document_id(file_path)
-                
-                # Chunk the document
-                chunker = IntelligentChunker()
-                chunks = chunker.chunk_document(
-                    text=text,
-                    doc_type=doc_type,
-                    document_id=doc_id,
-                    source_file=file_path.name,
-                    metadata=metadata
-                )
-                
-                # Enrich metadata
-                chunks = self.metadata_extractor.enrich_chunks(chunks)
+        # Unchanged documents reuse their stored chunks; only the rest are ingested
+        reusable = self._find_reusable(documents)
+        pending = [file_path for file_path in documents if file_path not in reusable]
+        items = self._pending_items(pending)
+        
+        # Results arrive in the sorted order of `pending` either way, each as
+        # soon as it is ready, so its "loaded" record is written straight away
+        if self.config.workers > 1 and len(pending) > 1:
+            results = self._ingest_parallel(items, len(pending))
+        else:
+            results = self._ingest_sequential(items, len(pending))
+        
+        for _, chunks in self._collect_documents(documents, reusable, results):
+            all_chunks.extend(chunks)
+        
+        logger.info(f"\nTotal chunks created: {len(all_chunks)}")
+        
+        return all_chunks
+    
+    def _collect_documents(
+        self,
+        documents: List[Path],
+        reusable: Set[Path],
+        results: Iterator
+    ) -> Iterator[Tuple[Path, List[ProcessedChunk]]]:
+        """
+        Yield each document's chunks in input order.
+        
+        Reused documents are read from the chunk store; the rest are taken
+        from `results`, the ingested IngestItems (or exceptions) in input
+        order. Errors are recorded, new chunks are stored for the next run,
+        and the "loaded" and "chunks" checkpoints are written on the way.
+        """
+        if self.config.resume_from == "loaded":
+            loaded_checkpoint = NullRecordWriter()  # Keep the checkpoint being resumed from
+        else:
+            loaded_checkpoint = self.checkpoints.writer("loaded")
+        
+        chunks_meta = {"retracted_documents": self.stats["retracted_documents"]}
+        with loaded_checkpoint, self.checkpoints.writer("chunks", chunks_meta) as chunks_checkpoint:
+            for file_path in documents:
+                reused = file_path in reusable
+                if reused:
+                    result = self._reuse_chunks(file_path)
+                else:
+                    item = next(results)
+                    if isinstance(item, IngestItem):
+                        if item.loaded_part is not None:
+                            loaded_checkpoint.write_packed(item.loaded_part)
+                        elif item.loaded_text is not None:
+                            loaded_checkpoint.write(self.ingestor.loaded_record(item))
+                        result = item.error or item.chunks
+                    else:
+                        result = item
                 
-                # Merge small chunks if needed
-                chunks = chunker.merge_small_chunks(chunks)
+                if isinstance(result, Exception):
+                    logger.error(f"Error processing {file_path.name}: {str(result)}")
+                    self.stats["errors"].append(f"{file_path.name}: {str(result)}")
+                    chunks_checkpoint.write({"file": file_path.name, "error": str(result)})
+                    continue
                 
-                all_chunks.extend(chunks)
-                logger.info(f"Created {len(chunks)} chunks from {file_path.name}")
+                if not reused:
+                    self._store_chunks(file_path, result)
+                chunks_checkpoint.write({
+                    "file": file_path.name,
+                    "reused": reused,
+                    "chunks": [chunk_to_record(chunk) for chunk in result]
+                })
                 
-            except Exception as e:
-                logger.error(f"Error processing {file_path.name}: {str(e)}")
-                self.stats["errors"].append(f"{file_path.name}: {str(e)}")
+                self.stats["total_chunks"] += len(result)
+                logger.info(f"Created {len(result)} chunks from {file_path.name}")
+                yield file_path, result
+        
+        self._save_chunk_store()
+    
+    def _pending_items(self, pending: List[Path]) -> Iterator[IngestItem]:
+        """
+        IngestItems for the documents to ingest.
+        
+        When resuming from "loaded", documents found in that checkpoint get
+        their loaded text back, so the load stage is skipped for them.
+        """
+        if self.config.resume_from == "loaded":
+            records = iter(self.checkpoints.reader("loaded"))
+        else:
+            records = iter(())
+        record = next(records, None)
+        
+        for file_path in pending:
+            item = IngestItem(file_path=file_path, document_id=self._generate_document_id(file_path))
+            
+            # Records follow input order, so a single pass lines them up
+            while record is not None and record["file"] < file_path.name:
+                record = next(records, None)
+            if record is not None and record["file"] == file_path.name:
+                item.document_id = record["document_id"]
+                item.text = record["text"]
+                item.doc_type = DocumentType(record["doc_type"])
+                item.metadata = record["metadata"]
+            
+            yield item
+    
+    def _resuming_from(self, stage: str) -> bool:
+        """Whether this run reloads the checkpoint of `stage` (or of a later stage)."""
+        resume_from = self.config.resume_from
+        return resume_from is not None and STAGES.index(resume_from) >= STAGES.index(stage)
+    
+    def _restore_chunks(self) -> Iterator[Tuple[str, List[ProcessedChunk]]]:
+        """Reload the "chunks" checkpoint document by document, restoring ingest statistics."""
+        logger.info("Resuming from the chunks checkpoint")
+        
+        checkpoint = self.checkpoints.reader("chunks")
+        self.stats["retracted_documents"] = checkpoint.meta["retracted_documents"]
+        for record in checkpoint:
+            self.stats["total_input_files"] += 1
+            if "error" in record:
+                self.stats["errors"].append(f"{record['file']}: {record['error']}")
                 continue
+            
+            chunks = [chunk_from_record(chunk) for chunk in record["chunks"]]
+            self.stats["reused_documents" if record["reused"] else "recomputed_documents"].append(record["file"])
+            self.stats["total_chunks"] += len(chunks)
+            yield record["file"], chunks
+    
+    def _restore_frameworks(self) -> Dict[str, Framework]:
+        """Reload the "frameworks" checkpoint."""
+        logger.info("Resuming from the frameworks checkpoint")
+        checkpoint = self.checkpoints.reader("frameworks")
+        self.stats["framework_selection"] = checkpoint.meta.get("selection", {})
+        self.stats["framework_matching"] = checkpoint.meta.get("matching", {})
+        frameworks = (framework_from_record(record) for record in checkpoint)
+        return {framework.name: framework for framework in frameworks}
+    
+    def _checkpoint_frameworks(self, frameworks: Dict[str, Framework]):
+        self.stats["framework_selection"] = dict(self.framework_extractor.selection_stats)
+        self.stats["framework_matching"] = dict(self.framework_extractor.match_stats)
+        meta = {"selection": self.stats["framework_selection"], "matching": self.stats["framework_matching"]}
+        with self.checkpoints.writer("frameworks", meta) as checkpoint:
+            for framework in frameworks.values():
+                checkpoint.write(framework_to_record(framework))
+    
+    def _save_assignment(self):
+        """Keep this run's chunk-to-file assignment for the next stable_packing run."""
+        if self.config.stable_packing:
+            self.consolidator.save_assignment(self.assignment_path)
+            self.stats["packing"] = dict(self.consolidator.packing_stats)
+    
+    def _consolidated_meta(self) -> Dict:
+        """Run state stored with the "consolidated" checkpoint so reports survive a resume."""
+        tracker = self.consolidator.content_tracker
+        return {
+            "stats": {key: self.stats[key] for key in _CHECKPOINTED_STATS},
+            "duplicate_map": self.consolidator.duplicate_map,
+            "original_chunk_count": tracker.original_chunk_count,
+            "original_char_count": tracker.original_char_count
+        }
+    
+    def _restore_consolidated(self) -> Iterator[Tuple[str, ConsolidatedDocument]]:
+        """Reload the "consolidated" checkpoint with the run state stored alongside it."""
+        logger.info("Resuming from the consolidated checkpoint")
         
-        self.stats["total_chunks"] = len(all_chunks)
-        logger.info(f"\nTotal chunks created: {len(all_chunks)}")
+        checkpoint = self.checkpoints.reader("consolidated")
+        self.stats.update(checkpoint.meta["stats"])
+        self.consolidator.duplicate_map = checkpoint.meta["duplicate_map"]
+        tracker = self.consolidator.content_tracker
+        tracker.original_chunk_count = checkpoint.meta["original_chunk_count"]
+        tracker.original_char_count = checkpoint.meta["original_char_count"]
         
-        return all_chunks
+        for record in checkpoint:
+            doc = document_from_record(record)
+            tracker.record_consolidated(doc)
+            yield record["category"], doc
+    
+    def _find_reusable(self, documents: List[Path]) -> Set[Path]:
+        """
+        Documents whose stored chunks are still current.
+        
+        Also retracts stored chunks of documents that left the input, and
+        records which documents are reused and which recomputed.
+        """
+        if self.chunk_store is None:
+            reusable = set()
+        else:
+            self.stats["retracted_documents"] = self.chunk_store.retract_missing(documents)
+            reusable = set() if self.config.full_rebuild else {
+                file_path for file_path in documents if self.chunk_store.is_current(file_path)
+            }
+        
+        self.stats["reused_documents"] = [p.name for p in documents if p in reusable]
+        self.stats["recomputed_documents"] = [p.name for p in documents if p not in reusable]
+        
+        logger.info(
+            f"Reusing {len(reusable)} unchanged documents, processing "
+            f"{len(documents) - len(reusable)}, retracted {len(self.stats['retracted_documents'])}"
+        )
+        return reusable
+    
+    def _reuse_chunks(self, file_path: Path):
+        """Stored chunks of an unchanged document (or the exception raised loading them)."""
+        try:
+            return self.chunk_store.load(file_path)
+        except Exception as e:
+            return e
+    
+    def _store_chunks(self, file_path: Path, chunks: List[ProcessedChunk]):
+        """Remember the chunks a document produced for the next run."""
+        if self.chunk_store is not None:
+            self.chunk_store.put(file_path, self._generate_document_id(file_path), chunks)
+    
+    def _save_chunk_store(self):
+        if self.chunk_store is not None:
+            self.chunk_store.save()
+    
+    def _ingest_sequential(self, items: Iterator[IngestItem], total: int) -> Iterator[IngestItem]:
+        """Ingest documents one at a time in this process."""
+        for i, item in enumerate(items, 1):
+            logger.info(f"\nProcessing [{i}/{total}]: {item.file_path.name}")
+            yield self.ingestor.ingest_item(item)
+    
+    def _ingest_parallel(self, items: Iterator[IngestItem], total: int) -> Iterator:
+        """
+        Ingest documents on a pool of worker processes.
+        
+        Yields each result in submission order as soon as it is done. At most
+        two items per worker are in flight, so results finished ahead of a
+        slow document don't pile up.
+        """
+        workers = min(self.config.workers, total)
+        logger.info(f"Processing {total} documents with {workers} workers")
+        
+        pool = ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(self.config,))
+        in_flight = deque()
+        try:
+            for item in items:
+                in_flight.append(pool.submit(_ingest_in_worker, item))
+                if len(in_flight) >= 2 * workers:
+                    yield self._pool_result(in_flight.popleft())
+            while in_flight:
+                yield self._pool_result(in_flight.popleft())
+        finally:
+            pool.shutdown(cancel_futures=True)
+            shutil.rmtree(self.ingestor.parts_dir, ignore_errors=True)  # Parts of results never collected
+    
+    @staticmethod
+    def _pool_result(future: Future):
+        """A worker's IngestItem, or the exception if the pool failed it."""
+        try:
+            return future.result()
+        except Exception as e:
+            return e
     
     def _generate_document_id(self, file_path: Path) -> str:
         """Generate unique document ID."""
@@ -173,6 +702,21 @@ Generated: {datetime.now().isoformat()}
         for category, count in self.file_generator.stats['files_by_category'].items():
             stats_content += f"- {category}: {count} files\n"
         
+        # Files to re-upload since the previous run
+        delta = self.file_generator.stats["delta"]
+        stats_content += f"\n## Upload Delta\n"
+        stats_content += f"- Added: {len(delta['added'])}\n"
+        stats_content += f"- Changed: {len(delta['changed'])}\n"
+        stats_content += f"- Removed: {len(delta['removed'])}\n"
+        stats_content += f"- Unchanged (not rewritten): {delta['unchanged']}\n"
+        stats_content += f"- Full list: for_upload/upload_delta.json\n"
+        writer = self.file_generator.stats["writer"]
+        if writer:
+            stats_content += (
+                f"- Written: {writer['files_written']} files, {writer['bytes_written'] / 1e6:.1f} MB "
+                f"at {writer['mb_per_second']:.1f} MB/s ({writer['files_linked']} unchanged files linked)\n"
+            )
+        
         # Add content preservation rate
         if hasattr(self.consolidator.content_tracker, 'original_char_count'):
             preservation_rate = (
@@ -184,6 +728,66 @@ Generated: {datetime.now().isoformat()}
             stats_content += f"- Consolidated characters: {self.consolidator.content_tracker.consolidated_char_count:,}\n"
             stats_content += f"- Preservation rate: {preservation_rate:.2f}%\n"
         
+        # Deduplication audit
+        duplicate_map = self.consolidator.duplicate_map
+        collapsed_count = sum(len(ids) for ids in duplicate_map.values())
+        stats_content += f"\n## Deduplication\n"
+        stats_content += f"- Similarity threshold: {self.consolidator.deduplication_threshold}\n"
+        stats_content += f"- Chunks collapsed: {collapsed_count} into {len(duplicate_map)} kept chunks\n"
+        stats_content += f"- Full map: processing/duplicate_map.json\n"
+        
+        # Framework candidates left out before their text was built
+        selection = self.stats["framework_selection"]
+        if selection:
+            stats_content += f"\n## Framework Selection\n"
+            stats_content += f"- Candidates found: {selection['candidates']}\n"
+            stats_content += f"- Frameworks kept: {selection['selected']} (cap {self.config.max_frameworks})\n"
+            stats_content += f"- Chunks over the per-framework cap ({self.config.max_chunks_per_framework}): {selection['chunks_dropped']}\n"
+            stats_content += f"- Framework tokens avoided: {selection['tokens_avoided']:,}\n"
+        
+        # Framework hits recorded during enrichment instead of scanned for again
+        matching = self.stats["framework_matching"]
+        if matching:
+            stats_content += f"\n## Framework Matching\n"
+            stats_content += f"- Chunks reusing enrichment hits: {matching['chunks_reused']:,} ({matching['chars_reused']:,} chars not rescanned)\n"
+            stats_content += f"- Chunks scanned for frameworks: {matching['chunks_scanned']:,} ({matching['chars_scanned']:,} chars)\n"
+        
+        # Files carried over from the previous run's chunk-to-file assignment
+        packing = self.stats["packing"]
+        if packing:
+            stats_content += f"\n## Stable Packing\n"
+            stats_content += f"- Files kept from the previous run: {packing['files_kept']}\n"
+            stats_content += f"- Files repacked: {packing['files_repacked']} ({packing['chunks_repacked']:,} chunks)\n"
+        
+        # Chunk overlap dropped when consecutive chunks were stitched back together
+        stats_content += f"\n## Overlap Removal\n"
+        for category, docs in consolidated.items():
+            removed = sum(doc.overlap_tokens_removed for doc in docs)
+            output = sum(doc.total_tokens for doc in docs)
+            share = removed / (removed + output) * 100 if removed else 0.0
+            stats_content += f"- {category}: {removed:,} tokens saved ({share:.1f}% of unstitched output)\n"
+        
+        # Incremental processing
+        stats_content += f"\n## Incremental Processing\n"
+        for label, key in (
+            ("Reused", "reused_documents"),
+            ("Recomputed", "recomputed_documents"),
+            ("Retracted", "retracted_documents")
+        ):
+            stats_content += f"- {label}: {len(self.stats[key])} documents\n"
+            for name in self.stats[key]:
+                stats_content += f"  - {name}\n"
+        
+        # Memory
+        stats_content += f"\n## Memory\n"
+        stats_content += f"- Mode: {'streaming' if self.config.streaming else 'in-memory'}\n"
+        if self.stats["peak_rss_mb"] is not None:
+            stats_content += f"- Peak RSS: {self.stats['peak_rss_mb']:,.1f} MB\n"
+        if self.config.streaming:
+            spill = self.stats.get("spill", {})
+            stats_content += f"- Chunk buffer budget: {self.config.memory_budget_mb} MB\n"
+            stats_content += f"- Spills to disk: {spill.get('spills', 0)} ({spill.get('spilled_bytes', 0) / (1024 * 1024):,.1f} MB)\n"
+        
         # Processing time
         if self.stats["end_time"] and self.stats["start_time"]:
             duration = (self.stats["end_time"] - self.stats["start_time"]).total_seconds()
@@ -200,6 +804,10 @@ Generated: {datetime.now().isoformat()}
         stats_path = self.output_dir / "reports" / "statistics.md"
         stats_path.write_text(stats_content, encoding='utf-8')
         
+        # Which chunk IDs were collapsed into which
+        duplicate_map_path = self.output_dir / "processing" / "duplicate_map.json"
+        duplicate_map_path.write_text(json.dumps(duplicate_map, indent=2), encoding='utf-8')
+        
         # Quality report
         quality_content = await self._generate_quality_report(consolidated)
         quality_path = self.output_dir / "reports" / "quality_report.md"
@@ -260,6 +868,8 @@ Generated: {datetime.now().isoformat()}
         logger.info(f"Output files: {self.file_generator.stats['total_files']}")
         logger.info(f"Consolidation ratio: {self.stats['total_input_files']}:{self.file_generator.stats['total_files']}")
         logger.info(f"Processing time: {duration:.2f} seconds ({duration/60:.2f} minutes)")
+        if self.stats["peak_rss_mb"] is not None:
+            logger.info(f"Peak memory (RSS): {self.stats['peak_rss_mb']:,.1f} MB")
         
         if self.stats["errors"]:
             logger.warning(f"Errors encountered: {len(self.stats['errors'])}")
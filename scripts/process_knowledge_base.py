@@ -15,7 +15,9 @@ import sys
 # Add the current directory to Python path
 sys.path.insert(0, str(Path(__file__).parent))
 
+from rag_processor.checkpoint import STAGES
 from rag_processor.models import ProcessingConfig
+from rag_processor.packing import PACKING_STRATEGIES
 from rag_processor.pipeline import DocumentProcessor
 from rag_processor.validator import QualityValidator
 from rag_processor.reporter import Reporter
@@ -108,9 +110,88 @@ def setup_logging(verbose: bool, quiet: bool = False):
     '--consolidation-strategy',
     '-s',
     default='semantic',
-    help='Consolidation strategy to use',
+    help='Group chunks into files by topic (semantic), by source document (source), or by topic at section level (hybrid)',
     type=click.Choice(['semantic', 'source', 'hybrid'])
 )
+@click.option(
+    '--packing',
+    default='ordered',
+    help='How chunks are packed into files: ordered keeps document order, first_fit packs tightest (default: ordered)',
+    type=click.Choice(PACKING_STRATEGIES)
+)
+@click.option(
+    '--stable-packing',
+    is_flag=True,
+    help='Keep the previous run\'s files whose chunks are unchanged and repack only the rest, so fewer files need re-embedding'
+)
+@click.option(
+    '--dedup-threshold',
+    default=0.95,
+    help='Word-shingle Jaccard similarity at which chunks count as duplicates (default: 0.95)',
+    type=click.FloatRange(min=0.5, max=1.0)
+)
+@click.option(
+    '--max-frameworks',
+    default=25,
+    help='Most frameworks extracted, best-scoring candidates first (default: 25)',
+    type=click.IntRange(min=0)
+)
+@click.option(
+    '--max-framework-chunks',
+    default=12,
+    help='Most source chunks copied into one framework (default: 12)',
+    type=click.IntRange(min=1)
+)
+@click.option(
+    '--verify-tokens',
+    is_flag=True,
+    help='Re-encode every output file to check its summed token count (slower)'
+)
+@click.option(
+    '--workers',
+    '-w',
+    default=1,
+    help='Number of worker processes for document ingestion (default: 1)',
+    type=click.IntRange(min=1)
+)
+@click.option(
+    '--streaming',
+    is_flag=True,
+    help='Bounded-memory mode: stream documents through the pipeline and spill chunks to disk '
+         '(near-duplicates are judged by MinHash estimates, so a few borderline chunks may differ)'
+)
+@click.option(
+    '--memory-budget',
+    default=512,
+    help='MB of chunks buffered in memory before spilling to disk in streaming mode (default: 512)',
+    type=click.IntRange(min=16)
+)
+@click.option(
+    '--full',
+    is_flag=True,
+    help='Reprocess every document instead of reusing chunks of unchanged ones (and repack every file with --stable-packing)'
+)
+@click.option(
+    '--resume-from',
+    type=click.Choice(STAGES),
+    default=None,
+    help='Reload the checkpoint of this stage from the last run and continue from there'
+)
+@click.option(
+    '--no-checkpoint',
+    is_flag=True,
+    help='Do not write stage checkpoints'
+)
+@click.option(
+    '--no-cache',
+    is_flag=True,
+    help='Bypass the parse cache and re-partition every document'
+)
+@click.option(
+    '--clear-cache',
+    is_flag=True,
+    help='Clear the parse cache before processing'
+)
 @click.option(
     '--verbose',
     '-v',
@@ -128,7 +209,7 @@ def setup_logging(verbose: bool, quiet: bool = False):
     is_flag=True,
     help='Only run validation on existing output'
 )
-def main(input_dir, output_dir, target_files, consolidation_strategy, verbose, quiet, validate_only):
+def main(input_dir, output_dir, target_files, consolidation_strategy, packing, stable_packing, dedup_threshold, max_frameworks, max_framework_chunks, verify_tokens, workers, streaming, memory_budget, full, resume_from, no_checkpoint, no_cache, clear_cache, verbose, quiet, validate_only):
     """
     Process James Kemp's knowledge base for LibreChat RAG upload.
     
@@ -178,6 +259,14 @@ def main(input_dir, output_dir, target_files, consolidation_strategy, verbose, q
         print(f"Input directory: {input_path}")
         print(f"Output directory: {output_path}")
         print(f"Target files: {target_files}")
+        print(f"Consolidation strategy: {consolidation_strategy}")
+        print(f"Workers: {workers}")
+        if streaming:
+            print(f"Streaming mode: {memory_budget} MB memory budget")
+        if stable_packing:
+            print("Stable packing: unchanged files from the previous run are kept")
+        if resume_from:
+            print(f"Resuming from the {resume_from} checkpoint")
         print(f"Input files found: {len(input_files)}")
         print("\n" + "-"*60 + "\n")
     
@@ -186,6 +275,21 @@ def main(input_dir, output_dir, target_files, consolidation_strategy, verbose, q
         input_dir=str(input_path),
         output_dir=str(output_path),
         target_file_count=target_files,
+        deduplication_threshold=dedup_threshold,
+        max_frameworks=max_frameworks,
+        max_chunks_per_framework=max_framework_chunks,
+        packing_strategy=packing,
+        stable_packing=stable_packing,
+        consolidation_strategy=consolidation_strategy,
+        verify_token_counts=verify_tokens,
+        workers=workers,
+        streaming=streaming,
+        memory_budget_mb=memory_budget,
+        full_rebuild=full,
+        checkpoint=not no_checkpoint,
+        resume_from=resume_from,
+        use_parse_cache=not no_cache,
+        clear_parse_cache=clear_cache,
         verbose=verbose
     )
     
@@ -193,20 +297,20 @@ def main(input_dir, output_dir, target_files, consolidation_strategy, verbose, q
         # Create and run processor
         processor = DocumentProcessor(config)
         
-        # Run async processing
+        # Run async processing (output is validated as it is written)
         if not quiet:
             print("Starting document processing...")
-        asyncio.run(processor.process_knowledge_base())
+        consolidated_docs = asyncio.run(processor.process_knowledge_base())
         
-        if not quiet:
-            print("\n" + "-"*60 + "\n")
-            print("Running quality validation...")
+        if consolidated_docs is None:
+            click.echo(click.style("\nError: No chunks created from documents!", fg='red'))
+            return 1
         
-        # Run validation
-        validator = QualityValidator(output_path)
-        validation_results = validator.validate_all()
+        validation_results = processor.validation_results
         if not quiet:
-            validator.print_report()
+            print("\n" + "-"*60 + "\n")
+            print("Quality validation:")
+            processor.validator.print_report()
         
         # Generate final reports
         if not quiet:
@@ -214,30 +318,6 @@ def main(input_dir, output_dir, target_files, consolidation_strategy, verbose, q
             print("Generating reports...")
         
         reporter = Reporter(output_path)
-        
-        # Get consolidated docs for reporting
-        consolidated_docs = {}
-        for_upload_dir = output_path / "for_upload"
-        if for_upload_dir.exists():
-            for category_dir in for_upload_dir.iterdir():
-                if category_dir.is_dir():
-                    # Create mock consolidated docs for reporting
-                    docs = []
-                    for md_file in category_dir.glob("*.md"):
-                        # Simple doc object for reporting
-                        class SimpleDoc:
-                            def __init__(self, filename, tokens):
-                                self.filename = filename
-                                self.total_tokens = tokens
-                                self.title = filename.replace('.md', '').replace('_', ' ')
-                        
-                        content = md_file.read_text(encoding='utf-8')
-                        # Rough token estimate
-                        tokens = len(content.split()) * 1.3
-                        docs.append(SimpleDoc(md_file.name, int(tokens)))
-                    
-                    consolidated_docs[category_dir.name] = docs
-        
         reporter.generate_all_reports(
             processor.stats,
             validation_results,
@@ -262,7 +342,7 @@ def main(input_dir, output_dir, target_files, consolidation_strategy, verbose, q
             print("\n")
         
         return 0
-        
+    
     except Exception as e:
         logger.error(f"Processing failed: {str(e)}", exc_info=True)
         click.echo(click.style(f"\nError: {str(e)}", fg='red'))
@@ -8,6 +8,8 @@ from pathlib import Path
 from datetime import datetime
 from typing import Dict, List, Any
 
+from .models import ConsolidatedDocument
+
 logger = logging.getLogger(__name__)
 
 
@@ -23,9 +25,14 @@ class Reporter:
         self,
         processing_stats: Dict[str, Any],
         validation_results: Dict[str, Any],
-        consolidated_docs: Dict[str, List[Any]]
+        consolidated_docs: Dict[str, List[ConsolidatedDocument]]
     ):
-        """Generate all reports."""
+        """
+        Generate all reports.
+        
+        consolidated_docs are the documents the run wrote, as returned by
+        DocumentProcessor.process_knowledge_base; only their metadata is used.
+        """
         logger.info("Generating comprehensive reports...")
         
         # Generate statistics report
@@ -53,6 +60,7 @@ Generated: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}
 - **Start Time**: {stats.get('start_time', 'N/A')}
 - **End Time**: {stats.get('end_time', 'N/A')}
 - **Total Duration**: {self._calculate_duration(stats)}
+- **Peak Memory (RSS)**: {self._format_peak_memory(stats)}
 
 ## Input Statistics
 
@@ -60,6 +68,9 @@ Generated: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}
 - **Total Chunks Created**: {stats.get('total_chunks', 0)}
 - **Frameworks Extracted**: {stats.get('total_frameworks', 0)}
 
+## Incremental Processing
+
+{self._format_incremental(stats)}
 ## Output Statistics
 
 ### File Distribution
@@ -329,4 +340,30 @@ Date: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}
             seconds = int(duration % 60)
             return f"{minutes}m {seconds}s"
         
-        return "N/A"
\ No newline at end of file
+        return "N/A"
+    
+    def _format_incremental(self, stats: Dict) -> str:
+        """List which documents were reused, recomputed and retracted."""
+        section = ""
+        for label, key in (
+            ("Reused", "reused_documents"),
+            ("Recomputed", "recomputed_documents"),
+            ("Retracted", "retracted_documents")
+        ):
+            names = stats.get(key, [])
+            section += f"- **{label} Documents**: {len(names)}\n"
+            for name in names:
+                section += f"  - {name}\n"
+        
+        return section
+    
+    def _format_peak_memory(self, stats: Dict) -> str:
+        """Format peak resident memory, noting spills in streaming mode."""
+        peak = stats.get('peak_rss_mb')
+        if peak is None:
+            return "N/A"
+        
+        spill = stats.get('spill')
+        if spill:
+            return f"{peak:,.1f} MB (streaming, {spill['spills']} spills to disk)"
+        return f"{peak:,.1f} MB"
@@ -0,0 +1,193 @@
+"""
+Vectorized, position-independent text similarity measures.
+"""
+
+import logging
+import math
+import zlib
+from collections import defaultdict
+from typing import Dict, List, Optional, Sequence
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+
+_EPSILON = 1e-9
+
+_NGRAM_BASE = np.uint64(257)
+_NGRAM_MULTIPLIER = np.uint64(0x9E3779B97F4A7C15)  # Fibonacci hashing
+
+
+def shingle_hashes(text: str, size: int = 5) -> np.ndarray:
+    """
+    Hashed word shingles of a text.
+    
+    Args:
+        text: Text to shingle (lowercased and whitespace-split)
+        size: Words per shingle; 1 gives the plain word set
+    
+    Returns:
+        Sorted array of unique shingle hashes (the whole text is a single
+        shingle if it has no more than `size` words)
+    """
+    words = text.lower().split()
+    if not words:
+        return np.empty(0, dtype=np.uint64)
+    
+    if size == 1:
+        grams = words
+    elif len(words) <= size:
+        grams = [" ".join(words)]
+    else:
+        grams = [" ".join(words[i:i + size]) for i in range(len(words) - size + 1)]
+    
+    hashes = np.fromiter(
+        (zlib.crc32(gram.encode('utf-8')) for gram in grams),
+        dtype=np.uint64,
+        count=len(grams)
+    )
+    return np.unique(hashes)
+
+
+def jaccard_many(query: np.ndarray, candidates: Sequence[np.ndarray]) -> np.ndarray:
+    """
+    Jaccard similarity of one shingle set against many, in a single pass.
+    
+    Args:
+        query: Unique shingle hashes (see shingle_hashes)
+        candidates: Unique shingle hashes of each candidate
+    
+    Returns:
+        Similarity per candidate (0.0 when both sets are empty)
+    """
+    if not candidates:
+        return np.empty(0)
+    
+    sizes = np.fromiter(map(len, candidates), dtype=np.int64, count=len(candidates))
+    pooled = np.concatenate(candidates)
+    owners = np.repeat(np.arange(len(candidates)), sizes)
+    
+    # Count, per candidate, how many of its shingles also occur in the query
+    shared = np.bincount(owners, weights=np.isin(pooled, query), minlength=len(candidates))
+    union = sizes + len(query) - shared
+    return np.divide(shared, union, out=np.zeros(len(candidates)), where=union > 0)
+
+
+def ngram_vector(text: str, n: int = 3, dim: int = 4096) -> np.ndarray:
+    """
+    L2-normalized hashed character n-gram count vector of a text.
+    
+    Case and whitespace runs are normalized first. N-gram hashes are built
+    with a vectorized rolling hash over the UTF-8 bytes, so no Python loop
+    runs per character. `dim` must be a power of two.
+    """
+    normalized = " ".join(text.lower().split()).encode('utf-8')
+    vector = np.zeros(dim, dtype=np.float32)
+    if not normalized:
+        return vector
+    
+    data = np.frombuffer(normalized, dtype=np.uint8).astype(np.uint64)
+    width = min(n, len(data))
+    positions = len(data) - width + 1
+    
+    hashes = np.zeros(positions, dtype=np.uint64)
+    for offset in range(width):
+        hashes = hashes * _NGRAM_BASE + data[offset:offset + positions]
+    
+    # Fibonacci hashing: the top bits of the product are the best mixed
+    buckets = (hashes * _NGRAM_MULTIPLIER) >> np.uint64(64 - (dim.bit_length() - 1))
+    vector += np.bincount(buckets.astype(np.int64), minlength=dim)
+    return vector / np.linalg.norm(vector)
+
+
+def cosine_many(query: np.ndarray, candidates: np.ndarray) -> np.ndarray:
+    """
+    Cosine similarity of one n-gram vector against many.
+    
+    Args:
+        query: Vector from ngram_vector
+        candidates: 2-D array with one ngram_vector per row
+    
+    Returns:
+        Similarity per candidate row
+    """
+    if len(candidates) == 0:
+        return np.empty(0, dtype=np.float32)
+    return np.asarray(candidates, dtype=np.float32) @ query
+
+
+def token_frequencies(token_sets: Sequence[np.ndarray]) -> Dict[int, int]:
+    """Number of sets each token occurs in (for JaccardIndex token ordering)."""
+    if not token_sets:
+        return {}
+    tokens, counts = np.unique(np.concatenate(token_sets), return_counts=True)
+    return dict(zip(tokens.tolist(), counts.tolist()))
+
+
+class JaccardIndex:
+    """
+    Exact Jaccard search over token sets using prefix and length filtering.
+    
+    Tokens of every set are ordered rarest first. Two sets whose similarity
+    exceeds the threshold must share a token within the first
+    |x| - ceil(threshold * |x|) + 1 tokens of each, so only those prefix
+    tokens are indexed and probed. Since prefixes hold rare tokens, posting
+    lists stay short and lookups are near-constant time; surviving
+    candidates are scored exactly with jaccard_many.
+    """
+    
+    def __init__(self, threshold: float, frequencies: Optional[Dict[int, int]] = None):
+        self.threshold = threshold
+        self.frequencies = frequencies or {}
+        self._postings = defaultdict(list)
+        self._sets: List[np.ndarray] = []
+    
+    def find(self, tokens: np.ndarray) -> Optional[int]:
+        """
+        Return the ID of the earliest indexed set with Jaccard above threshold.
+        
+        Args:
+            tokens: Unique token hashes (see shingle_hashes)
+        
+        Returns:
+            ID returned by add() for the match, or None
+        """
+        size = len(tokens)
+        if size == 0:
+            return None
+        
+        candidates = set()
+        for token in self._prefix(tokens):
+            candidates.update(self._postings.get(token, ()))
+        
+        # Length filter: |y| must lie within [t|x|, |x|/t]
+        min_size = self.threshold * size - _EPSILON
+        max_size = size / self.threshold + _EPSILON
+        candidates = sorted(
+            c for c in candidates if min_size <= len(self._sets[c]) <= max_size
+        )
+        if not candidates:
+            return None
+        
+        scores = jaccard_many(tokens, [self._sets[c] for c in candidates])
+        matches = np.flatnonzero(scores > self.threshold)
+        return candidates[matches[0]] if len(matches) else None
+    
+    def add(self, tokens: np.ndarray) -> int:
+        """Index a token set and return its ID (IDs count up from 0)."""
+        set_id = len(self._sets)
+        self._sets.append(tokens)
+        for token in self._prefix(tokens):
+            self._postings[token].append(set_id)
+        return set_id
+    
+    def _prefix(self, tokens: np.ndarray) -> List[int]:
+        """The rarest tokens of a set that any match must share."""
+        size = len(tokens)
+        if size == 0:
+            return []
+        
+        prefix_length = size - math.ceil(self.threshold * size - _EPSILON) + 1
+        ordered = sorted(tokens.tolist(), key=lambda t: (self.frequencies.get(t, 0), t))
+        return ordered[:prefix_length]
@@ -0,0 +1,169 @@
+"""
+Token-aware text splitting.
+"""
+
+import bisect
+import logging
+from itertools import accumulate
+from typing import List, Optional, Tuple
+
+import tiktoken
+
+logger = logging.getLogger(__name__)
+
+
+# Separators that end a unit of text - the cut goes after them. All other
+# separators (headings, speaker labels, "Step", ...) start a unit and the
+# cut goes before them.
+TRAILING_SEPARATORS = {".", "!", "?"}
+
+
+class TokenTextSplitter:
+    """
+    Splits text into token-bounded chunks with a single tokenization pass.
+    
+    The whole document is encoded once and the byte offset of every token is
+    kept. Separators are searched for only inside the current token window and
+    mapped back onto token indices, so no chunk is re-encoded while looking
+    for its cut. The window width bounds a chunk at max_tokens, but encoding
+    the chunk on its own can differ by a token or two at its edges (and
+    chunks are stripped, like langchain's), so each finished chunk is encoded
+    once more for its exact count.
+    """
+    
+    def __init__(
+        self,
+        tokenizer: tiktoken.Encoding,
+        max_tokens: int,
+        overlap_tokens: int,
+        separators: List[str]
+    ):
+        self.tokenizer = tokenizer
+        self.max_tokens = max_tokens
+        self.overlap_tokens = min(overlap_tokens, max_tokens - 1)
+        self.separators = [
+            (sep.encode('utf-8'), sep.isspace() or sep in TRAILING_SEPARATORS)
+            for sep in separators
+        ]
+    
+    def split_text(self, text: str) -> List[str]:
+        """Split text into chunks (drop-in for langchain's split_text)."""
+        return [chunk_text for chunk_text, _ in self.split_text_with_counts(text)]
+    
+    def split_text_with_counts(self, text: str) -> List[Tuple[str, int]]:
+        """
+        Split text into chunks.
+        
+        Returns:
+            List of (chunk text, token count) tuples in document order; the
+            text is stripped and the count is exact for it
+        """
+        tokens = self.tokenizer.encode_ordinary(text)
+        if not tokens:
+            return []
+        
+        data = text.encode('utf-8')
+        offsets = [0]
+        offsets.extend(accumulate(map(len, self.tokenizer.decode_tokens_bytes(tokens))))
+        total = len(tokens)
+        
+        chunks = []
+        start = 0
+        
+        while start < total:
+            end = self._find_end(data, offsets, start, total)
+            
+            chunk_text = data[
+                self._char_start(data, offsets[start]):self._char_start(data, offsets[end])
+            ].decode('utf-8').strip()
+            if chunk_text:
+                chunks.append(chunk_text)
+            
+            if end >= total:
+                break
+            
+            start = self._find_next_start(data, offsets, start, end)
+        
+        return [(chunk_text, len(self.tokenizer.encode_ordinary(chunk_text))) for chunk_text in chunks]
+    
+    def _find_end(self, data: bytes, offsets: List[int], start: int, total: int) -> int:
+        """Pick the furthest cut within max_tokens, preferring earlier separators."""
+        limit = start + self.max_tokens
+        if limit >= total:
+            return total
+        
+        lo, hi = offsets[start], offsets[limit]
+        for sep, cut_after in self.separators:
+            if cut_after:
+                pos = data.rfind(sep, lo, hi)
+                cut = pos + len(sep)
+            else:
+                pos = data.rfind(sep, lo, hi + len(sep))
+                cut = pos
+            if pos == -1:
+                continue
+            
+            token_index = bisect.bisect_left(offsets, cut)
+            if start < token_index <= limit:
+                return token_index
+        
+        # No separator in range - hard cut at the token limit
+        return limit
+    
+    def _find_next_start(self, data: bytes, offsets: List[int], start: int, end: int) -> int:
+        """Start of the next chunk: the first separator cut inside the overlap window."""
+        if self.overlap_tokens <= 0:
+            return end
+        
+        window_start = max(end - self.overlap_tokens, start + 1)
+        lo, hi = offsets[window_start], offsets[end]
+        
+        for sep, cut_after in self.separators:
+            token_index = self._first_cut(data, offsets, sep, cut_after, lo, hi)
+            if token_index is not None and window_start <= token_index < end:
+                return token_index
+        
+        return end
+    
+    def _first_cut(
+        self, data: bytes, offsets: List[int], sep: bytes, cut_after: bool, lo: int, hi: int
+    ) -> Optional[int]:
+        """Token index of the first cut for a separator within [lo, hi) bytes."""
+        pos = data.find(sep, max(lo - len(sep), 0) if cut_after else lo, hi)
+        while pos != -1:
+            cut = pos + len(sep) if cut_after else pos
+            if cut >= lo:
+                return bisect.bisect_left(offsets, cut)
+            pos = data.find(sep, pos + 1, hi)
+        return None
+    
+    @staticmethod
+    def _char_start(data: bytes, offset: int) -> int:
+        """Move a byte offset back to the start of the UTF-8 character it falls in."""
+        while 0 < offset < len(data) and 0x80 <= data[offset] < 0xC0:
+            offset -= 1
+        return offset
+
+
+def find_overlap(previous: str, following: str, min_chars: int = 32, max_chars: int = 8192) -> int:
+    """
+    Length of the longest suffix of `previous` that is also a prefix of `following`.
+    
+    This is the region TokenTextSplitter repeats at the start of the next
+    chunk. Matches shorter than min_chars are ignored as coincidental, and
+    only the last max_chars of `previous` are searched.
+    
+    Returns:
+        Overlap length in characters, or 0 if there is none
+    """
+    probe = following[:min_chars]
+    if len(probe) < min_chars:
+        return 0
+    
+    # Every overlap starts with the probe; the first that matches is the longest
+    position = previous.find(probe, max(len(previous) - max_chars, 0))
+    while position != -1:
+        if following.startswith(previous[position:]):
+            return len(previous) - position
+        position = previous.find(probe, position + 1)
+    return 0
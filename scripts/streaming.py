@@ -0,0 +1,215 @@
+"""
+Building blocks for the bounded-memory streaming pipeline.
+"""
+
+import heapq
+import logging
+import shutil
+import sys
+import threading
+from pathlib import Path
+from queue import Queue
+from typing import Any, Callable, Dict, Hashable, Iterable, Iterator, List, Optional, Sequence, Tuple
+
+from .models import ProcessedChunk
+
+try:
+    import resource
+except ImportError:  # Not available on Windows
+    resource = None
+
+logger = logging.getLogger(__name__)
+
+
+# Rough per-chunk cost of the ProcessedChunk/ChunkMetadata objects on top of the text
+_CHUNK_OVERHEAD_BYTES = 2048
+
+_DONE = object()
+
+
+def peak_rss_mb() -> Optional[float]:
+    """Peak resident set size of this process in MB (None where unsupported)."""
+    if resource is None:
+        return None
+    
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports kilobytes, macOS bytes
+    return peak / (1024 * 1024) if sys.platform == 'darwin' else peak / 1024
+
+
+def chunk_order(chunk: ProcessedChunk) -> Tuple[str, int]:
+    """Sort key that keeps chunks in document order."""
+    return (chunk.metadata.source_file, chunk.metadata.chunk_index)
+
+
+class StagePipeline:
+    """
+    Runs items through a chain of stages, one thread per stage.
+    
+    Stages are joined by bounded queues, so when a stage falls behind the
+    ones before it block instead of piling up work (backpressure): at most
+    `queue_size` items wait between any two stages. Items come out in input
+    order. Each item needs an `error` attribute; a stage that raises stores
+    the exception there, and later stages pass the item through untouched.
+    """
+    
+    def __init__(self, stages: Sequence[Tuple[str, Callable[[Any], None]]], queue_size: int = 8):
+        self.stages = list(stages)
+        self.queue_size = queue_size
+    
+    def run(self, items: Iterable) -> Iterator:
+        """Feed items through every stage and yield them as they complete."""
+        inbox = Queue(maxsize=self.queue_size)
+        threading.Thread(target=self._feed, args=(items, inbox), daemon=True).start()
+        
+        for name, stage in self.stages:
+            outbox = Queue(maxsize=self.queue_size)
+            threading.Thread(
+                target=self._work, args=(name, stage, inbox, outbox), name=f"stage-{name}", daemon=True
+            ).start()
+            inbox = outbox
+        
+        while True:
+            item = inbox.get()
+            if item is _DONE:
+                return
+            yield item
+    
+    @staticmethod
+    def _feed(items: Iterable, outbox: Queue):
+        try:
+            for item in items:
+                outbox.put(item)
+        finally:
+            outbox.put(_DONE)
+    
+    @staticmethod
+    def _work(name: str, stage: Callable[[Any], None], inbox: Queue, outbox: Queue):
+        while True:
+            item = inbox.get()
+            if item is _DONE:
+                outbox.put(_DONE)
+                return
+            
+            if item.error is None:
+                try:
+                    stage(item)
+                except Exception as e:
+                    logger.debug(f"Stage {name} failed: {e}")
+                    item.error = e
+            
+            outbox.put(item)
+
+
+class SpillBuffer:
+    """
+    Chunks of one group, held in memory until spilled to disk.
+    
+    Each spill writes the in-memory chunks as one sorted JSONL run. Iterating
+    merges all runs with the chunks still in memory, so chunks come back in
+    `sort_key` order while only one chunk per run is loaded at a time.
+    """
+    
+    def __init__(self, spill_dir: Path, name: str, sort_key: Callable[[ProcessedChunk], Any] = chunk_order):
+        self.spill_dir = Path(spill_dir)
+        self.name = name
+        self.sort_key = sort_key
+        self.size_bytes = 0
+        self.runs: List[Path] = []
+        self._chunks: List[ProcessedChunk] = []
+        self._count = 0
+    
+    def append(self, chunk: ProcessedChunk) -> int:
+        """Add a chunk and return its estimated in-memory size in bytes."""
+        size = sys.getsizeof(chunk.text) + _CHUNK_OVERHEAD_BYTES
+        self._chunks.append(chunk)
+        self.size_bytes += size
+        self._count += 1
+        return size
+    
+    def spill(self) -> int:
+        """Write the in-memory chunks to a new sorted run; returns the bytes freed."""
+        if not self._chunks:
+            return 0
+        
+        self.spill_dir.mkdir(parents=True, exist_ok=True)
+        path = self.spill_dir / f"{self.name}-{len(self.runs):04d}.jsonl"
+        self._chunks.sort(key=self.sort_key)
+        with open(path, 'w', encoding='utf-8') as f:
+            for chunk in self._chunks:
+                f.write(chunk.model_dump_json())
+                f.write('\n')
+        
+        logger.debug(f"Spilled {len(self._chunks)} {self.name} chunks to {path.name}")
+        self.runs.append(path)
+        freed = self.size_bytes
+        self._chunks = []
+        self.size_bytes = 0
+        return freed
+    
+    def __len__(self) -> int:
+        return self._count
+    
+    def __iter__(self) -> Iterator[ProcessedChunk]:
+        self._chunks.sort(key=self.sort_key)
+        streams = [self._read_run(path) for path in self.runs]
+        streams.append(iter(self._chunks))
+        return heapq.merge(*streams, key=self.sort_key)
+    
+    @staticmethod
+    def _read_run(path: Path) -> Iterator[ProcessedChunk]:
+        with open(path, encoding='utf-8') as f:
+            for line in f:
+                yield ProcessedChunk.model_validate_json(line)
+    
+    def close(self):
+        """Drop buffered chunks and delete spilled runs."""
+        for path in self.runs:
+            path.unlink(missing_ok=True)
+        self.runs = []
+        self._chunks = []
+        self.size_bytes = 0
+
+
+class SpillManager:
+    """
+    Per-group spill buffers sharing one memory budget.
+    
+    Whenever the buffered chunks exceed the budget, the largest buffer is
+    spilled to disk. Groups are looked up with get(), like a dict of lists.
+    """
+    
+    def __init__(self, spill_dir: Path, budget_bytes: int, sort_key: Callable[[ProcessedChunk], Any] = chunk_order):
+        self.spill_dir = Path(spill_dir)
+        self.budget_bytes = budget_bytes
+        self.sort_key = sort_key
+        self.buffers: Dict[Hashable, SpillBuffer] = {}
+        self.in_memory_bytes = 0
+        self.stats = {"spills": 0, "spilled_bytes": 0}
+    
+    def add(self, group: Hashable, chunk: ProcessedChunk):
+        """Buffer a chunk under group, spilling if the budget is exceeded."""
+        buffer = self.buffers.get(group)
+        if buffer is None:
+            name = getattr(group, 'value', str(group))
+            buffer = self.buffers[group] = SpillBuffer(self.spill_dir, name, self.sort_key)
+        
+        self.in_memory_bytes += buffer.append(chunk)
+        if self.in_memory_bytes > self.budget_bytes:
+            largest = max(self.buffers.values(), key=lambda b: b.size_bytes)
+            freed = largest.spill()
+            self.in_memory_bytes -= freed
+            self.stats["spills"] += 1
+            self.stats["spilled_bytes"] += freed
+    
+    def get(self, group: Hashable, default=None):
+        return self.buffers.get(group, default)
+    
+    def close(self):
+        """Delete every spilled run (and the spill directory if it is left empty)."""
+        for buffer in self.buffers.values():
+            buffer.close()
+        self.buffers = {}
+        self.in_memory_bytes = 0
+        if self.spill_dir.is_dir() and not any(self.spill_dir.iterdir()):
+            shutil.rmtree(self.spill_dir, ignore_errors=True)
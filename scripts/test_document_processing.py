@@ -3,21 +3,39 @@ Test suite for the RAG document processing pipeline.
 """
 
 import pytest
+import numpy as np
 from pathlib import Path
+import os
+import random
+import re
 import tempfile
 import asyncio
 
-from rag_processor.models import DocumentType, ProcessedChunk, ChunkMetadata
+from rag_processor.models import DocumentType, ProcessedChunk, ChunkMetadata, ConsolidatedDocument
+from rag_processor.config import CHUNKING_STRATEGIES, FRAMEWORK_PATTERNS
 from rag_processor.loaders import DocumentLoader
+from rag_processor.matching import PatternMatcher, get_pattern_matcher
 from rag_processor.chunkers import IntelligentChunker
 from rag_processor.transcript_cleaner import TranscriptCleaner
 from rag_processor.framework_extractor import FrameworkExtractor
+from rag_processor.metadata import MetadataExtractor
+from rag_processor.consolidator import ContentConsolidator
+from rag_processor.similarity import (
+    shingle_hashes, jaccard_many, ngram_vector, cosine_many, JaccardIndex, token_frequencies
+)
+from rag_processor.parse_cache import ParseCache
+from rag_processor.chunk_store import ChunkStore, ingest_version
+from rag_processor.checkpoint import CheckpointError, CheckpointStore, chunk_from_record, chunk_to_record, pack_record
+from rag_processor.tokens import get_token_counter
+from rag_processor.validator import QualityValidator
+from rag_processor.tree_writer import TreeWriter
+from rag_processor.consolidate_for_librechat import consolidate_files
+from rag_processor.file_generator import FileGenerator
+from rag_processor.packing import allocate_bins, capped_partition, first_fit_decreasing, linear_partition, reuse_groups
+from rag_processor.streaming import SpillBuffer, SpillManager, StagePipeline
 
 
-@pytest.fixture
-def sample_book_text():
-    """Sample book text for testing."""
-    return """
+SAMPLE_BOOK_TEXT = """
 # Chapter 1: Introduction to Consulting
 
 Consulting is about transformation. The key to success lies in understanding
@@ -47,10 +65,7 @@ When all three align, you have a winning opportunity.
 """
 
 
-@pytest.fixture
-def sample_transcript_text():
-    """Sample transcript text for testing."""
-    return """
+SAMPLE_TRANSCRIPT_TEXT = """
 [00:00] James: Welcome everyone to today's workshop. Um, so like, you know, 
 today we're going to talk about the Daily Client Machine.
 
@@ -65,6 +80,49 @@ in the first week if you, uh, follow the process exactly.
 """
 
 
+@pytest.fixture
+def sample_book_text():
+    """Sample book text for testing."""
+    return SAMPLE_BOOK_TEXT
+
+
+@pytest.fixture
+def sample_transcript_text():
+    """Sample transcript text for testing."""
+    return SAMPLE_TRANSCRIPT_TEXT
+
+
+def legacy_remove_fillers(cleaner: TranscriptCleaner, text: str) -> str:
+    """The original multi-pass TranscriptCleaner._remove_fillers (reference output)."""
+    cleaned = cleaner.filler_pattern.sub('', text)
+    cleaned = re.sub(r'\s+,', ',', cleaned)
+    cleaned = re.sub(r',\s*,+', ',', cleaned)
+    cleaned = re.sub(r',\s*\.', '.', cleaned)
+    cleaned = re.sub(r'\s+', ' ', cleaned)
+    return cleaned.strip()
+
+
+def legacy_identify_framework_chunks(extractor: FrameworkExtractor, chunks) -> dict:
+    """The original list-membership FrameworkExtractor.identify_framework_chunks (reference output)."""
+    framework_chunks = {}
+    for chunk in chunks:
+        for framework_name, info in extractor.known_frameworks.items():
+            components = sum(1 for component in info["components"] if component in chunk.text)
+            if (
+                framework_name in chunk.text
+                or any(alias in chunk.text for alias in info["aliases"])
+                or components >= len(info["components"]) * 0.7
+            ):
+                framework_chunks.setdefault(framework_name, []).append(chunk)
+        for pattern in FRAMEWORK_PATTERNS:
+            for match in re.findall(pattern, chunk.text, re.IGNORECASE):
+                framework_name = match[0] if isinstance(match, tuple) else match
+                framework_chunks.setdefault(framework_name, [])
+                if chunk not in framework_chunks[framework_name]:
+                    framework_chunks[framework_name].append(chunk)
+    return framework_chunks
+
+
 class TestDocumentLoader:
     """Test document loading and classification."""
     
@@ -89,6 +147,161 @@ class TestDocumentLoader:
         assert loader._classify_document("", "framework_doc.pdf") == DocumentType.FRAMEWORK
 
 
+class TestParseCache:
+    """Test the partition result cache."""
+    
+    def test_cache_roundtrip_and_key(self, tmp_path):
+        """Test that entries round-trip and keys follow file content."""
+        doc = tmp_path / "doc.txt"
+        doc.write_text("first version")
+        cache = ParseCache(tmp_path / "cache")
+        
+        key = cache.key_for(doc, "auto")
+        assert cache.get(key) is None
+        
+        cache.put(key, {"texts": ["first version"], "page_numbers": [None], "element_types": ["Text"]})
+        assert cache.get(key)["texts"] == ["first version"]
+        assert cache.key_for(doc, "hi_res") != key
+        
+        doc.write_text("second version")
+        assert cache.key_for(doc, "auto") != key
+    
+    def test_cache_hit_skips_partition(self, tmp_path):
+        """Test that a cached document is loaded without partitioning."""
+        doc = tmp_path / "notes.txt"
+        doc.write_text("ignored")
+        cache = ParseCache(tmp_path / "cache")
+        parsed = {"texts": ["Cached Title Line", "Body text"], "page_numbers": [1, 1], "element_types": ["Title", "Text"]}
+        cache.put(cache.key_for(doc, "auto"), parsed)
+        
+        loader = DocumentLoader(cache=cache)
+        loader._partition = None  # Would raise if called
+        text, _, metadata = loader.load_document(doc)
+        
+        assert text == "Cached Title Line\nBody text"
+        assert metadata["title"] == "Cached Title Line"
+    
+    def test_fallback_parse_is_not_cached(self, tmp_path):
+        """Test that a fast fallback parse isn't stored under the hi_res key."""
+        doc = tmp_path / "slides.pdf"
+        doc.write_bytes(b"%PDF-1.4")
+        cache = ParseCache(tmp_path / "cache")
+        parsed = {"texts": ["Fallback Title"], "page_numbers": [1], "element_types": ["Title"]}
+        
+        loader = DocumentLoader(cache=cache)
+        loader._partition = lambda path, strategy: ([], "fast")
+        loader._summarize_elements = lambda elements: parsed
+        assert loader._parse(doc) == parsed
+        assert cache.get(cache.key_for(doc, "hi_res")) is None
+        
+        loader._partition = lambda path, strategy: ([], strategy)
+        loader._parse(doc)
+        assert cache.get(cache.key_for(doc, "hi_res")) == parsed
+    
+    def test_lru_eviction(self, tmp_path):
+        """Test that the cache stays within its size budget."""
+        cache = ParseCache(tmp_path / "cache", max_bytes=300)
+        for i in range(10):
+            cache.put(f"key{i}", {"texts": ["x" * 50]})
+        
+        total = sum(p.stat().st_size for p in (tmp_path / "cache").glob("*.json"))
+        assert total <= 300
+        assert cache.get("key9") is not None
+        assert cache.get("key0") is None
+
+
+class TestChunkStore:
+    """Test the input fingerprint manifest and chunk store."""
+    
+    def test_ingest_version_covers_pattern_tables(self, monkeypatch):
+        """Test that editing a config table the matcher is built from invalidates stored chunks."""
+        import rag_processor.matching as matching
+        
+        before = ingest_version()
+        flywheel = {"components": ["Attract", "Convert"], "aliases": ["The Flywheel"]}
+        monkeypatch.setattr(matching, "KNOWN_FRAMEWORKS", {**matching.KNOWN_FRAMEWORKS, "Growth Flywheel": flywheel})
+        monkeypatch.setattr(matching, "_pattern_matcher", None)  # Rebuilt from the edited table
+        
+        assert ingest_version() != before
+    
+    def test_reuse_change_and_retract(self, tmp_path):
+        """Test that only unchanged documents are current and deleted ones are retracted."""
+        kept, edited, deleted = (tmp_path / name for name in ("kept.txt", "edited.txt", "deleted.txt"))
+        for path in (kept, edited, deleted):
+            path.write_text(f"contents of {path.name}")
+        
+        store = ChunkStore(tmp_path / "store")
+        for path in (kept, edited, deleted):
+            store.put(path, path.stem, [make_chunk(path.read_text(), 0, document_id=path.stem)])
+        store.save()
+        
+        edited.write_text("new contents")
+        deleted.unlink()
+        os.utime(kept, ns=(0, 0))  # Touched but unchanged
+        
+        store = ChunkStore(tmp_path / "store")
+        assert store.retract_missing([kept, edited]) == ["deleted.txt"]
+        assert store.is_current(kept)
+        assert not store.is_current(edited)
+        assert [c.text for c in store.load(kept)] == ["contents of kept.txt"]
+        assert not ChunkStore(tmp_path / "store", version="other").is_current(kept)
+
+
+class TestCheckpoint:
+    """Test stage checkpoints."""
+    
+    def test_round_trip_and_invalidation(self, tmp_path):
+        """Test that checkpoints round-trip chunks and rewriting a stage drops later ones."""
+        store = CheckpointStore(tmp_path)
+        chunks = [make_chunk(f"chunk {i}", i) for i in range(3)]
+        
+        with store.writer("chunks", {"note": "run 1"}) as writer:
+            writer.write({"file": "a.txt", "chunks": [chunk_to_record(c) for c in chunks]})
+        with store.writer("frameworks") as writer:
+            pass
+        
+        reader = store.reader("chunks")
+        assert reader.meta == {"note": "run 1"}
+        (record,) = list(reader)
+        assert [chunk_from_record(c) for c in record["chunks"]] == chunks
+        
+        # A failed write leaves no partial file and earlier stages intact
+        with pytest.raises(RuntimeError):
+            with store.writer("frameworks") as writer:
+                writer.write({"name": "partial"})
+                raise RuntimeError("interrupted")
+        assert not list(tmp_path.glob("*.tmp*"))
+        assert list(store.reader("chunks"))
+        
+        store.writer("chunks").commit()
+        with pytest.raises(CheckpointError):
+            store.reader("frameworks")
+        
+        (tmp_path / "frameworks.ckpt").write_bytes((tmp_path / "chunks.ckpt").read_bytes())
+        with pytest.raises(CheckpointError):
+            store.reader("frameworks")
+    
+    def test_packed_records_are_appended_in_order(self, tmp_path):
+        """Test that records packed elsewhere interleave with written ones and their files are removed."""
+        store = CheckpointStore(tmp_path)
+        parts = store.parts_dir("loaded")
+        parts.mkdir()
+        (parts / "b.part").write_bytes(pack_record({"file": "b.txt", "text": "packed by a worker"}))
+        
+        with store.writer("chunks") as writer:
+            writer.write({"file": "a.txt"})
+            writer.write_packed(parts / "b.part")
+            writer.write({"file": "c.txt"})
+        
+        assert [r["file"] for r in store.reader("chunks")] == ["a.txt", "b.txt", "c.txt"]
+        assert not list(parts.iterdir())
+        
+        # Starting the stage again clears parts left by an interrupted run
+        (parts / "stale.part").write_bytes(b"")
+        store.writer("loaded").commit()
+        assert not parts.exists()
+
+
 class TestChunking:
     """Test intelligent chunking."""
     
@@ -106,6 +319,23 @@ class TestChunking:
         assert all(isinstance(chunk, ProcessedChunk) for chunk in chunks)
         assert all(chunk.token_count > 0 for chunk in chunks)
     
+    def test_splitter_respects_token_limits(self, sample_transcript_text):
+        """Test that the token-window splitter honors max tokens and reports exact counts."""
+        chunker = IntelligentChunker()
+        chunker.strategy = CHUNKING_STRATEGIES[DocumentType.TRANSCRIPT]
+        splitter = chunker._create_splitter(DocumentType.TRANSCRIPT)
+        text = "\n\n".join([sample_transcript_text] * 50)
+        
+        chunks = splitter.split_text_with_counts(text)
+        
+        assert len(chunks) > 1
+        for chunk_text, token_count in chunks:
+            assert token_count <= chunker.strategy.max_tokens
+            assert chunk_text == chunk_text.strip()
+            assert len(chunker.tokenizer.encode(chunk_text)) == token_count
+        # Consecutive chunks share an overlap region
+        assert chunks[1][0][:20] in chunks[0][0]
+    
     def test_chapter_extraction(self, sample_book_text):
         """Test chapter extraction from chunks."""
         chunker = IntelligentChunker()
@@ -140,6 +370,21 @@ class TestTranscriptCleaner:
         assert "30 days" in cleaned
         assert "first week" in cleaned
     
+    def test_single_pass_matches_legacy(self, sample_transcript_text):
+        """Test that the fused normalizer gives the multi-pass output exactly."""
+        cleaner = TranscriptCleaner()
+        pieces = [
+            "um", "Umm", "uh", "like", "likely", "you know", "I mean", "so basically",
+            "right?", "okay?", "So", "word", " ", "  ", ",", ", ", " ,", "\n", "\t",
+            "\xa0", ".", "?", "(", "'", "é", "ſo basically",
+        ]
+        rng = random.Random(0)
+        samples = [sample_transcript_text, "", "um", ", um, .", "(um) right?So, , ."]
+        samples += ["".join(rng.choice(pieces) for _ in range(rng.randint(1, 12))) for _ in range(3000)]
+        
+        for text in samples:
+            assert cleaner._remove_fillers(text) == legacy_remove_fillers(cleaner, text), repr(text)
+    
     def test_preserve_quotes(self):
         """Test that important quotes are preserved."""
         cleaner = TranscriptCleaner()
@@ -191,6 +436,477 @@ class TestFrameworkExtractor:
                 assert "Energy" in framework.complete_text
                 assert "Earnings" in framework.complete_text
                 assert "Experience" in framework.complete_text
+    
+    def test_candidates_scored_and_capped(self):
+        """Test that generic pattern matches are dropped and kept frameworks are capped."""
+        named = "We run the Growth Flywheel System every week.\n1. Attract\n2. Convert"
+        chunks = [make_chunk(named, i) for i in range(5)]
+        chunks += [make_chunk(f"There is no Framework for this, just a business framework. Take {i}", 5 + i) for i in range(5)]
+        chunks.append(make_chunk("The Daily Client Machine brings leads.", 10))
+        
+        extractor = FrameworkExtractor(max_chunks_per_framework=3)
+        frameworks = extractor.extract_frameworks(chunks)
+        
+        assert sorted(frameworks) == ["Daily Client Machine", "Growth Flywheel"]
+        assert len(frameworks["Growth Flywheel"].source_chunks) == 3
+        stats = extractor.selection_stats
+        assert stats["selected"] == 2 and stats["chunks_dropped"] == 2
+        junk_tokens = sum(chunk.token_count for chunk in chunks[5:10])
+        assert stats["tokens_avoided"] > 2 * junk_tokens
+        
+        assert len(FrameworkExtractor(max_frameworks=1).extract_frameworks(chunks)) == 1
+    
+    def test_chunk_index_keeps_legacy_order(self, sample_book_text, sample_transcript_text):
+        """Test that the chunk ID index lists each candidate's chunks in the legacy order."""
+        pieces = [p for p in (sample_book_text + sample_transcript_text).split("\n\n") if p.strip()]
+        random.seed(5)
+        chunks = [make_chunk(random.choice(pieces), i, document_id=f"doc{i % 3}") for i in range(60)]
+        
+        extractor = FrameworkExtractor()
+        candidates = extractor.identify_framework_chunks(chunks)
+        legacy = legacy_identify_framework_chunks(extractor, chunks)
+        
+        spellings = {}
+        for name in legacy:
+            spellings.setdefault(name.lower(), []).append(name)
+        for key, names in spellings.items():
+            if len(names) > 1 or key not in candidates:
+                continue  # Merged spellings, or only matched inside another name's match
+            expected = [chunk.metadata.chunk_id for chunk in legacy[names[0]]]
+            found = [chunk.metadata.chunk_id for chunk in candidates[key].chunks]
+            assert list(candidates[key].chunk_mentions) == found
+            if candidates[key].known:
+                assert found == expected
+            else:
+                assert found == [chunk_id for chunk_id in expected if chunk_id in set(found)]
+        assert "3 e's" in candidates and "daily client machine" in candidates
+    
+    def test_enrichment_matches_are_reused(self, sample_book_text, sample_transcript_text):
+        """Test that framework hits recorded during enrichment replace a second scan."""
+        pieces = [p for p in (sample_book_text + sample_transcript_text).split("\n\n") if p.strip()]
+        scanned = [make_chunk(piece, i) for i in range(3) for piece in pieces]
+        enriched = [make_chunk(piece, i) for i in range(3) for piece in pieces]
+        MetadataExtractor().enrich_chunks(enriched)
+        # Records survive checkpoints and the chunk store
+        enriched = [chunk_from_record(chunk_to_record(chunk)) for chunk in enriched]
+        
+        extractor = FrameworkExtractor()
+        expected = extractor.identify_framework_chunks(scanned)
+        assert extractor.match_stats["chunks_scanned"] == len(scanned)
+        
+        extractor = FrameworkExtractor()
+        candidates = extractor.identify_framework_chunks(enriched)
+        assert extractor.match_stats["chunks_reused"] == len(enriched)
+        assert extractor.match_stats["chunks_scanned"] == 0
+        assert sorted(candidates) == sorted(expected)
+        for key, candidate in candidates.items():
+            assert candidate.chunk_mentions == expected[key].chunk_mentions
+        
+        # Merging invalidates the record, since a match may span the join
+        chunker = IntelligentChunker()
+        chunker.strategy = CHUNKING_STRATEGIES[DocumentType.TRANSCRIPT]
+        merged = chunker.merge_small_chunks(enriched[:2])
+        assert len(merged) == 1 and merged[0].metadata.framework_matches is None
+        assert enriched[0].metadata.framework_matches is not None
+
+
+class TestPatternMatcher:
+    """Test single-pass multi-pattern matching."""
+    
+    def test_scan_reports_every_category(self):
+        """Test literal (either case), regex and category-filtered hits from one scan."""
+        matcher = PatternMatcher()
+        matcher.add_literals("term", ["client", "Offer"])
+        matcher.add_literals("name", ["DCM"], case_sensitive=True)
+        matcher.add_patterns("framework", [r"\b(\w+)\s+framework"], ignore_case=True)
+        matcher.add_patterns("money", [r"\$\d+"])
+        
+        text = "Every CLIENT offer: the DCM and dcm, the Growth framework for $100."
+        hits = [(hit.category, hit.pattern, hit.text, hit.start) for hit in matcher.scan(text)]
+        assert hits == [
+            ("term", "client", "CLIENT", 6),
+            ("term", "Offer", "offer", 13),
+            ("name", "DCM", "DCM", 24),
+            ("framework", r"\b(\w+)\s+framework", "Growth", 41),
+            ("money", r"\$\d+", "$100", 62),
+        ]
+        assert matcher.found(text, ["term", "money"]) == {"term": {"client", "Offer"}, "money": {r"\$\d+"}}
+        with pytest.raises(ValueError):
+            matcher.add_patterns("framework", [r"\bFramework"], ignore_case=True)
+    
+    def test_config_tables(self, sample_transcript_text):
+        """Test the shared matcher built from the config tables."""
+        found = get_pattern_matcher().found(sample_transcript_text)
+        assert found["framework:Daily Client Machine"] == {"Daily Client Machine", "Client Machine"}
+        assert found["document_type:transcript"]
+        assert "process" in found["business_term"]
+
+
+class TestSimilarity:
+    """Test vectorized similarity measures."""
+    
+    def test_batch_scores_are_position_independent(self, sample_transcript_text):
+        """Test that an inserted word barely moves the score and batches match pairs."""
+        shifted = "Okay. " + sample_transcript_text
+        candidates = [sample_transcript_text, shifted, SAMPLE_BOOK_TEXT, ""]
+        
+        query = shingle_hashes(sample_transcript_text, size=3)
+        jaccard = jaccard_many(query, [shingle_hashes(c, size=3) for c in candidates])
+        cosine = cosine_many(
+            ngram_vector(sample_transcript_text),
+            np.stack([ngram_vector(c) for c in candidates])
+        )
+        
+        for scores in (jaccard, cosine):
+            assert scores[0] == pytest.approx(1.0, abs=1e-5)
+            assert scores[1] > 0.9
+            assert scores[2] < 0.5
+            assert scores[3] == 0.0
+        assert jaccard[1] == jaccard_many(query, [shingle_hashes(shifted, size=3)])[0]
+    
+    def test_transcript_repetitions_collapsed(self):
+        """Test that repeated paragraphs are dropped, keeping the longer version in place."""
+        cleaner = TranscriptCleaner()
+        para = "James: The Daily Client Machine gets you new clients every single day."
+        longer = para.replace("every", "each and every")
+        text = "\n\n".join([para, "Something else entirely.", para.replace("new ", ""), longer])
+        
+        assert cleaner._consolidate_repetitions(text) == f"{longer}\n\nSomething else entirely."
+    
+    def test_jaccard_index_matches_brute_force(self):
+        """Test that prefix-filtered lookups find the same earliest match as a full scan."""
+        rng = np.random.default_rng(7)
+        sets = []
+        for _ in range(300):
+            if sets and rng.random() < 0.3:
+                base = sets[rng.integers(len(sets))]
+                sets.append(np.unique(np.append(base, rng.integers(0, 200, size=1)).astype(np.uint64)))
+            else:
+                sets.append(np.unique(rng.integers(0, 200, size=rng.integers(1, 20)).astype(np.uint64)))
+        
+        index = JaccardIndex(threshold=0.8, frequencies=token_frequencies(sets))
+        for i, tokens in enumerate(sets):
+            scores = jaccard_many(tokens, sets[:i])
+            expected = np.flatnonzero(scores > 0.8)
+            assert index.find(tokens) == (expected[0] if len(expected) else None)
+            index.add(tokens)
+
+
+def make_chunk(text: str, index: int, document_id: str = "doc") -> ProcessedChunk:
+    """Build a transcript chunk for consolidation tests."""
+    metadata = ChunkMetadata(
+        chunk_id="",
+        document_id=document_id,
+        source_file=f"{document_id}.txt",
+        document_type=DocumentType.TRANSCRIPT,
+        chunk_index=index,
+        total_chunks_in_section=1
+    )
+    return ProcessedChunk(text=text, metadata=metadata, token_count=len(text.split()))
+
+
+class TestConsolidator:
+    """Test content consolidation."""
+    
+    def test_chunk_ids_are_unique(self):
+        """Test that generated chunk IDs depend on document and index."""
+        ids = {make_chunk("text", i).metadata.chunk_id for i in range(3)}
+        ids.add(make_chunk("text", 0, document_id="other").metadata.chunk_id)
+        assert len(ids) == 4
+    
+    def test_near_duplicates_collapsed(self, sample_transcript_text):
+        """Test that re-recorded and lightly edited chunks are collapsed and mapped."""
+        edited = sample_transcript_text.replace("30 days", "thirty days")
+        chunks = [
+            make_chunk(sample_transcript_text, 0),
+            make_chunk(SAMPLE_BOOK_TEXT, 1),
+            make_chunk("  " + sample_transcript_text, 2),
+            make_chunk(edited, 3),
+        ]
+        
+        consolidator = ContentConsolidator(deduplication_threshold=0.8)
+        kept = consolidator._remove_duplicates(chunks)
+        
+        kept_id = chunks[0].metadata.chunk_id
+        assert [c.metadata.chunk_id for c in kept] == [kept_id, chunks[1].metadata.chunk_id]
+        assert edited != sample_transcript_text
+        assert consolidator.duplicate_map == {
+            kept_id: [chunks[2].metadata.chunk_id, chunks[3].metadata.chunk_id]
+        }
+    
+    def test_streaming_matches_in_memory(self, tmp_path):
+        """Test that streaming consolidation over spilled buffers writes the same content."""
+        random.seed(11)
+        words = "client offer growth revenue energy scale leverage pipeline".split()
+        chunks = [
+            make_chunk(" ".join(random.choices(words, k=400)), index, document_id=f"talk{doc}")
+            for doc in range(6) for index in range(4)
+        ]
+        random.shuffle(chunks)
+        
+        expected = ContentConsolidator(target_file_count=2).consolidate_chunks(chunks)
+        
+        consolidator = ContentConsolidator(target_file_count=2)
+        buffers = SpillManager(tmp_path / "spill", budget_bytes=16 * 1024)
+        consolidator.begin_stream()
+        for chunk in consolidator.filter_duplicates(chunks):
+            buffers.add(chunk.metadata.document_type, chunk)
+        
+        written = []
+        consolidator.consolidate_stream(buffers, {}, lambda category, doc: written.append(doc.content))
+        buffers.close()
+        
+        assert buffers.stats["spills"] > 0
+        assert not (tmp_path / "spill").exists()
+        assert sorted(written) == sorted(doc.content for docs in expected.values() for doc in docs)
+    
+    
+    @pytest.mark.parametrize("strategy", ["ordered", "first_fit"])
+    def test_packing_reaches_target(self, strategy):
+        """Test that many small transcripts are packed into the target number of files."""
+        random.seed(5)
+        words = "client offer growth revenue energy scale leverage pipeline".split()
+        chunks = [
+            make_chunk(" ".join(random.choices(words, k=random.randint(100, 600))), index, document_id=f"talk{doc}")
+            for doc in range(120) for index in range(3)
+        ]
+        
+        consolidator = ContentConsolidator(target_file_count=40, packing_strategy=strategy)
+        docs = consolidator.consolidate_chunks(chunks)["transcripts"]
+        
+        assert 36 <= len(docs) <= 44
+        assert all(doc.total_tokens <= consolidator.max_tokens for doc in docs)
+        assert sorted(c for doc in docs for c in doc.source_chunks) == sorted(c.metadata.chunk_id for c in chunks)
+        if strategy == "ordered":
+            in_order = sorted(chunks, key=lambda c: (c.metadata.source_file, c.metadata.chunk_index))
+            assert [c for doc in docs for c in doc.source_chunks] == [c.metadata.chunk_id for c in in_order]
+    
+    
+    @pytest.mark.parametrize("strategy", ["semantic", "hybrid"])
+    def test_topic_strategies_group_related_sources(self, strategy):
+        """Test that topic strategies put related material from different sources together."""
+        random.seed(8)
+        topics = [
+            "pricing offer premium package value invoice discount margin".split(),
+            "morning routine energy sleep workout habit focus recovery".split(),
+        ]
+        chunks = [
+            make_chunk(" ".join(random.choices(topics[doc % 2], k=300)), index, document_id=f"talk{doc}")
+            for doc in range(8) for index in range(3)
+        ]
+        
+        consolidator = ContentConsolidator(target_file_count=2, consolidation_strategy=strategy)
+        docs = consolidator.consolidate_chunks(chunks)["transcripts"]
+        
+        assert len(docs) >= 2
+        for doc in docs:
+            files = {int(name[len("talk"):-len(".txt")]) % 2 for name in doc.source_files}
+            assert len(files) == 1
+        assert sum(len(doc.source_files) > 1 for doc in docs) >= 2
+    
+    
+    def test_summed_token_totals_match_encoding(self, sample_transcript_text):
+        """Test that document token totals summed from chunk counts match re-encoding."""
+        counter = get_token_counter()
+        chunks = []
+        for index, paragraph in enumerate(sample_transcript_text.split("\n\n") * 4):
+            chunk = make_chunk(paragraph, index)
+            chunk.token_count = counter.count(paragraph)
+            chunks.append(chunk)
+        
+        consolidator = ContentConsolidator(target_file_count=1, verify_tokens=True)
+        docs = consolidator.consolidate_chunks(chunks)["transcripts"]
+        
+        assert consolidator.token_verification["documents"] == len(docs)
+        assert consolidator.token_verification["mismatched"] == 0
+        assert all(doc.total_tokens == counter.count(doc.content) for doc in docs)
+    
+    
+    def test_chunk_overlap_is_stitched(self):
+        """Test that consecutive chunks of a document are rejoined without their overlap."""
+        random.seed(2)
+        words = "client offer growth revenue energy scale leverage pipeline".split()
+        text = "\n\n".join(
+            f"[00:{minute:02d}] James: " + ". ".join(" ".join(random.choices(words, k=12)) for _ in range(4)) + "."
+            for minute in range(60)
+        )
+        chunker = IntelligentChunker()
+        chunker.strategy = CHUNKING_STRATEGIES[DocumentType.TRANSCRIPT]
+        pieces = chunker._create_splitter(DocumentType.TRANSCRIPT).split_text_with_counts(text)
+        chunks = []
+        for index, (piece, token_count) in enumerate(pieces):
+            chunk = make_chunk(piece.strip(), index)
+            chunk.token_count = token_count
+            chunks.append(chunk)
+        
+        consolidator = ContentConsolidator(target_file_count=1, verify_tokens=True)
+        (doc,) = consolidator.consolidate_chunks(chunks)["transcripts"]
+        
+        assert len(chunks) > 2
+        assert doc.content == text.strip()
+        assert doc.overlap_tokens_removed > 0
+        assert consolidator.token_verification["mismatched"] == 0
+        assert consolidator.content_tracker.preservation_rate() == 100.0
+        
+        # Chunks with a gap between them are not stitched
+        consolidator = ContentConsolidator(target_file_count=1)
+        (doc,) = consolidator.consolidate_chunks([chunks[0], chunks[2]])["transcripts"]
+        assert doc.content == f"{chunks[0].text}\n\n{chunks[2].text}"
+        assert doc.overlap_tokens_removed == 0
+    
+    
+    def test_stitched_token_counts_are_exact(self):
+        """Test that a stitched piece is counted as a whole, not from its chunks' counts."""
+        counter = get_token_counter()
+        text = " ".join(f"word{i}" for i in range(200))
+        first, second = make_chunk(text[:700], 0), make_chunk(text[600:], 1)
+        # Splitter counts cover the whitespace the chunker strips
+        first.token_count = counter.count(first.text) + 1
+        second.token_count = counter.count(second.text) + 1
+        
+        pieces, token_counts, (removed_tokens, removed_chars) = ContentConsolidator()._stitch_overlaps([first, second])
+        
+        assert pieces == [text]
+        assert token_counts == [counter.count(text)]
+        assert removed_tokens == first.token_count + second.token_count - counter.count(text)
+        assert removed_chars == 100
+    
+    
+    @pytest.mark.parametrize("strategy", ["ordered", "first_fit"])
+    def test_stable_packing_keeps_unaffected_files(self, tmp_path, strategy):
+        """Test that a stable re-run rewrites only files whose chunks changed."""
+        random.seed(13)
+        words = "client offer growth revenue energy scale leverage pipeline".split()
+        texts = {
+            (doc, index): " ".join(random.choices(words, k=random.randint(300, 500)))
+            for doc in range(30) for index in range(3)
+        }
+        
+        def consolidate(texts, assignment=None):
+            consolidator = ContentConsolidator(target_file_count=10, packing_strategy=strategy, stable_packing=True)
+            if assignment:
+                consolidator.load_assignment(assignment)
+            chunks = [make_chunk(text, index, document_id=f"talk{doc:02d}") for (doc, index), text in texts.items()]
+            docs = consolidator.consolidate_chunks(chunks)["transcripts"]
+            consolidator.save_assignment(tmp_path / "assignment.json")
+            assert sorted(c for doc in docs for c in doc.source_chunks) == sorted(c.metadata.chunk_id for c in chunks)
+            return consolidator, {doc.filename: doc.content for doc in docs}
+        
+        _, before = consolidate(texts)
+        
+        texts[(10, 1)] = texts[(10, 1)] + " edited"
+        del texts[(20, 0)], texts[(20, 1)], texts[(20, 2)]
+        texts[(99, 0)] = " ".join(random.choices(words, k=400))
+        consolidator, after = consolidate(texts, tmp_path / "assignment.json")
+        
+        kept = {name for name in after if before.get(name) == after[name]}
+        assert len(kept) == consolidator.packing_stats["files_kept"] >= len(before) - 4
+        assert consolidator.packing_stats["files_repacked"] == len(after) - len(kept)
+        assert all("edited" not in after[name] for name in kept)
+        assert len(set(after)) == len(after)
+        assert all(re.match(r"\d\d_", name) for name in after)
+
+
+class TestPacking:
+    """Test the bin packing engine."""
+    
+    def test_linear_partition(self):
+        """Test that ordered packing balances groups and prefers section boundaries."""
+        weights = [500] * 40
+        assert linear_partition(weights, 4, 5000) == [0, 10, 20, 30]
+        
+        # Sections of 9 items: cutting at their ends beats exact balance
+        section_ends = [(i + 1) % 9 == 0 for i in range(36)]
+        assert linear_partition([500] * 36, 4, 5000, section_ends) == [0, 9, 18, 27]
+        
+        starts = linear_partition([3000, 3000, 3000], 1, 5000)
+        assert starts == [0, 1, 2]
+    
+    def test_first_fit_decreasing(self):
+        """Test that first-fit-decreasing uses every item once within max tokens."""
+        random.seed(3)
+        weights = [random.randint(50, 1500) for _ in range(500)]
+        groups = first_fit_decreasing(weights, 100, 5000)
+        
+        assert sorted(i for group in groups for i in group) == list(range(500))
+        assert all(sum(weights[i] for i in group) <= 5000 for group in groups)
+        assert len(groups) == 100
+    
+    def test_reuse_groups(self):
+        """Test that intact previous groups are kept and light leftover runs absorb a neighbour."""
+        keys = list("abcdefgh")
+        previous = [["a", "b"], ["c", "d"], ["e", "x"], ["g", "h"]]
+        
+        kept, runs = reuse_groups(keys, [1000] * 8, previous, 2000)
+        assert kept == [(0, [0, 1]), (1, [2, 3]), (3, [6, 7])]
+        assert runs == [[4, 5]]
+        
+        # A one-item run is too light on its own and takes the group before it
+        kept, runs = reuse_groups(keys, [1000] * 8, previous, 3000)
+        assert kept == [(0, [0, 1]), (3, [6, 7])]
+        assert runs == [[2, 3, 4, 5]]
+        
+        # Reordered or split groups are repacked
+        kept, runs = reuse_groups(list("bacd"), [1000] * 4, [["a", "b"], ["c", "d"]], 0)
+        assert kept == [(1, [2, 3])] and runs == [[0, 1]]
+        kept, runs = reuse_groups(list("acbd"), [1000] * 4, [["a", "b"], ["c", "d"]], 0, contiguous=False)
+        assert kept == [(0, [0, 2]), (1, [1, 3])] and runs == []
+    
+    def test_capped_partition(self):
+        """Test that capped packing uses the fewest groups, evened out, within both caps."""
+        weights = [3000, 1000, 1000, 1000, 3000, 1000]
+        assert capped_partition(weights, [1] * 6, 6000, 100) == [0, 3]
+        assert capped_partition(weights, [1] * 6, 6000, 2) == [0, 2, 4]
+        assert capped_partition(weights, [1] * 6, 6000, 100, max_groups=4) == [0, 1, 4, 5]
+        assert capped_partition(weights, [1] * 6, 4000, 100, max_groups=2) is None
+        assert capped_partition([9000, 10], [1, 1], 5000, 100) == [0, 1]
+    
+    def test_allocate_bins(self):
+        """Test that the file budget follows token totals within the token bounds."""
+        bins = allocate_bins({"books": 140000, "guides": 35000, "templates": 500}, 50, 2000, 5000)
+        assert bins == {"books": 40, "guides": 10, "templates": 1}
+
+
+class TestStreaming:
+    """Test the bounded-memory streaming building blocks."""
+    
+    def test_spill_buffer_merges_runs_in_order(self, tmp_path):
+        """Test that chunks come back in document order across spilled runs."""
+        buffer = SpillBuffer(tmp_path, "transcript")
+        order = list(range(20))
+        random.Random(5).shuffle(order)
+        for i, index in enumerate(order):
+            buffer.append(make_chunk(f"chunk {index}", index))
+            if i % 6 == 5:
+                buffer.spill()
+        
+        assert len(buffer.runs) == 3
+        assert len(buffer) == 20
+        assert [c.metadata.chunk_index for c in buffer] == list(range(20))
+        assert [c.metadata.chunk_index for c in buffer] == list(range(20))  # Re-iterable
+    
+    def test_stage_pipeline_keeps_order_and_isolates_errors(self):
+        """Test that items pass every stage in order and failures skip later stages."""
+        class Item:
+            def __init__(self, value):
+                self.value = value
+                self.error = None
+        
+        def double(item):
+            item.value *= 2
+        
+        def fail_on_six(item):
+            if item.value == 6:
+                raise ValueError("six")
+        
+        def increment(item):
+            item.value += 1
+        
+        stages = [("double", double), ("check", fail_on_six), ("increment", increment)]
+        results = list(StagePipeline(stages, queue_size=2).run(Item(v) for v in range(10)))
+        
+        assert [item.value for item in results] == [1, 3, 5, 6, 9, 11, 13, 15, 17, 19]
+        assert isinstance(results[3].error, ValueError)
 
 
 @pytest.mark.asyncio
@@ -209,12 +925,143 @@ async def test_integration():
         assert len(text) > 0
         assert doc_type is not None
         assert metadata is not None
-        
+    
     finally:
         # Clean up
         temp_path.unlink()
 
 
+class TestFileGenerator:
+    """Test deterministic, incremental output generation."""
+    
+    def test_unchanged_files_are_not_rewritten(self, tmp_path):
+        """Test that only added, changed and removed files show up in the delta."""
+        import hashlib
+        import json
+        
+        def make_docs(texts):
+            return {"guides": [
+                ConsolidatedDocument(
+                    filename=f"{i:02d}_Guide_{i}.md", title=f"Guide {i}", category="guides", content=text,
+                    source_chunks=[], source_files=["a.txt"], total_tokens=len(text.split()), keywords=[]
+                )
+                for i, text in enumerate(texts, 1)
+            ]}
+        
+        FileGenerator(tmp_path).generate_files(make_docs(["one", "two", "three"]))
+        first = {path.name: path.read_bytes() for path in (tmp_path / "for_upload" / "guides").iterdir()}
+        assert not any(b"generated" in content for content in first.values())
+        
+        manifest_path = tmp_path / "for_upload" / "upload_manifest.json"
+        manifest_mtime = manifest_path.stat().st_mtime_ns
+        generator = FileGenerator(tmp_path)
+        generator.generate_files(make_docs(["one", "two", "three"]))
+        assert generator.stats["delta"] == {"added": [], "changed": [], "removed": [], "unchanged": 3}
+        assert manifest_path.stat().st_mtime_ns == manifest_mtime
+        
+        generator = FileGenerator(tmp_path)
+        generator.generate_files(make_docs(["one", "TWO"]))
+        delta = json.loads((tmp_path / "for_upload" / "upload_delta.json").read_text())
+        assert delta == {"added": [], "changed": ["guides/02_Guide_2.md"], "removed": ["guides/03_Guide_3.md"], "unchanged": 1}
+        assert sorted(path.name for path in (tmp_path / "for_upload" / "guides").iterdir()) == ["01_Guide_1.md", "02_Guide_2.md"]
+        
+        manifest = json.loads((tmp_path / "for_upload" / "upload_manifest.json").read_text())
+        for file_info in manifest["categories"]["guides"]["files"]:
+            content = (tmp_path / "for_upload" / "guides" / file_info["filename"]).read_bytes()
+            assert file_info["sha256"] == hashlib.sha256(content).hexdigest()
+    
+    def test_interrupted_run_keeps_previous_tree(self, tmp_path):
+        """Test that for_upload only changes when a run finishes, and survives a crash mid-swap."""
+        doc = ConsolidatedDocument(
+            filename="01_Guide.md", title="Guide", category="guides", content="Original text.",
+            source_chunks=[], source_files=["a.txt"], total_tokens=3, keywords=[]
+        )
+        FileGenerator(tmp_path).generate_files({"guides": [doc]})
+        for_upload = tmp_path / "for_upload"
+        before = {path.relative_to(for_upload): path.read_bytes() for path in for_upload.rglob("*") if path.is_file()}
+        
+        generator = FileGenerator(tmp_path)
+        generator.begin()
+        generator.write_document("guides", doc.model_copy(update={"content": "Half-written run."}))
+        generator.writer.discard()  # As if the run had crashed before finish()
+        after = {path.relative_to(for_upload): path.read_bytes() for path in for_upload.rglob("*") if path.is_file()}
+        assert after == before
+        
+        # A crash between moving the old tree aside and the new one in
+        for_upload.rename(tmp_path / "for_upload.previous")
+        (tmp_path / "for_upload.staging").mkdir()
+        writer = TreeWriter(for_upload)
+        writer.begin()
+        assert (for_upload / "guides" / "01_Guide.md").read_bytes() == before[Path("guides/01_Guide.md")]
+        writer.write("new.txt", b"data")
+        writer.commit()
+        assert [path.name for path in tmp_path.iterdir() if path.name.startswith("for_upload")] == ["for_upload"]
+        assert (for_upload / "new.txt").read_bytes() == b"data"
+        assert writer.stats["bytes_written"] == 4
+        assert writer.sizes == {"new.txt": 4}
+
+
+class TestQualityValidator:
+    """Test the single-pass validator."""
+    
+    def test_one_pass_over_shared_files(self, tmp_path, sample_book_text):
+        """Test that every check reads the shared file records and counts are reused."""
+        frameworks = tmp_path / "for_upload" / "frameworks"
+        guides = tmp_path / "for_upload" / "guides"
+        frameworks.mkdir(parents=True)
+        guides.mkdir()
+        (frameworks / "01_Daily_Client_Machine.md").write_text(
+            "---\ntitle: DCM\n---\nThe Daily Client Machine.\nOverview, components, implement.\n"
+        )
+        (guides / "02_Guide.md").write_text("---\ntitle: Guide\n---\n" + sample_book_text)
+        (guides / "Bad name.md").write_text("An unfinished line\nFollowed by a capital\nand more\n")
+        
+        results = QualityValidator(tmp_path).validate_all()
+        
+        assert results["file_count"]["count"] == 3
+        tokens = {info["name"]: info["tokens"] for info in results["token_ranges"]["stats"]["files"]}
+        counter = get_token_counter()
+        assert tokens["02_Guide.md"] == counter.count(sample_book_text)
+        assert results["frameworks_complete"]["found"] == ["Daily Client Machine"]
+        assert results["semantic_coherence"]["issues"] == ["Possible incomplete sentence in Bad name.md"]
+        assert len(results["file_naming"]["issues"]) == 3  # Prefix, space, special character
+        
+        # A second run only counts the file that changed
+        (guides / "02_Guide.md").write_text("---\ntitle: Guide\n---\nShorter now.")
+        validator = QualityValidator(tmp_path)
+        validator.validate_all()
+        assert validator.token_cache_stats == {"reused": 2, "counted": 1}
+        assert validator.validation_results["token_ranges"]["stats"]["files"][1]["tokens"] == counter.count("\nShorter now.")
+    
+    def test_documents_validated_in_memory(self, tmp_path, sample_book_text, sample_transcript_text):
+        """Test that validating documents as written agrees with validating the tree on disk."""
+        docs = {
+            "frameworks": [ConsolidatedDocument(
+                filename="01_Daily_Client_Machine.md", title="Daily Client Machine", category="frameworks",
+                content="Overview of the Daily Client Machine.\nIts components and how to implement them.\n",
+                source_chunks=[], source_files=["a.txt"], total_tokens=20, keywords=[]
+            )],
+            "transcripts": [
+                ConsolidatedDocument(
+                    filename=f"{i:02d}_Workshop_{i}.md", title=f"Workshop {i}", category="transcripts",
+                    content=text, source_chunks=[], source_files=["b.txt"],
+                    total_tokens=get_token_counter().count(text), keywords=[]
+                )
+                for i, text in enumerate([sample_book_text, sample_transcript_text], 1)
+            ]
+        }
+        FileGenerator(tmp_path).generate_files(docs)
+        
+        in_memory = QualityValidator(tmp_path).validate_documents(docs)
+        on_disk = QualityValidator(tmp_path).validate_all()
+        
+        for check in ("file_count", "frameworks_complete", "semantic_coherence", "file_naming", "overall_status"):
+            assert in_memory[check] == on_disk[check]
+        files = in_memory["token_ranges"]["stats"]["files"]
+        assert [info["name"] for info in files] == [info["name"] for info in on_disk["token_ranges"]["stats"]["files"]]
+        assert [info["tokens"] for info in files] == [doc.total_tokens for category in docs.values() for doc in category]
+
+
 def test_token_counting():
     """Test token counting accuracy."""
     from rag_processor.chunkers import IntelligentChunker
@@ -229,6 +1076,70 @@ def test_token_counting():
     assert tokens < 20  # Simple sentence should be less than 20 tokens
 
 
+def test_shared_token_counter():
+    """Test that the shared counter batches, memoizes and matches tiktoken."""
+    from rag_processor.tokens import TokenCounter, get_token_counter
+    
+    assert get_token_counter() is get_token_counter()
+    
+    counter = TokenCounter()
+    texts = ["The 3 E's framework.", "Daily Client Machine", "The 3 E's framework."]
+    counts = counter.count_batch(texts)
+    
+    assert counts == [len(counter.encoding.encode(t)) for t in texts]
+    assert counter.stats["misses"] == 2
+    assert counter.count(texts[0]) == counts[0]
+    assert counter.stats["hits"] == 1
+    assert counter.count("one two three four", exact=False) == 5
+
+
 if __name__ == "__main__":
     # Run basic tests
-    pytest.main([__file__, "-v"])
\ No newline at end of file
+    pytest.main([__file__, "-v"])
+
+
+class TestLibreChatPacking:
+    """Test packing output files under LibreChat's file limit."""
+    
+    def test_limits_and_manifest(self, tmp_path):
+        """Test that files fit the limits and the manifest matches what was written."""
+        import json
+        
+        random.seed(4)
+        words = "client offer growth revenue energy scale leverage pipeline".split()
+        docs = {
+            category: [
+                ConsolidatedDocument(
+                    filename=f"{i:02d}_{category}_{i}.md", title=f"{category} {i}", category=category,
+                    content=" ".join(random.choices(words, k=random.randint(200, 1500))),
+                    source_chunks=[], source_files=["a.txt"], total_tokens=0, keywords=[]
+                )
+                for i in range(1, count + 1)
+            ]
+            for category, count in (("frameworks", 6), ("transcripts", 10), ("guides", 2))
+        }
+        FileGenerator(tmp_path).generate_files(docs)
+        for_upload, output = tmp_path / "for_upload", tmp_path / "librechat"
+        
+        files = consolidate_files(for_upload, output, max_files=6, max_tokens=6000, max_bytes=40000)
+        
+        manifest = json.loads((output / "consolidated_manifest.json").read_text())
+        counter = get_token_counter()
+        assert len(files) == len(manifest["files"]) <= 6
+        for path, entry in zip(files, manifest["files"]):
+            assert entry["tokens"] == counter.count(path.read_text(encoding='utf-8')) <= 6000
+            assert entry["bytes"] == path.stat().st_size <= 40000
+        sources = [source for entry in manifest["files"] for source in entry["sources"]]
+        assert sources == [f"{category}/{doc.filename}" for category, items in docs.items() for doc in items]
+        
+        with pytest.raises(ValueError):
+            consolidate_files(for_upload, output, max_files=2, max_tokens=6000, max_bytes=40000)
+        assert json.loads((output / "consolidated_manifest.json").read_text()) == manifest
+        
+        # A rerun replaces its own files, but not a directory holding anything else
+        rerun = consolidate_files(for_upload, output, max_files=6, max_tokens=6000, max_bytes=40000)
+        assert rerun == files
+        (output / "notes.txt").write_text("Not ours")
+        with pytest.raises(ValueError, match="notes.txt"):
+            consolidate_files(for_upload, output, max_files=6, max_tokens=6000, max_bytes=40000)
+        assert (output / "notes.txt").read_text() == "Not ours"
@@ -0,0 +1,158 @@
+"""
+Shared token counting service.
+"""
+
+import hashlib
+import logging
+import os
+import threading
+from collections import OrderedDict
+from typing import List, Optional, Sequence
+
+import tiktoken
+
+logger = logging.getLogger(__name__)
+
+
+class TokenCounter:
+    """
+    Process-wide token counter for the cl100k_base encoding.
+    
+    Counts are memoized by content hash in a bounded LRU, and batches of texts
+    are encoded through tiktoken's multithreaded batch API. Use
+    get_token_counter() rather than creating instances directly so every
+    component shares one encoding and one cache.
+    """
+    
+    # Longest trailing run count_joined() looks up; also its fallback window
+    _JOIN_WINDOW = 16
+    
+    def __init__(
+        self,
+        encoding_name: str = "cl100k_base",
+        cache_size: int = 100_000,
+        num_threads: Optional[int] = None
+    ):
+        self.encoding = tiktoken.get_encoding(encoding_name)
+        self.cache_size = cache_size
+        self.num_threads = num_threads or min(os.cpu_count() or 1, 8)
+        self._cache = OrderedDict()
+        self._lock = threading.Lock()
+        self._join_costs = {}  # (trailing run, separator) -> tokens a join adds
+        self.stats = {"hits": 0, "misses": 0}
+    
+    def count(self, text: str, exact: bool = True) -> int:
+        """Count tokens in a single text."""
+        return self.count_batch([text], exact=exact)[0]
+    
+    def count_batch(self, texts: List[str], exact: bool = True) -> List[int]:
+        """
+        Count tokens for many texts at once.
+        
+        Args:
+            texts: Texts to count
+            exact: Encode with tiktoken; when False use the cheap word-based estimate
+        
+        Returns:
+            Token counts in the same order as texts
+        """
+        if not exact:
+            return [self.approximate(text) for text in texts]
+        
+        counts = [0] * len(texts)
+        missing = {}
+        
+        with self._lock:
+            for i, text in enumerate(texts):
+                key = self._key(text)
+                cached = self._cache.get(key)
+                if cached is not None:
+                    self._cache.move_to_end(key)
+                    counts[i] = cached
+                    self.stats["hits"] += 1
+                else:
+                    missing.setdefault(key, []).append(i)
+        
+        if not missing:
+            return counts
+        
+        keys = list(missing)
+        pending = [texts[missing[key][0]] for key in keys]
+        if len(pending) == 1:
+            # Not worth a thread pool for a single text
+            encoded = [self.encoding.encode_ordinary(pending[0])]
+        else:
+            encoded = self.encoding.encode_ordinary_batch(pending, num_threads=self.num_threads)
+        
+        with self._lock:
+            for key, tokens in zip(keys, encoded):
+                for i in missing[key]:
+                    counts[i] = len(tokens)
+                self._remember(key, len(tokens))
+            self.stats["misses"] += len(keys)
+        
+        return counts
+    
+    def count_joined(self, texts: Sequence[str], counts: Sequence[int], separator: str = "\n\n") -> int:
+        """
+        Token count of texts joined with separator, from their individual counts.
+        
+        Adds what each join costs instead of encoding the joined text. A
+        separator merges with the punctuation or whitespace right before it
+        (".\n\n" is a single token), so the cost of a join is looked up by
+        that trailing run, which takes few distinct values across a corpus.
+        Unusual joins (long runs, whitespace after the separator) encode a
+        short window around the join instead.
+        """
+        if not counts:
+            return 0
+        return sum(counts) + sum(
+            self._join_cost(before, after, separator) for before, after in zip(texts, texts[1:])
+        )
+    
+    def _join_cost(self, before: str, after: str, separator: str) -> int:
+        start = len(before)
+        while start > 0 and len(before) - start < self._JOIN_WINDOW and not before[start - 1].isalnum():
+            start -= 1
+        tail = before[start:]
+        
+        if len(tail) >= self._JOIN_WINDOW or not after or after[0].isspace():
+            tail, head = before[-self._JOIN_WINDOW:], after[:self._JOIN_WINDOW]
+            encode = self.encoding.encode_ordinary
+            return len(encode(tail + separator + head)) - len(encode(tail)) - len(encode(head))
+        
+        key = (tail, separator)
+        cost = self._join_costs.get(key)
+        if cost is None:
+            cost = self.count(tail + separator) - (self.count(tail) if tail else 0)
+            self._join_costs[key] = cost
+        return cost
+    
+    @staticmethod
+    def approximate(text: str) -> int:
+        """Cheap token estimate (~1.3 tokens per whitespace-separated word)."""
+        return int(len(text.split()) * 1.3)
+    
+    def _remember(self, key: bytes, count: int):
+        self._cache[key] = count
+        self._cache.move_to_end(key)
+        while len(self._cache) > self.cache_size:
+            self._cache.popitem(last=False)
+    
+    @staticmethod
+    def _key(text: str) -> bytes:
+        return hashlib.blake2b(text.encode('utf-8', 'surrogatepass'), digest_size=16).digest()
+
+
+_token_counter: Optional[TokenCounter] = None
+_token_counter_lock = threading.Lock()
+
+
+def get_token_counter() -> TokenCounter:
+    """Return the process-wide TokenCounter, creating it on first use."""
+    global _token_counter
+    if _token_counter is None:
+        with _token_counter_lock:
+            if _token_counter is None:
+                _token_counter = TokenCounter()
+    return _token_counter
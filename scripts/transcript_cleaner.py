@@ -6,7 +6,9 @@ import re
 import logging
 from typing import List, Tuple, Optional
 
-from .config import FILLER_WORDS
+from .config import FILLER_WORDS, TRANSCRIPT_TOPIC_KEYWORDS
+from .matching import get_pattern_matcher
+from .similarity import JaccardIndex, shingle_hashes, token_frequencies
 
 logger = logging.getLogger(__name__)
 
@@ -18,11 +20,20 @@ class TranscriptCleaner:
         # Create regex pattern for filler words (case-insensitive)
         self.filler_pattern = self._create_filler_pattern()
         
+        # Single-pass filler/punctuation/whitespace normalizer
+        self.normalize_pattern = self._create_normalize_pattern()
+        self.separator_pattern = re.compile(r'[\s,]+')
+        self.word_or_separator = re.compile(r'[\w\s,]')
+        
         # Pattern for timestamps
         self.timestamp_pattern = re.compile(r'\[[\d:]+\]|\d{1,2}:\d{2}(?::\d{2})?')
         
         # Pattern for speaker labels
         self.speaker_pattern = re.compile(r'^(Speaker\s*\d*|[A-Z][a-z]+|Q|A|James|JK):\s*', re.MULTILINE)
+        
+        # Topic key phrases (see config.TRANSCRIPT_TOPIC_KEYWORDS)
+        self.matcher = get_pattern_matcher()
+        self.topic_categories = [f"transcript_topic:{topic}" for topic in TRANSCRIPT_TOPIC_KEYWORDS]
     
     def clean_transcript(self, text: str) -> str:
         """
@@ -30,7 +41,7 @@ class TranscriptCleaner:
         
         Args:
             text: Raw transcript text
-            
+        
         Returns:
             Cleaned transcript with structure preserved
         """
@@ -60,18 +71,91 @@ class TranscriptCleaner:
         pattern = r'\b(' + '|'.join(fillers) + r')\b'
         return re.compile(pattern, re.IGNORECASE)
     
+    def _create_normalize_pattern(self) -> re.Pattern:
+        """
+        Create the pattern for every span _remove_fillers has to rewrite.
+        
+        A match is one of: a separator run (whitespace and commas) together
+        with any chain of fillers it runs into; a filler chain right after a
+        punctuation character, matched from that character; a separator run
+        containing a comma; or whitespace other than a single plain space.
+        
+        Every match starts on a non-word character, and the pattern opens with
+        a plain character class (no IGNORECASE flag), so the regex engine
+        skips over words in C instead of trying the filler alternation at
+        every position. A lone space, or a "," / ", " that starts its run,
+        followed by a word that cannot start a filler is left alone without
+        entering the alternation.
+        """
+        fillers = '|'.join(re.escape(filler) for filler in FILLER_WORDS)
+        filler = rf'(?i:\b(?:{fillers})\b)'
+        chain = rf'[\s,]*(?:{filler}[\s,]*)'
+        initials = re.escape(''.join(sorted({f[0].lower() for f in FILLER_WORDS})))
+        
+        return re.compile(
+            r'\W'
+            rf'(?!(?<= )(?!(?i:[{initials}]))[^\s,])'
+            rf'(?!(?<=,) ?(?!(?i:[{initials}]))[^\s,.])'
+            r'(?:(?<=[\s,])(?:'
+            rf'{chain}+(?P<filler>)'
+            r'|(?<=,)[\s,]*|[\s,]*,[\s,]*|(?<=\s)\s+|(?<=[^\S ]))'
+            rf'|(?<![\s,])(?P<punctuation>){filler}{chain}*)'
+        )
+    
     def _remove_fillers(self, text: str) -> str:
-        """Remove filler words while preserving sentence structure."""
-        # Remove filler words
-        cleaned = self.filler_pattern.sub('', text)
+        """
+        Remove filler words while preserving sentence structure.
+        
+        Single scan equivalent to removing fillers, then dropping spaces before
+        commas, collapsing repeated commas, dropping a comma before a period
+        and collapsing whitespace. Text between matched spans is copied
+        through untouched.
+        """
+        # A leading space lets a filler at the very start match like any other
+        # (it is stripped again, so the result is unchanged)
+        return self.normalize_pattern.sub(self._normalize_separators, ' ' + text).strip()
+    
+    def _normalize_separators(self, match: re.Match) -> str:
+        """Rewrite one separator run (with any fillers in it removed)."""
+        run = match.group()
+        prefix = run[0] if match.lastgroup == 'punctuation' else ''
+        
+        if match.lastgroup and run[-1] != ',' and not run[-1].isspace():
+            # Ends on a filler: the run's content depends on what lies between them
+            run = self._drop_fillers(match.string, match.start() + len(prefix), match.end())
+            if not run:
+                return prefix
         
-        # Clean up extra spaces and commas
-        cleaned = re.sub(r'\s+,', ',', cleaned)  # Remove space before comma
-        cleaned = re.sub(r',\s*,+', ',', cleaned)  # Remove multiple commas
-        cleaned = re.sub(r',\s*\.', '.', cleaned)  # Remove comma before period
-        cleaned = re.sub(r'\s+', ' ', cleaned)  # Normalize spaces
+        # Fillers never contain commas, so the span tells whether the run does
+        # and (by its last character) whether whitespace follows the last one
+        if ',' not in run:
+            return prefix + ' '
         
-        return cleaned.strip()
+        # Comma (and the space after it) before a period goes away
+        if match.string.startswith('.', match.end()):
+            return prefix
+        
+        return prefix + (',' if run[-1] == ',' else ', ')
+    
+    def _drop_fillers(self, text: str, pos: int, end: int) -> str:
+        """Separator characters in text[pos:end], with the fillers between them removed."""
+        span = text[pos:end]
+        if self.word_or_separator.match(span, len(span) - 1):
+            # Word boundaries inside the span do not depend on what follows it
+            return self.filler_pattern.sub('', span)
+        
+        # A filler ending in punctuation ("right?") needs the next character
+        # for its trailing word boundary, so walk the span in context
+        separators = []
+        while pos < end:
+            separator = self.separator_pattern.match(text, pos, end)
+            if separator:
+                separators.append(separator.group())
+                pos = separator.end()
+            else:
+                pos = self.filler_pattern.match(text, pos).end()
+        
+        return ''.join(separators)
     
     def _clean_timestamps(self, text: str) -> str:
         """Clean timestamps while preserving topic breaks."""
@@ -104,35 +188,25 @@ class TranscriptCleaner:
     
     def _consolidate_repetitions(self, text: str) -> str:
         """Consolidate repeated ideas (not remove, but organize)."""
-        paragraphs = text.split('\n\n')
+        paragraphs = [para.strip() for para in text.split('\n\n') if para.strip()]
         consolidated = []
         
-        # Track similar content
-        seen_concepts = {}
+        word_sets = [shingle_hashes(self._simplify_text(para), size=1) for para in paragraphs]
         
-        for para in paragraphs:
-            para = para.strip()
-            if not para:
-                continue
-            
-            # Create a simplified version for comparison
-            simplified = self._simplify_text(para)
-            
+        # Index kept paragraphs so each lookup only touches likely matches
+        index = JaccardIndex(threshold=0.8, frequencies=token_frequencies(word_sets))
+        
+        for para, words in zip(paragraphs, word_sets):
             # Check if we've seen very similar content
-            is_repetition = False
-            for concept, original_para in seen_concepts.items():
-                similarity = self._calculate_similarity(simplified, concept)
-                if similarity > 0.8:  # High similarity threshold
-                    # Merge with existing paragraph if very similar
-                    is_repetition = True
-                    # Keep the longer/more complete version
-                    if len(para) > len(original_para):
-                        seen_concepts[concept] = para
-                    break
+            match = index.find(words)
+            if match is not None:
+                # Keep the longer/more complete version in the original's position
+                if len(para) > len(consolidated[match]):
+                    consolidated[match] = para
+                continue
             
-            if not is_repetition:
-                seen_concepts[simplified] = para
-                consolidated.append(para)
+            index.add(words)
+            consolidated.append(para)
         
         return '\n\n'.join(consolidated)
     
@@ -146,19 +220,6 @@ class TranscriptCleaner:
         text = ' '.join(text.split())
         return text
     
-    def _calculate_similarity(self, text1: str, text2: str) -> float:
-        """Simple word-based similarity calculation."""
-        words1 = set(text1.split())
-        words2 = set(text2.split())
-        
-        if not words1 or not words2:
-            return 0.0
-        
-        intersection = words1 & words2
-        union = words1 | words2
-        
-        return len(intersection) / len(union)
-    
     def _add_topic_headers(self, text: str) -> str:
         """Add topic headers based on content shifts."""
         sections = text.split('---')
@@ -181,22 +242,11 @@ class TranscriptCleaner:
     
     def _identify_topic(self, text: str) -> Optional[str]:
         """Identify the main topic of a text section."""
-        # Look for key phrases that indicate topics
-        topic_patterns = {
-            "Introduction": [r'welcome', r'today we', r'going to talk about'],
-            "Framework Overview": [r'framework', r'system', r'model', r'process'],
-            "Implementation Steps": [r'step \d', r'first', r'next', r'then', r'finally'],
-            "Examples & Case Studies": [r'example', r'case study', r'client', r'worked with'],
-            "Q&A Session": [r'question', r'Q:', r'ask', r'answer'],
-            "Action Items": [r'action', r'homework', r'assignment', r'your task'],
-            "Summary": [r'summary', r'recap', r'remember', r'key point'],
-        }
-        
-        text_lower = text.lower()
-        
-        for topic, patterns in topic_patterns.items():
-            matches = sum(1 for pattern in patterns if re.search(pattern, text_lower))
-            if matches >= 2:  # At least 2 pattern matches
+        # Look for key phrases that indicate topics, all in one scan
+        found = self.matcher.found(text, self.topic_categories)
+        
+        for topic in TRANSCRIPT_TOPIC_KEYWORDS:
+            if len(found[f"transcript_topic:{topic}"]) >= 2:  # At least 2 distinct phrases
                 return topic
         
         # Try to extract topic from first sentence
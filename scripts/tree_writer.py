@@ -0,0 +1,172 @@
+"""
+Atomic, parallel writing of an output directory tree.
+"""
+
+import logging
+import os
+import shutil
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence, Union
+
+logger = logging.getLogger(__name__)
+
+
+class TreeWriter:
+    """
+    Writes a directory tree in a staging directory and swaps it into place.
+    
+    Files are written and fsynced from a thread pool under a staging
+    directory next to the target (so both are on one filesystem). commit()
+    waits for every write and then renames the staging tree over the target,
+    so a crash part way through leaves the previous tree untouched and the
+    half-written one under the staging name, which the next writer clears.
+    
+    A directory can't be renamed over another, so the swap is two renames:
+    the old tree moves aside, then the new one into place. If a crash falls
+    between them, begin() moves the old tree back.
+    """
+    
+    def __init__(self, target: Path, num_threads: Optional[int] = None, max_pending: int = 64):
+        self.target = Path(target)
+        self.staging = self.target.with_name(f"{self.target.name}.staging")
+        self.backup = self.target.with_name(f"{self.target.name}.previous")
+        self.num_threads = num_threads or min(os.cpu_count() or 1, 8)
+        self._pending = threading.BoundedSemaphore(max_pending)  # Bounds the bytes waiting to be written
+        self._pool: Optional[ThreadPoolExecutor] = None
+        self._futures: List[Future] = []
+        self._lock = threading.Lock()
+        self.stats = {"files_written": 0, "files_linked": 0, "bytes_written": 0, "seconds": 0.0}
+        self.sizes: Dict[str, int] = {}  # Bytes of each written file, by relative path
+    
+    def begin(self):
+        """Recover from an interrupted swap and start an empty staging tree."""
+        if self.backup.exists():
+            if self.target.exists():
+                shutil.rmtree(self.backup)
+            else:
+                logger.warning(f"Restoring {self.target} from an interrupted swap")
+                os.replace(self.backup, self.target)
+        if self.staging.exists():
+            logger.info(f"Discarding unfinished {self.staging}")
+            shutil.rmtree(self.staging)
+        
+        self.staging.mkdir(parents=True)
+        self._pool = ThreadPoolExecutor(max_workers=self.num_threads)
+        self._futures = []
+        self._start = time.perf_counter()
+        self.stats = {"files_written": 0, "files_linked": 0, "bytes_written": 0, "seconds": 0.0}
+        self.sizes = {}
+    
+    def mkdir(self, relative: str):
+        """Create a (possibly empty) directory in the new tree."""
+        (self.staging / relative).mkdir(parents=True, exist_ok=True)
+    
+    def write(self, relative: str, data: bytes):
+        """Queue a file of the new tree for writing."""
+        self.write_parts(relative, [data])
+    
+    def write_parts(self, relative: str, parts: Sequence[Union[bytes, Path]]):
+        """
+        Queue a file of the new tree made of byte strings and existing files.
+        
+        Files are copied in blocks when the write runs, so they are never
+        held in memory whole.
+        """
+        self._pending.acquire()
+        future = self._pool.submit(self._write, relative, parts)
+        future.add_done_callback(lambda _: self._pending.release())
+        self._futures.append(future)
+    
+    def keep(self, relative: str):
+        """Carry a file over unchanged from the current tree (hard-linked where possible)."""
+        source, destination = self.target / relative, self.staging / relative
+        destination.parent.mkdir(parents=True, exist_ok=True)
+        try:
+            os.link(source, destination)
+        except OSError:
+            shutil.copy2(source, destination)
+        with self._lock:
+            self.stats["files_linked"] += 1
+    
+    def wait(self):
+        """Wait for every write queued so far (their sizes are then in self.sizes)."""
+        try:
+            for future in self._futures:
+                future.result()
+        except BaseException:
+            self.discard()
+            raise
+    
+    def commit(self):
+        """Wait for every write, then swap the staging tree into place."""
+        self.wait()
+        self._pool.shutdown()
+        self._fsync_dirs()
+        
+        if self.target.exists():
+            os.replace(self.target, self.backup)
+        os.replace(self.staging, self.target)
+        self._fsync(self.target.parent)
+        shutil.rmtree(self.backup, ignore_errors=True)
+        
+        self.stats["seconds"] = time.perf_counter() - self._start
+        logger.info(
+            f"Wrote {self.stats['files_written']} files ({self.stats['bytes_written'] / 1e6:.1f} MB, "
+            f"{self.throughput_mb_s():.1f} MB/s), kept {self.stats['files_linked']} unchanged"
+        )
+    
+    def discard(self):
+        """Drop the staging tree, leaving the current tree as it was."""
+        self._pool.shutdown(cancel_futures=True)
+        shutil.rmtree(self.staging, ignore_errors=True)
+    
+    def throughput_mb_s(self) -> float:
+        """Megabytes written per second, from begin() to the end of commit()."""
+        return self.stats["bytes_written"] / 1e6 / self.stats["seconds"] if self.stats["seconds"] else 0.0
+    
+    def _write(self, relative: str, parts: Sequence[Union[bytes, Path]]):
+        path = self.staging / relative
+        path.parent.mkdir(parents=True, exist_ok=True)
+        with open(path, 'wb') as f:
+            for part in parts:
+                if isinstance(part, bytes):
+                    f.write(part)
+                else:
+                    with open(part, 'rb') as source:
+                        shutil.copyfileobj(source, f)
+            f.flush()
+            os.fsync(f.fileno())
+            size = f.tell()
+        with self._lock:
+            self.stats["files_written"] += 1
+            self.stats["bytes_written"] += size
+            self.sizes[relative] = size
+    
+    def _fsync_dirs(self):
+        """Persist the staging tree's directory entries before it is swapped in."""
+        for directory, _, _ in os.walk(self.staging):
+            self._fsync(Path(directory))
+    
+    @staticmethod
+    def _fsync(directory: Path):
+        try:
+            fd = os.open(directory, os.O_RDONLY)
+        except OSError:
+            return  # Directories can't be opened on some platforms (Windows)
+        try:
+            os.fsync(fd)
+        finally:
+            os.close(fd)
+    
+    def __enter__(self) -> "TreeWriter":
+        self.begin()
+        return self
+    
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.commit()
+        else:
+            self.discard()
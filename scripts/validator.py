@@ -2,79 +2,68 @@
 Quality validation module for the processed documents.
 """
 
+import hashlib
 import logging
+import os
+import re
+from abc import ABC, abstractmethod
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
 from pathlib import Path
-from typing import Dict, List, Tuple, Optional
-import tiktoken
+from typing import Dict, List, Set
 import json
 
 from .models import ConsolidatedDocument
+from .tokens import get_token_counter
 
 logger = logging.getLogger(__name__)
 
 
-class QualityValidator:
-    """Validates the quality of processed documents."""
+@dataclass
+class OutputFile:
+    """One output file, read once and shared by every check."""
+    category: str
+    name: str
+    content: str  # As written, front matter included
+    body: str  # Without the front matter
+    tokens: int  # Tokens in body
+
+
+def strip_front_matter(content: str) -> str:
+    """Drop the "---" metadata header from an output file."""
+    if content.startswith("---"):
+        parts = content.split("---", 2)
+        if len(parts) == 3:
+            return parts[2]
+    return content
+
+
+class _Check(ABC):
+    """A validation check, shown every output file in turn and then asked for its result."""
     
-    def __init__(self, output_dir: Path):
-        self.output_dir = Path(output_dir)
-        self.tokenizer = tiktoken.get_encoding("cl100k_base")
-        self.validation_results = {
-            "file_count": {"status": "pending", "details": ""},
-            "token_ranges": {"status": "pending", "details": ""},
-            "frameworks_complete": {"status": "pending", "details": ""},
-            "semantic_coherence": {"status": "pending", "details": ""},
-            "content_preservation": {"status": "pending", "details": ""},
-            "file_naming": {"status": "pending", "details": ""},
-            "overall_status": "pending"
-        }
+    name = ""
     
-    def validate_all(self) -> Dict:
-        """Run all validation checks."""
-        logger.info("Running quality validation checks...")
-        
-        # Check 1: File count
-        self._validate_file_count()
-        
-        # Check 2: Token ranges
-        self._validate_token_ranges()
-        
-        # Check 3: Framework completeness
-        self._validate_frameworks_complete()
-        
-        # Check 4: Semantic coherence
-        self._validate_semantic_coherence()
-        
-        # Check 5: Content preservation
-        self._validate_content_preservation()
-        
-        # Check 6: File naming
-        self._validate_file_naming()
-        
-        # Determine overall status
-        self._determine_overall_status()
-        
-        return self.validation_results
+    def visit(self, file: OutputFile):
+        """Look at one output file (checks that only need the totals can ignore it)."""
     
-    def _validate_file_count(self):
-        """Validate that file count is in target range (50-100)."""
-        for_upload_dir = self.output_dir / "for_upload"
-        
-        if not for_upload_dir.exists():
-            self.validation_results["file_count"] = {
-                "status": "error",
-                "details": "Output directory not found"
-            }
-            return
-        
-        # Count all markdown files
-        total_files = 0
-        for category_dir in for_upload_dir.iterdir():
-            if category_dir.is_dir() and category_dir.name != "upload_manifest.json":
-                md_files = list(category_dir.glob("*.md"))
-                total_files += len(md_files)
-        
-        # Check if in range
+    @abstractmethod
+    def result(self) -> Dict:
+        """The check's status, details and issues."""
+
+
+class _FileCountCheck(_Check):
+    """File count is in target range (50-100)."""
+    
+    name = "file_count"
+    
+    def __init__(self):
+        self.total_files = 0
+    
+    def visit(self, file: OutputFile):
+        self.total_files += 1
+    
+    def result(self) -> Dict:
+        total_files = self.total_files
         if 50 <= total_files <= 100:
             status = "pass"
             details = f"File count: {total_files} (within target range)"
@@ -85,17 +74,16 @@ class QualityValidator:
             status = "warning"
             details = f"File count: {total_files} (above target maximum of 100)"
         
-        self.validation_results["file_count"] = {
-            "status": status,
-            "details": details,
-            "count": total_files
-        }
+        return {"status": status, "details": details, "count": total_files}
+
+
+class _TokenRangeCheck(_Check):
+    """Files are within optimal token ranges."""
     
-    def _validate_token_ranges(self):
-        """Validate that files are within optimal token ranges."""
-        for_upload_dir = self.output_dir / "for_upload"
-        
-        token_stats = {
+    name = "token_ranges"
+    
+    def __init__(self):
+        self.token_stats = {
             "total_files": 0,
             "in_optimal_range": 0,  # 3000-4000
             "in_acceptable_range": 0,  # 2000-5000
@@ -103,42 +91,29 @@ class QualityValidator:
             "too_large": 0,  # >5000
             "files": []
         }
+    
+    def visit(self, file: OutputFile):
+        token_stats = self.token_stats
+        tokens = file.tokens
+        token_stats["total_files"] += 1
+        
+        if 3000 <= tokens <= 4000:
+            token_stats["in_optimal_range"] += 1
+            status = "optimal"
+        elif 2000 <= tokens <= 5000:
+            token_stats["in_acceptable_range"] += 1
+            status = "acceptable"
+        elif tokens < 2000:
+            token_stats["too_small"] += 1
+            status = "too_small"
+        else:
+            token_stats["too_large"] += 1
+            status = "too_large"
         
-        # Check each file
-        for category_dir in for_upload_dir.iterdir():
-            if category_dir.is_dir():
-                for md_file in category_dir.glob("*.md"):
-                    content = md_file.read_text(encoding='utf-8')
-                    
-                    # Skip metadata header
-                    if content.startswith("---"):
-                        content = content.split("---", 2)[2] if content.count("---") >= 2 else content
-                    
-                    tokens = len(self.tokenizer.encode(content))
-                    token_stats["total_files"] += 1
-                    
-                    file_info = {
-                        "name": md_file.name,
-                        "tokens": tokens,
-                        "status": ""
-                    }
-                    
-                    if 3000 <= tokens <= 4000:
-                        token_stats["in_optimal_range"] += 1
-                        file_info["status"] = "optimal"
-                    elif 2000 <= tokens <= 5000:
-                        token_stats["in_acceptable_range"] += 1
-                        file_info["status"] = "acceptable"
-                    elif tokens < 2000:
-                        token_stats["too_small"] += 1
-                        file_info["status"] = "too_small"
-                    else:
-                        token_stats["too_large"] += 1
-                        file_info["status"] = "too_large"
-                    
-                    token_stats["files"].append(file_info)
-        
-        # Determine status
+        token_stats["files"].append({"name": file.name, "tokens": tokens, "status": status})
+    
+    def result(self) -> Dict:
+        token_stats = self.token_stats
         optimal_percentage = (
             token_stats["in_optimal_range"] / token_stats["total_files"] * 100
             if token_stats["total_files"] > 0 else 0
@@ -158,47 +133,47 @@ class QualityValidator:
             f"Files too large (>5000): {token_stats['too_large']}"
         )
         
-        self.validation_results["token_ranges"] = {
-            "status": status,
-            "details": details,
-            "stats": token_stats
-        }
+        return {"status": status, "details": details, "stats": token_stats}
+
+
+class _FrameworksCompleteCheck(_Check):
+    """Frameworks are preserved as complete units."""
     
-    def _validate_frameworks_complete(self):
-        """Validate that frameworks are preserved as complete units."""
-        frameworks_dir = self.output_dir / "for_upload" / "frameworks"
-        
-        if not frameworks_dir.exists():
-            self.validation_results["frameworks_complete"] = {
-                "status": "error",
-                "details": "Frameworks directory not found"
-            }
+    name = "frameworks_complete"
+    
+    # Expected frameworks
+    expected_frameworks = ["3 E's", "Daily Client Machine", "Hybrid Offer", "Sovereign Consultant"]
+    
+    def __init__(self, has_directory: bool):
+        self.has_directory = has_directory
+        self.found_frameworks: Set[str] = set()
+    
+    def visit(self, file: OutputFile):
+        if file.category != "frameworks":
             return
         
-        # Expected frameworks
-        expected_frameworks = ["3 E's", "Daily Client Machine", "Hybrid Offer", "Sovereign Consultant"]
-        found_frameworks = []
+        content = file.content
+        lowered = None
+        for framework in self.expected_frameworks:
+            if framework in content:
+                self.found_frameworks.add(framework)
+                
+                # Check for completeness indicators
+                if lowered is None:
+                    lowered = content.lower()
+                has_overview = "overview" in lowered or "summary" in lowered
+                has_components = "component" in lowered or "element" in lowered
+                has_application = "apply" in lowered or "implement" in lowered
+                
+                if not (has_overview and has_components and has_application):
+                    logger.warning(f"Framework {framework} may be incomplete in {file.name}")
+    
+    def result(self) -> Dict:
+        if not self.has_directory:
+            return {"status": "error", "details": "Frameworks directory not found"}
         
-        # Check framework files
-        for md_file in frameworks_dir.glob("*.md"):
-            content = md_file.read_text(encoding='utf-8')
-            
-            for framework in expected_frameworks:
-                if framework in content:
-                    found_frameworks.append(framework)
-                    
-                    # Check for completeness indicators
-                    has_overview = "overview" in content.lower() or "summary" in content.lower()
-                    has_components = "component" in content.lower() or "element" in content.lower()
-                    has_application = "apply" in content.lower() or "implement" in content.lower()
-                    
-                    if not (has_overview and has_components and has_application):
-                        logger.warning(f"Framework {framework} may be incomplete in {md_file.name}")
-        
-        # Remove duplicates
-        found_frameworks = list(set(found_frameworks))
-        
-        missing = set(expected_frameworks) - set(found_frameworks)
+        found_frameworks = sorted(self.found_frameworks)
+        missing = [framework for framework in self.expected_frameworks if framework not in self.found_frameworks]
         
         if not missing:
             status = "pass"
@@ -207,56 +182,244 @@ class QualityValidator:
             status = "warning"
             details = f"Missing frameworks: {', '.join(missing)}"
         
-        self.validation_results["frameworks_complete"] = {
-            "status": status,
-            "details": details,
-            "found": found_frameworks,
-            "missing": list(missing)
-        }
+        return {"status": status, "details": details, "found": found_frameworks, "missing": missing}
+
+
+# Start of a line whose first character may be uppercase (checked with isupper)
+_LINE_START = re.compile(r'\n[^\S\n]*([^\sa-z])')
+
+
+class _SemanticCoherenceCheck(_Check):
+    """Consolidated files maintain semantic coherence."""
+    
+    name = "semantic_coherence"
+    
+    def __init__(self):
+        self.issues: List[str] = []
+        self.files_checked = 0
+    
+    def visit(self, file: OutputFile):
+        self.files_checked += 1
+        
+        # Check for incomplete sentences: a line starting with a capital
+        # after one without closing punctuation, unless it is the last line
+        body = file.body
+        for match in _LINE_START.finditer(body):
+            if not match.group(1).isupper():
+                continue
+            prev_line = body[body.rfind('\n', 0, match.start()) + 1:match.start()].rstrip()
+            if prev_line and prev_line[-1] not in '.!?"' and body.find('\n', match.end()) != -1:
+                self.issues.append(f"Possible incomplete sentence in {file.name}")
+                break
+    
+    def result(self) -> Dict:
+        if not self.issues:
+            status = "pass"
+            details = f"Checked {self.files_checked} files, all maintain semantic coherence"
+        else:
+            status = "warning"
+            details = f"Found {len(self.issues)} potential coherence issues in {self.files_checked} files"
+        
+        return {"status": status, "details": details, "issues": self.issues[:5]}  # Limit to first 5 issues
+
+
+class _FileNamingCheck(_Check):
+    """Files follow naming conventions."""
+    
+    name = "file_naming"
+    
+    allowed_chars = set('abcdefghijklmnopqrstuvwxyzABCDEFGHIJKLMNOPQRSTUVWXYZ0123456789_-.')
     
-    def _validate_semantic_coherence(self):
-        """Validate that consolidated files maintain semantic coherence."""
-        issues = []
-        files_checked = 0
+    def __init__(self):
+        self.issues: List[str] = []
+        self.files_checked = 0
+    
+    def visit(self, file: OutputFile):
+        self.files_checked += 1
+        filename = file.name
         
-        for_upload_dir = self.output_dir / "for_upload"
+        # Check for numbered prefix
+        if not filename[:2].isdigit():
+            self.issues.append(f"Missing numbered prefix: {filename}")
         
-        for category_dir in for_upload_dir.iterdir():
-            if category_dir.is_dir():
-                for md_file in category_dir.glob("*.md"):
-                    files_checked += 1
-                    content = md_file.read_text(encoding='utf-8')
-                    
-                    # Skip metadata
-                    if content.startswith("---"):
-                        content = content.split("---", 2)[2] if content.count("---") >= 2 else content
-                    
-                    # Check for abrupt transitions
-                    lines = content.split('\n')
-                    for i in range(1, len(lines)):
-                        if i < len(lines) - 1:
-                            prev_line = lines[i-1].strip()
-                            curr_line = lines[i].strip()
-                            
-                            # Check for incomplete sentences
-                            if prev_line and not prev_line[-1] in '.!?"':
-                                if curr_line and curr_line[0].isupper():
-                                    issues.append(f"Possible incomplete sentence in {md_file.name}")
-                                    break
-        
-        if not issues:
+        # Check for spaces
+        if ' ' in filename:
+            self.issues.append(f"Contains spaces: {filename}")
+        
+        # Check for special characters
+        if not self.allowed_chars.issuperset(filename):
+            self.issues.append(f"Contains special characters: {filename}")
+    
+    def result(self) -> Dict:
+        if not self.issues:
             status = "pass"
-            details = f"Checked {files_checked} files, all maintain semantic coherence"
+            details = f"All {self.files_checked} files follow naming conventions"
         else:
             status = "warning"
-            details = f"Found {len(issues)} potential coherence issues in {files_checked} files"
+            details = f"Found {len(self.issues)} naming issues in {self.files_checked} files"
         
-        self.validation_results["semantic_coherence"] = {
-            "status": status,
-            "details": details,
-            "issues": issues[:5]  # Limit to first 5 issues
+        return {"status": status, "details": details, "issues": self.issues[:5]}  # Limit to first 5
+
+
+class QualityValidator:
+    """
+    Validates the quality of processed documents.
+    
+    A run validates the documents it produces as they are written
+    (validate_documents, or begin / visit_document / finish), using their
+    content and exact total_tokens; nothing is read back from disk.
+    
+    validate_all validates an existing output tree (--validate-only):
+    for_upload/ is listed once and every file read and tokenized once, on a
+    thread pool (tiktoken releases the GIL while encoding). Token counts are
+    kept in cache/validation_tokens.json by content hash, so validating an
+    unchanged tree again only encodes the files that changed.
+    
+    Either way the checks visit shared OutputFile records in one pass.
+    """
+    
+    def __init__(self, output_dir: Path):
+        self.output_dir = Path(output_dir)
+        self.token_counter = get_token_counter()
+        self.token_cache_path = self.output_dir / "cache" / "validation_tokens.json"
+        self.token_cache_stats = {"reused": 0, "counted": 0}
+        self.validation_results = {
+            "file_count": {"status": "pending", "details": ""},
+            "token_ranges": {"status": "pending", "details": ""},
+            "frameworks_complete": {"status": "pending", "details": ""},
+            "semantic_coherence": {"status": "pending", "details": ""},
+            "content_preservation": {"status": "pending", "details": ""},
+            "file_naming": {"status": "pending", "details": ""},
+            "overall_status": "pending"
         }
     
+    def validate_all(self) -> Dict:
+        """Run all validation checks on the output tree on disk."""
+        logger.info("Running quality validation checks...")
+        
+        for_upload_dir = self.output_dir / "for_upload"
+        categories = self._list_categories(for_upload_dir)
+        files = self._read_files(for_upload_dir, categories)
+        
+        self.begin(has_frameworks_dir="frameworks" in categories)
+        for file in files:
+            self._visit(file)
+        self.finish()
+        
+        if not for_upload_dir.exists():
+            self.validation_results["file_count"] = {
+                "status": "error",
+                "details": "Output directory not found"
+            }
+            self._determine_overall_status()
+        
+        return self.validation_results
+    
+    def validate_documents(self, consolidated_docs: Dict[str, List[ConsolidatedDocument]]) -> Dict:
+        """Run all validation checks on documents in memory (see visit_document)."""
+        logger.info("Running quality validation checks...")
+        
+        self.begin()
+        for category, docs in consolidated_docs.items():
+            for doc in docs:
+                self.visit_document(category, doc)
+        return self.finish()
+    
+    def begin(self, has_frameworks_dir: bool = True):
+        """Start validating documents one at a time."""
+        self._checks = [
+            _FileCountCheck(),
+            _TokenRangeCheck(),
+            _FrameworksCompleteCheck(has_frameworks_dir),
+            _SemanticCoherenceCheck(),
+            _FileNamingCheck()
+        ]
+    
+    def visit_document(self, category: str, doc: ConsolidatedDocument):
+        """
+        Check one document as written, by its final filename.
+        
+        Tokens are the document's total_tokens. Its content stands in for
+        the file body, headed by its title; front matter is not checked.
+        """
+        body = f"# {doc.title}\n\n{doc.content}"
+        self._visit(OutputFile(category, doc.filename, body, body, doc.total_tokens))
+    
+    def finish(self) -> Dict:
+        """Collect every check's result."""
+        for check in self._checks:
+            self.validation_results[check.name] = check.result()
+        
+        self._validate_content_preservation()
+        
+        # Determine overall status
+        self._determine_overall_status()
+        
+        return self.validation_results
+    
+    def _visit(self, file: OutputFile):
+        for check in self._checks:
+            check.visit(file)
+    
+    def _list_categories(self, for_upload_dir: Path) -> Dict[str, List[Path]]:
+        """Markdown files of each category directory, listed once."""
+        if not for_upload_dir.exists():
+            return {}
+        return {
+            category_dir.name: sorted(category_dir.glob("*.md"))
+            for category_dir in sorted(for_upload_dir.iterdir())
+            if category_dir.is_dir()
+        }
+    
+    def _read_files(self, for_upload_dir: Path, categories: Dict[str, List[Path]]) -> List[OutputFile]:
+        """Read and tokenize every file once, in parallel."""
+        paths = [(category, path) for category, md_files in categories.items() for path in md_files]
+        cached = self._load_token_cache()
+        counts = {}  # "category/name" -> [body hash, tokens]
+        
+        def read(entry) -> OutputFile:
+            category, path = entry
+            content = path.read_text(encoding='utf-8')
+            body = strip_front_matter(content)
+            
+            key = f"{category}/{path.name}"
+            digest = hashlib.blake2b(body.encode('utf-8', 'surrogatepass'), digest_size=16).hexdigest()
+            known = cached.get(key)
+            tokens = known[1] if known and known[0] == digest else self.token_counter.count(body)
+            counts[key] = [digest, tokens]
+            
+            return OutputFile(category, path.name, content, body, tokens)
+        
+        if len(paths) <= 1:
+            files = [read(entry) for entry in paths]
+        else:
+            with ThreadPoolExecutor(max_workers=self.token_counter.num_threads) as pool:
+                files = list(pool.map(read, paths))
+        
+        reused = sum(1 for key, known in counts.items() if cached.get(key) == known)
+        self.token_cache_stats = {"reused": reused, "counted": len(counts) - reused}
+        if counts != cached:
+            self._save_token_cache(counts)
+        logger.info(
+            f"Token counts: {self.token_cache_stats['reused']} reused, {self.token_cache_stats['counted']} counted"
+        )
+        return files
+    
+    def _load_token_cache(self) -> Dict[str, List]:
+        try:
+            return json.loads(self.token_cache_path.read_text(encoding='utf-8'))
+        except (FileNotFoundError, ValueError):
+            return {}
+    
+    def _save_token_cache(self, counts: Dict[str, List]):
+        try:
+            self.token_cache_path.parent.mkdir(parents=True, exist_ok=True)
+            temp_path = self.token_cache_path.with_suffix(".tmp")
+            temp_path.write_text(json.dumps(counts, sort_keys=True), encoding='utf-8')
+            os.replace(temp_path, self.token_cache_path)
+        except OSError as e:
+            logger.warning(f"Could not save validation token counts: {e}")
+    
     def _validate_content_preservation(self):
         """Validate content preservation rate."""
         # Check for processing metadata
@@ -283,45 +446,6 @@ class QualityValidator:
             "details": details
         }
     
-    def _validate_file_naming(self):
-        """Validate that files follow naming conventions."""
-        issues = []
-        files_checked = 0
-        
-        for_upload_dir = self.output_dir / "for_upload"
-        
-        for category_dir in for_upload_dir.iterdir():
-            if category_dir.is_dir():
-                for md_file in category_dir.glob("*.md"):
-                    files_checked += 1
-                    filename = md_file.name
-                    
-                    # Check for numbered prefix
-                    if not filename[:2].isdigit():
-                        issues.append(f"Missing numbered prefix: {filename}")
-                    
-                    # Check for spaces
-                    if ' ' in filename:
-                        issues.append(f"Contains spaces: {filename}")
-                    
-                    # Check for special characters
-                    allowed_chars = set('abcdefghijklmnopqrstuvwxyzABCDEFGHIJKLMNOPQRSTUVWXYZ0123456789_-.')
-                    if not all(c in allowed_chars for c in filename):
-                        issues.append(f"Contains special characters: {filename}")
-        
-        if not issues:
-            status = "pass"
-            details = f"All {files_checked} files follow naming conventions"
-        else:
-            status = "warning"
-            details = f"Found {len(issues)} naming issues in {files_checked} files"
-        
-        self.validation_results["file_naming"] = {
-            "status": status,
-            "details": details,
-            "issues": issues[:5]  # Limit to first 5
-        }
-    
     def _determine_overall_status(self):
         """Determine overall validation status."""
         statuses = [v["status"] for k, v in self.validation_results.items() if k != "overall_status"]